@@ -0,0 +1,240 @@
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import string
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import proyecto
+
+INDICADORES_BASE = [
+    ("SP.POP.TOTL", "Total de población"),
+    ("SP.POP.GROW", "Crecimiento anual de la población (%)"),
+    ("SP.URB.TOTL", "Población urbana"),
+    ("SP.RUR.TOTL", "Población rural"),
+]
+
+
+def generar_dataset(num_paises, num_indicadores, num_años, semilla=0, año_inicio=1960,
+                    prob_hueco=0.1, prob_no_disponible=0.05):
+    """Genera (paises, indicadores, poblacion) con la forma de los archivos JSON del proyecto.
+
+    Cada serie crece con una tasa propia más ruido; algunos años faltan (huecos) y otros quedan
+    como "no disponible" con el último valor conocido.
+    """
+
+    azar = random.Random(semilla)
+
+    codigos_iso2 = [a + b for a in string.ascii_uppercase for b in string.ascii_uppercase]
+    codigos_iso3 = [a + b + c for a in string.ascii_uppercase for b in string.ascii_uppercase
+                    for c in string.ascii_uppercase]
+    azar.shuffle(codigos_iso2)
+    azar.shuffle(codigos_iso3)
+    paises = [{
+        "nombre": f"País {i:04d}",
+        "codigo_iso": codigos_iso2[i % len(codigos_iso2)],
+        "codigo_iso3": codigos_iso3[i]
+    } for i in range(num_paises)]
+
+    indicadores = [{"id_indicador": id_indicador, "descripcion": descripcion}
+                   for id_indicador, descripcion in INDICADORES_BASE[:num_indicadores]]
+    for i in range(len(indicadores), num_indicadores):
+        indicadores.append({"id_indicador": f"SYN.IND.{i:03d}", "descripcion": f"Indicador sintético {i}"})
+
+    poblacion = []
+    for pais in paises:
+        for indicador in indicadores:
+            valor = 10 ** azar.uniform(5, 9.1)
+            tasa = azar.uniform(-0.01, 0.03)
+            for año in range(año_inicio, año_inicio + num_años):
+                valor *= 1 + tasa + azar.gauss(0, 0.005)
+                if azar.random() < prob_hueco:
+                    continue
+                estado = "no disponible" if azar.random() < prob_no_disponible else "disponible"
+                poblacion.append({
+                    "ano": año,
+                    "pais": pais["nombre"],
+                    "codigo_iso3": pais["codigo_iso3"],
+                    "indicador_id": indicador["id_indicador"],
+                    "descripcion": indicador["descripcion"],
+                    "valor": max(int(valor), 1),
+                    "estado": estado,
+                    "unidad": "personas"
+                })
+
+    return paises, indicadores, poblacion
+
+
+def escribir_dataset(directorio, paises, indicadores, poblacion):
+
+    for nombre_archivo, datos in (("paises.json", paises), ("indicadores.json", indicadores),
+                                  ("poblacion.json", poblacion)):
+        with open(os.path.join(directorio, nombre_archivo), 'w', encoding='utf-8') as archivo:
+            json.dump(datos, archivo, ensure_ascii=False)
+
+
+def medir(funcion, repeticiones):
+    """Devuelve los tiempos (segundos) de cada repetición; la primera es en frío."""
+
+    tiempos = []
+    for i in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(i)
+        tiempos.append(time.perf_counter() - inicio)
+    return tiempos
+
+
+# Consultas públicas de SistemaEstadisticasGlobales: nombre -> función(sistema, contexto, i).
+CONSULTAS = {
+    "obtener_datos_poblacion_pais": lambda s, c, i: s.obtener_datos_poblacion_pais(c.pais(i), 2000, 2023),
+    "calcular_crecimiento_poblacional": lambda s, c, i: s.calcular_crecimiento_poblacional(c.pais(i), 1980, 2020),
+    "listar_paises": lambda s, c, i: s.listar_paises(),
+    "obtener_datos_por_indicador": lambda s, c, i: s.obtener_datos_por_indicador("SP.POP.TOTL"),
+    "obtener_datos_ultimos_años": lambda s, c, i: s.obtener_datos_ultimos_años(10),
+    "obtener_poblacion_pais_año": lambda s, c, i: s.obtener_poblacion_pais_año(c.pais(i), c.año_medio),
+    "obtener_poblacion_antes_año": lambda s, c, i: s.obtener_poblacion_antes_año(c.año_medio),
+    "obtener_poblacion_despues_año": lambda s, c, i: s.obtener_poblacion_despues_año(c.año_medio),
+    "calcular_porcentaje_crecimiento": lambda s, c, i: s.calcular_porcentaje_crecimiento(
+        c.pais(i), c.año_inicio, c.año_fin),
+    "obtener_año_poblacion_minima": lambda s, c, i: s.obtener_año_poblacion_minima(c.pais(i)),
+    "contar_registros_por_año": lambda s, c, i: s.contar_registros_por_año(),
+    "paises_crecimiento_mayor": lambda s, c, i: s.paises_crecimiento_mayor(2, 5),
+    "años_poblacion_mayor": lambda s, c, i: s.años_poblacion_mayor(c.pais(i), 1_000_000),
+    "obtener_poblacion_total_año": lambda s, c, i: s.obtener_poblacion_total_año(c.año_medio),
+    "obtener_poblacion_minima_periodo": lambda s, c, i: s.obtener_poblacion_minima_periodo(c.pais(i), 20),
+    "calcular_promedio_poblacion": lambda s, c, i: s.calcular_promedio_poblacion(c.pais(i), 1980, 2020),
+    "resumen_periodo": lambda s, c, i: s.resumen_periodo(c.pais(i), 1980, 2020),
+    "contar_años_datos_disponibles": lambda s, c, i: s.contar_años_datos_disponibles(c.pais(i)),
+    "paises_datos_completos": lambda s, c, i: s.paises_datos_completos(c.año_inicio, c.año_inicio + 5),
+    "años_crecimiento_mayor": lambda s, c, i: s.años_crecimiento_mayor(c.pais(i), 1_000_000),
+    "obtener_poblacion_por_decada": lambda s, c, i: s.obtener_poblacion_por_decada(c.pais(i), 1960),
+    "años_sin_datos": lambda s, c, i: s.años_sin_datos(c.pais(i), 2000, 2023),
+    "obtener_año_poblacion_maxima": lambda s, c, i: s.obtener_año_poblacion_maxima(c.pais(i)),
+    "años_datos_multiples_paises": lambda s, c, i: s.años_datos_multiples_paises(50),
+    "obtener_estadisticas": lambda s, c, i: s.obtener_estadisticas(),
+    "matriz_indicador": lambda s, c, i: s.matriz_indicador("SP.POP.TOTL"),
+    "razon_indicadores": lambda s, c, i: s.razon_indicadores("SP.URB.TOTL", "SP.POP.TOTL", factor=100),
+    "top_k": lambda s, c, i: s.top_k("SP.POP.TOTL", c.año_medio, 20),
+    "valores_entre": lambda s, c, i: s.valores_entre("SP.POP.TOTL", minimo=1_000_000, maximo=50_000_000),
+    "query": lambda s, c, i: s.query().indicador("SP.POP.TOTL").pais(c.pais(i)).años(2000, 2023).agg("avg"),
+}
+
+
+class Contexto:
+    """Argumentos de las consultas, rotando por países de forma determinista."""
+
+    def __init__(self, paises, año_inicio, num_años, semilla):
+
+        self.nombres = [pais["nombre"] for pais in paises]
+        random.Random(semilla).shuffle(self.nombres)
+        self.año_inicio = año_inicio
+        self.año_fin = año_inicio + num_años - 1
+        self.año_medio = año_inicio + num_años // 2
+
+    def pais(self, i):
+
+        return self.nombres[i % len(self.nombres)]
+
+
+def ejecutar_tamaño(num_paises, num_indicadores, num_años, almacen, repeticiones, semilla, inserciones):
+
+    paises, indicadores, poblacion = generar_dataset(num_paises, num_indicadores, num_años, semilla)
+    contexto = Contexto(paises, 1960, num_años, semilla)
+    resultados = []
+
+    def registrar(grupo, operacion, tiempos):
+        resultados.append({
+            "paises": num_paises,
+            "indicadores": num_indicadores,
+            "años": num_años,
+            "filas": len(poblacion),
+            "almacen": almacen,
+            "grupo": grupo,
+            "operacion": operacion,
+            "repeticiones": len(tiempos),
+            "primera_s": tiempos[0],
+            "min_s": min(tiempos),
+            "mediana_s": statistics.median(tiempos)
+        })
+
+    directorio_original = os.getcwd()
+    with tempfile.TemporaryDirectory() as directorio:
+        escribir_dataset(directorio, paises, indicadores, poblacion)
+        os.chdir(directorio)
+        try:
+            clase = proyecto.ALMACENES[almacen]
+            registrar("carga", "__init__", medir(lambda i: clase(), repeticiones))
+            sistema = clase()
+
+            for nombre, consulta in CONSULTAS.items():
+                registrar("consulta", nombre, medir(lambda i: consulta(sistema, contexto, i), repeticiones))
+
+            for codigo in proyecto.REPORTES:
+                registrar("reporte", codigo, medir(lambda i: sistema.generar_reporte(codigo), repeticiones))
+
+            # Inserción: la mitad actualiza filas existentes y la otra mitad agrega años nuevos.
+            def insertar(sistema, i):
+                año = contexto.año_medio if i % 2 else contexto.año_fin + 1 + i
+                sistema.agregar_dato_poblacion(año, contexto.pais(i), "SP.POP.TOTL", 1_000_000 + i)
+
+            registrar("insercion", "agregar_dato_poblacion",
+                      medir(lambda i: insertar(sistema, i), inserciones))
+
+            sistema_journal = clase(usar_journal=True, umbral_compactacion=10 ** 9)
+            registrar("insercion", "agregar_dato_poblacion (journal)",
+                      medir(lambda i: insertar(sistema_journal, i), inserciones))
+            sistema_journal.compactar()
+            sistema_journal.cerrar()
+
+            lote = [{"ano": contexto.año_fin + 100 + i // num_paises, "pais": contexto.pais(i),
+                     "indicador_id": "SP.POP.TOTL", "valor": i} for i in range(max(len(poblacion) // 10, 1))]
+            registrar("insercion", f"agregar_datos_poblacion_lote ({len(lote)} filas)",
+                      medir(lambda i: clase().agregar_datos_poblacion_lote(lote), 1))
+        finally:
+            os.chdir(directorio_original)
+
+    return resultados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de SistemaEstadisticasGlobales con datos sintéticos.")
+    parser.add_argument("--tamaños", default="20x4x30,100x4x60,250x4x60",
+                        help="Lista de PAISESxINDICADORESxAÑOS separada por comas")
+    parser.add_argument("--almacen", choices=sorted(proyecto.ALMACENES), default="lista")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--inserciones", type=int, default=10)
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--salida", default="-", help="Archivo JSON de resultados (- para la salida estándar)")
+    args = parser.parse_args(argv)
+
+    informe = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "semilla": args.semilla,
+        "resultados": []
+    }
+
+    for tamaño in args.tamaños.split(","):
+        num_paises, num_indicadores, num_años = (int(parte) for parte in tamaño.lower().split("x"))
+        print(f"Midiendo {num_paises} países x {num_indicadores} indicadores x {num_años} años...",
+              file=sys.stderr)
+        informe["resultados"].extend(ejecutar_tamaño(num_paises, num_indicadores, num_años, args.almacen,
+                                                     args.repeticiones, args.semilla, args.inserciones))
+
+    if args.salida == "-":
+        json.dump(informe, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    else:
+        with open(args.salida, 'w', encoding='utf-8') as archivo:
+            json.dump(informe, archivo, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,638 +1,4351 @@
+import argparse
+import bisect
+import contextlib
+import csv
+import functools
+import gzip
+import hashlib
+import heapq
+import inspect
 import json
+import mmap
 import os
+import pickle
+import re
+import sqlite3
+import struct
+import sys
+import time
+import unicodedata
+from collections import OrderedDict
 from datetime import datetime
+from itertools import islice, repeat
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Dependencias opcionales (pip install numpy orjson zstandard); sin ellas se usa solo la biblioteca estándar:
+# numpy para el almacén columnar, orjson para guardar el JSON más rápido y zstandard para --compresion zstd.
+# numpy es opcional y se importa solo al usar el almacenamiento columnar (arranque rápido del CLI).
+np = None
+
+def _cargar_numpy():
+    global np
+    
+    if np is None:
+        try:
+            import numpy
+            np = numpy
+        except ImportError:
+            pass
+    return np
+
+def _internar(texto):
+    
+    return sys.intern(texto) if type(texto) is str else texto
+
+
+class RegistroPoblacion:
+    """Observación de poblacion.json con __slots__; los textos repetidos (país, indicador, estado...)
+    se internan y todas las filas comparten el mismo objeto.
+    
+    Internamente se usan los atributos; las consultas devuelven dicts con a_dict().
+    
+    El país se guarda como texto internado y no como un id entero de CatalogoPaises: cada fila ocupa
+    igual un puntero, los enteros mayores que 256 serían un objeto por fila y todos los índices y
+    consultas trabajan con el nombre sin tener que traducirlo.
+    """
+    
+    __slots__ = ("ano", "pais", "codigo_iso3", "indicador_id", "descripcion", "valor", "estado", "unidad", "otros")
+    
+    CAMPOS = frozenset(("ano", "pais", "codigo_iso3", "indicador_id", "descripcion", "valor", "estado", "unidad"))
+    
+    def __init__(self, ano, pais, codigo_iso3, indicador_id, descripcion, valor, estado, unidad, otros=None):
+        
+        self.ano = ano
+        self.pais = _internar(pais)
+        self.codigo_iso3 = _internar(codigo_iso3)
+        self.indicador_id = _internar(indicador_id)
+        self.descripcion = _internar(descripcion)
+        self.valor = valor
+        self.estado = _internar(estado)
+        self.unidad = _internar(unidad)
+        self.otros = otros    # claves adicionales del JSON, si las hay
+    
+    @classmethod
+    def desde_dict(cls, dato):
+        
+        otros = dato.keys() - cls.CAMPOS
+        return cls(dato["ano"], dato["pais"], dato["codigo_iso3"], dato["indicador_id"], dato.get("descripcion", ""),
+                   dato["valor"], dato.get("estado"), dato.get("unidad"),
+                   {clave: dato[clave] for clave in otros} if otros else None)
+    
+    def a_dict(self):
+        
+        dato = {
+            "ano": self.ano,
+            "pais": self.pais,
+            "codigo_iso3": self.codigo_iso3,
+            "indicador_id": self.indicador_id,
+            "descripcion": self.descripcion,
+            "valor": self.valor,
+            "estado": self.estado,
+            "unidad": self.unidad
+        }
+        if self.otros:
+            dato.update(self.otros)
+        return dato
+
+
+def _mismo_valor(a, b):
+    
+    # 5 y 5.0 se guardan distinto en el JSON: solo son el mismo valor si además coincide el tipo.
+    return type(a) is type(b) and a == b
+
+
+def _a_json(objeto):
+    
+    if isinstance(objeto, RegistroPoblacion):
+        return objeto.a_dict()
+    raise TypeError(f"Objeto no serializable: {type(objeto).__name__}")
+
+
+MAGIA_GZIP = b"\x1f\x8b"
+MAGIA_ZSTD = b"\x28\xb5\x2f\xfd"
+COMPRESIONES = ("gzip", "zstd")
+
+
+def _modulo_zstd():
+    """compression.zstd (Python 3.14+) o el paquete zstandard; None si no hay ninguno."""
+    
+    try:
+        from compression import zstd
+        return zstd
+    except ImportError:
+        pass
+    try:
+        import zstandard
+        return zstandard
+    except ImportError:
+        return None
+
+
+def abrir_json(nombre_archivo):
+    """Abre un archivo JSON como texto; si está comprimido con gzip o zstd se descomprime al leer."""
+    
+    with open(nombre_archivo, 'rb') as archivo:
+        magia = archivo.read(len(MAGIA_ZSTD))
+    
+    if magia.startswith(MAGIA_GZIP):
+        return gzip.open(nombre_archivo, 'rt', encoding='utf-8')
+    if magia == MAGIA_ZSTD:
+        modulo = _modulo_zstd()
+        if modulo is None:
+            raise ImportError(f"{nombre_archivo} está comprimido con zstd (pip install zstandard).")
+        return modulo.open(nombre_archivo, 'rt', encoding='utf-8')
+    return open(nombre_archivo, 'r', encoding='utf-8')
+
+
+def _codificar_json(datos, compacto=True):
+    """Serializa a UTF-8; en modo compacto usa orjson si está instalado."""
+    
+    if compacto:
+        try:
+            import orjson
+            return orjson.dumps(datos, default=_a_json)
+        except ImportError:
+            pass
+        except TypeError:
+            # orjson no admite, por ejemplo, enteros de más de 64 bits: se usa json.
+            pass
+        return json.dumps(datos, ensure_ascii=False, separators=(',', ':'), default=_a_json).encode('utf-8')
+    return json.dumps(datos, indent=4, ensure_ascii=False, default=_a_json).encode('utf-8')
+
+
+class SerieIndicador:
+    """Posiciones de un (pais, indicador_id) en self.poblacion, ordenadas por año."""
+    
+    __slots__ = ("años", "posiciones")
+    
+    def __init__(self):
+        
+        self.años = []
+        self.posiciones = []
+    
+    def insertar(self, año, posicion):
+        
+        i = bisect.bisect_right(self.años, año)
+        self.años.insert(i, año)
+        self.posiciones.insert(i, posicion)
+    
+    def rango(self, año_inicio, año_fin):
+        
+        inicio = 0 if año_inicio is None else bisect.bisect_left(self.años, año_inicio)
+        fin = len(self.años) if año_fin is None else bisect.bisect_right(self.años, año_fin)
+        return self.posiciones[inicio:fin]
+
+
+_SERIE_VACIA = SerieIndicador()
+
+
+class EstadisticasPoblacion:
+    """Resumen del conjunto de datos que se mantiene en cada inserción: años extremos y filas por año
+    y por indicador. Los dicts conservan el orden en que apareció cada clave."""
+    
+    __slots__ = ("año_minimo", "año_maximo", "registros_por_año", "registros_por_indicador")
+    
+    def __init__(self):
+        
+        self.año_minimo = None
+        self.año_maximo = None
+        self.registros_por_año = {}        # ano -> filas
+        self.registros_por_indicador = {}  # indicador_id -> filas
+    
+    def agregar(self, año, indicador_id):
+        """Cuenta una fila nueva."""
+        
+        if self.año_minimo is None or año < self.año_minimo:
+            self.año_minimo = año
+        if self.año_maximo is None or año > self.año_maximo:
+            self.año_maximo = año
+        
+        self.registros_por_año[año] = self.registros_por_año.get(año, 0) + 1
+        self.registros_por_indicador[indicador_id] = self.registros_por_indicador.get(indicador_id, 0) + 1
+
+
+# Nombres alternativos que se aceptan al buscar un país, por código ISO3 (además del nombre,
+# los códigos ISO2/ISO3 y sus variantes sin tildes ni mayúsculas).
+ALIAS_PAISES = {
+    "BRA": ("Brazil",),
+    "USA": ("United States", "United States of America", "EEUU", "EE. UU."),
+    "UKE": ("England",),
+    "GBR": ("United Kingdom", "Reino Unido"),
+}
+
+
+def _normalizar_nombre(texto):
+    """Clave de búsqueda sin tildes, sin mayúsculas y con los espacios simplificados."""
+    
+    descompuesto = unicodedata.normalize("NFKD", texto)
+    return " ".join("".join(c for c in descompuesto if not unicodedata.combining(c)).casefold().split())
+
+
+class CatalogoPaises:
+    """Países (la misma lista que se guarda en paises.json) con índices por nombre, ISO2, ISO3 y alias.
+    
+    El id de un país es su posición en la lista; ante claves repetidas gana el primero.
+    """
+    
+    def __init__(self, paises):
+        
+        self.paises = paises
+        self.por_nombre = {}
+        self.por_iso2 = {}
+        self.por_iso3 = {}
+        self.alias = {}     # nombre o código normalizado -> id
+        
+        for id_pais, pais in enumerate(paises):
+            self._indexar(id_pais, pais)
+    
+    def _indexar(self, id_pais, pais):
+        
+        self.por_nombre.setdefault(pais["nombre"], id_pais)
+        self.por_iso2.setdefault(pais["codigo_iso"], id_pais)
+        self.por_iso3.setdefault(pais["codigo_iso3"], id_pais)
+        for texto in (pais["nombre"], pais["codigo_iso3"], pais["codigo_iso"],
+                      *ALIAS_PAISES.get(pais["codigo_iso3"], ())):
+            if texto:
+                self.alias.setdefault(_normalizar_nombre(texto), id_pais)
+    
+    def agregar(self, pais):
+        
+        self.paises.append(pais)
+        self._indexar(len(self.paises) - 1, pais)
+        return len(self.paises) - 1
+    
+    def buscar(self, texto):
+        """Id del país por nombre exacto, ISO3, ISO2 o alias (sin tildes ni mayúsculas); None si no existe."""
+        
+        if not isinstance(texto, str):
+            return None
+        for indice in (self.por_nombre, self.por_iso3, self.por_iso2):
+            if texto in indice:
+                return indice[texto]
+        return self.alias.get(_normalizar_nombre(texto))
+    
+    def __getitem__(self, id_pais):
+        
+        return self.paises[id_pais]
+
+
+class CatalogoIndicadores:
+    """Indicadores (la lista de indicadores.json) indexados por id, también sin distinguir mayúsculas."""
+    
+    def __init__(self, indicadores):
+        
+        self.indicadores = indicadores
+        self.por_id = {}
+        self.alias = {}
+        
+        for id_interno, indicador in enumerate(indicadores):
+            self._indexar(id_interno, indicador)
+    
+    def _indexar(self, id_interno, indicador):
+        
+        self.por_id.setdefault(indicador["id_indicador"], id_interno)
+        self.alias.setdefault(indicador["id_indicador"].casefold(), id_interno)
+    
+    def agregar(self, indicador):
+        
+        self.indicadores.append(indicador)
+        self._indexar(len(self.indicadores) - 1, indicador)
+        return len(self.indicadores) - 1
+    
+    def buscar(self, texto):
+        
+        if not isinstance(texto, str):
+            return None
+        if texto in self.por_id:
+            return self.por_id[texto]
+        return self.alias.get(texto.strip().casefold())
+    
+    def __getitem__(self, id_interno):
+        
+        return self.indicadores[id_interno]
+
+
+class CoberturaAños:
+    """Años con datos de cada (país, indicador) como mapa de bits: un int de Python cuyo bit k es el
+    año base + k. Además cuenta, por indicador, cuántos países tienen datos de cada año. Las preguntas
+    de cobertura (años faltantes, series completas) son así AND y conteos de bits."""
+    
+    __slots__ = ("base", "mapas", "paises_por_año")
+    
+    def __init__(self):
+        
+        self.base = None
+        self.mapas = {}            # (pais, indicador_id) -> mapa de bits de años
+        self.paises_por_año = {}   # indicador_id -> {ano: países con datos}, en orden de aparición
+    
+    def agregar(self, pais, indicador_id, año):
+        """Marca el año en la serie; devuelve True si el país aún no tenía datos de ese año e indicador."""
+        
+        if self.base is None:
+            self.base = año
+        elif año < self.base:
+            # Año anterior a todos los vistos: se desplazan los mapas para que el bit 0 sea el nuevo año base.
+            desplazamiento = self.base - año
+            self.mapas = {clave: mapa << desplazamiento for clave, mapa in self.mapas.items()}
+            self.base = año
+        
+        bit = 1 << (año - self.base)
+        mapa = self.mapas.get((pais, indicador_id), 0)
+        if mapa & bit:
+            return False
+        
+        self.mapas[(pais, indicador_id)] = mapa | bit
+        conteos = self.paises_por_año.get(indicador_id)
+        if conteos is None:
+            conteos = self.paises_por_año[indicador_id] = {}
+        conteos[año] = conteos.get(año, 0) + 1
+        return True
+    
+    def _rango(self, año_inicio, año_fin):
+        """Bits de los años del rango desde el año base (los anteriores no tienen bit: nunca hay datos)."""
+        
+        if self.base is None or año_fin < self.base:
+            return 0
+        inicio = max(año_inicio - self.base, 0)
+        return ((1 << (año_fin - self.base - inicio + 1)) - 1) << inicio
+    
+    def cantidad(self, pais, indicador_id):
+        
+        return bin(self.mapas.get((pais, indicador_id), 0)).count("1")
+    
+    def faltantes(self, pais, indicador_id, año_inicio, año_fin):
+        """Años del rango sin datos, en orden."""
+        
+        if año_inicio > año_fin:
+            return []
+        
+        base = año_fin + 1 if self.base is None else self.base
+        años = list(range(año_inicio, min(base, año_fin + 1)))
+        bits = self._rango(año_inicio, año_fin) & ~self.mapas.get((pais, indicador_id), 0)
+        while bits:
+            menor = bits & -bits
+            años.append(base + menor.bit_length() - 1)
+            bits ^= menor
+        return años
+    
+    def completos(self, paises, indicador_id, año_inicio, año_fin):
+        """Los países (en el orden dado) con datos en todos los años del rango."""
+        
+        if año_inicio > año_fin:
+            return list(paises)
+        if self.base is None or año_inicio < self.base:
+            return []
+        
+        rango = self._rango(año_inicio, año_fin)
+        return [pais for pais in paises if self.mapas.get((pais, indicador_id), 0) & rango == rango]
+
+
+class IndicePoblacion:
+    """Índices sobre las posiciones de self.poblacion, actualizados en cada inserción."""
+    
+    def __init__(self, poblacion=()):
+        
+        self.series = {}            # (pais, indicador_id) -> SerieIndicador
+        self.por_año = {}           # (ano, indicador_id) -> [posicion]
+        self.por_clave = {}         # (ano, codigo_iso3, indicador_id) -> posicion
+        self.indicadores_pais = {}  # pais -> [indicador_id]
+        self.estadisticas = EstadisticasPoblacion()
+        self.cobertura = CoberturaAños()
+        
+        for posicion, dato in enumerate(poblacion):
+            self.agregar(posicion, dato)
+    
+    def agregar(self, posicion, dato):
+        
+        pais = dato.pais
+        indicador_id = dato.indicador_id
+        año = dato.ano
+        
+        serie = self.series.get((pais, indicador_id))
+        if serie is None:
+            serie = self.series[(pais, indicador_id)] = SerieIndicador()
+            self.indicadores_pais.setdefault(pais, []).append(indicador_id)
+        self.estadisticas.agregar(año, indicador_id)
+        self.cobertura.agregar(pais, indicador_id, año)
+        serie.insertar(año, posicion)
+        
+        self.por_año.setdefault((año, indicador_id), []).append(posicion)
+        self.por_clave.setdefault((año, dato.codigo_iso3, indicador_id), posicion)
+    
+    def serie(self, pais, indicador_id):
+        
+        return self.series.get((pais, indicador_id), _SERIE_VACIA)
+    
+    def posiciones_años(self, indicador_id=None, desde=None, hasta=None):
+        """Posiciones (en orden de inserción) con el indicador y años dados; None no filtra."""
+        
+        listas = [posiciones for (año, ind), posiciones in self.por_año.items()
+                  if (indicador_id is None or ind == indicador_id) and
+                     (desde is None or año >= desde) and
+                     (hasta is None or año <= hasta)]
+        return heapq.merge(*listas)
+
+
+class CrecimientoSerie:
+    """Crecimiento interanual (absoluto y porcentual) precalculado de una serie ordenada por año."""
+    
+    __slots__ = ("años", "valores", "absolutos", "porcentajes", "_orden", "_absolutos_ordenados")
+    
+    def __init__(self, años, valores, absolutos, porcentajes):
+        
+        # absolutos[k - 1] y porcentajes[k - 1] son el crecimiento de años[k - 1] a años[k].
+        self.años = años
+        self.valores = valores
+        self.absolutos = absolutos
+        self.porcentajes = porcentajes
+        self._orden = None
+    
+    @classmethod
+    def desde_valores(cls, años, valores):
+        
+        absolutos = []
+        porcentajes = []
+        for k in range(1, len(valores)):
+            absoluto = valores[k] - valores[k - 1]
+            absolutos.append(absoluto)
+            porcentajes.append(round((absoluto / valores[k - 1]) * 100, 2) if valores[k - 1] > 0 else 0)
+        return cls(años, valores, absolutos, porcentajes)
+    
+    def rango(self, año_inicio, año_fin):
+        """Índices k (de inicio a fin, sin incluir fin) con años[k - 1] y años[k] dentro del rango."""
+        
+        return bisect.bisect_left(self.años, año_inicio) + 1, bisect.bisect_right(self.años, año_fin)
+    
+    def valor_año(self, año):
+        """Valor de la primera fila del año en la serie, o None si el año no tiene datos."""
+        
+        i = bisect.bisect_left(self.años, año)
+        return self.valores[i] if i < len(self.años) and self.años[i] == año else None
+    
+    def por_decada(self, decada_inicio, año_maximo):
+        """Primer año con datos (y su valor) de cada década desde decada_inicio hasta la de año_maximo."""
+        
+        resultados = []
+        for década in range(decada_inicio, año_maximo + 10, 10):
+            i = bisect.bisect_left(self.años, década)
+            if i < len(self.años) and self.años[i] < década + 10:
+                resultados.append({
+                    "decada": f"{década}s",
+                    "año": self.años[i],
+                    "poblacion": self.valores[i]
+                })
+        return resultados
+    
+    def años_mayor(self, umbral):
+        """Años cuyo crecimiento absoluto supera el umbral, en orden cronológico."""
+        
+        if self._orden is None:
+            self._orden = sorted(range(len(self.absolutos)), key=self.absolutos.__getitem__)
+            self._absolutos_ordenados = [self.absolutos[k] for k in self._orden]
+        
+        inicio = bisect.bisect_right(self._absolutos_ordenados, umbral)
+        return [self.años[k + 1] for k in sorted(self._orden[inicio:])]
+
+
+class RangosSerie:
+    """Árbol de segmentos sobre los años de una serie: suma, cantidad, mínimo y máximo de cualquier
+    rango de años en O(log n), con actualización puntual cuando se inserta o modifica un año."""
+    
+    __slots__ = ("año_base", "tamaño", "suma", "cantidad", "minimo", "maximo")
+    
+    def __init__(self, años, valores):
+        
+        # Una hoja por año (los huecos quedan vacíos); la capacidad es potencia de dos y deja margen
+        # para los años nuevos que se agreguen después del último.
+        self.año_base = años[0] if años else 0
+        extension = años[-1] - self.año_base + 1 if años else 1
+        self.tamaño = 1 << extension.bit_length()
+        
+        self.suma = [0] * (2 * self.tamaño)
+        self.cantidad = [0] * (2 * self.tamaño)
+        self.minimo = [None] * (2 * self.tamaño)
+        self.maximo = [None] * (2 * self.tamaño)
+        
+        for año, valor in zip(años, valores):
+            i = self.tamaño + año - self.año_base
+            self.suma[i] += valor
+            self.cantidad[i] += 1
+            if self.minimo[i] is None or valor < self.minimo[i]:
+                self.minimo[i] = valor
+            if self.maximo[i] is None or valor > self.maximo[i]:
+                self.maximo[i] = valor
+        
+        for i in range(self.tamaño - 1, 0, -1):
+            self._combinar(i)
+    
+    def _combinar(self, i):
+        
+        izquierdo, derecho = 2 * i, 2 * i + 1
+        self.suma[i] = self.suma[izquierdo] + self.suma[derecho]
+        self.cantidad[i] = self.cantidad[izquierdo] + self.cantidad[derecho]
+        self.minimo[i] = _extremo(min, self.minimo[izquierdo], self.minimo[derecho])
+        self.maximo[i] = _extremo(max, self.maximo[izquierdo], self.maximo[derecho])
+    
+    def contiene(self, año):
+        
+        return 0 <= año - self.año_base < self.tamaño
+    
+    def asignar(self, año, valores):
+        """Reemplaza los valores del año (puede haber varios si la serie tiene filas duplicadas)."""
+        
+        i = self.tamaño + año - self.año_base
+        self.suma[i] = sum(valores)
+        self.cantidad[i] = len(valores)
+        self.minimo[i] = min(valores) if valores else None
+        self.maximo[i] = max(valores) if valores else None
+        
+        i //= 2
+        while i:
+            self._combinar(i)
+            i //= 2
+    
+    def consultar(self, año_inicio, año_fin):
+        """Devuelve (suma, cantidad, mínimo, máximo) de los años del rango, o None si no hay datos."""
+        
+        izquierdo = max(año_inicio - self.año_base, 0) + self.tamaño
+        derecho = min(año_fin - self.año_base, self.tamaño - 1) + self.tamaño + 1
+        
+        suma, cantidad, minimo, maximo = 0, 0, None, None
+        while izquierdo < derecho:
+            if izquierdo & 1:
+                suma += self.suma[izquierdo]
+                cantidad += self.cantidad[izquierdo]
+                minimo = _extremo(min, minimo, self.minimo[izquierdo])
+                maximo = _extremo(max, maximo, self.maximo[izquierdo])
+                izquierdo += 1
+            if derecho & 1:
+                derecho -= 1
+                suma += self.suma[derecho]
+                cantidad += self.cantidad[derecho]
+                minimo = _extremo(min, minimo, self.minimo[derecho])
+                maximo = _extremo(max, maximo, self.maximo[derecho])
+            izquierdo //= 2
+            derecho //= 2
+        
+        return (suma, cantidad, minimo, maximo) if cantidad else None
+
+
+class OrdenValores:
+    """Filas de un grupo (una serie o un año de un indicador) ordenadas por valor de mayor a menor,
+    con los empates en orden de inserción. Los k mayores, los umbrales y los extremos salen con
+    bisect en O(log n + k). Las filas sin valor no se indexan."""
+    
+    __slots__ = ("claves", "filas")
+    
+    def __init__(self, valores, filas):
+        
+        # valores[i] es el valor de filas[i], que vienen en orden de inserción (sorted es estable).
+        orden = sorted((i for i, valor in enumerate(valores) if valor is not None), key=lambda i: -valores[i])
+        self.claves = [-valores[i] for i in orden]   # valores negados: crecientes para bisect
+        self.filas = [filas[i] for i in orden]
+    
+    def mayores(self, k):
+        
+        return self.filas[:max(k, 0)]
+    
+    def entre(self, minimo=None, maximo=None):
+        """Filas con minimo <= valor <= maximo (None no limita), de mayor a menor valor."""
+        
+        inicio = 0 if maximo is None else bisect.bisect_left(self.claves, -maximo)
+        fin = len(self.claves) if minimo is None else bisect.bisect_right(self.claves, -minimo)
+        return self.filas[inicio:fin]
+    
+    def sobre(self, umbral):
+        """Filas con valor > umbral, de mayor a menor valor."""
+        
+        return self.filas[:bisect.bisect_left(self.claves, -umbral)]
+    
+    def maximo(self):
+        
+        return self.filas[0] if self.filas else None
+    
+    def minimo(self):
+        
+        # El primero (en orden de inserción) de los empatados con el menor valor.
+        return self.filas[bisect.bisect_left(self.claves, self.claves[-1])] if self.filas else None
+
+
+def _porcentaje_crecimiento(pob_inicio, pob_fin):
+    
+    if pob_inicio is None or pob_fin is None:
+        return None
+    
+    crecimiento = ((pob_fin - pob_inicio) / pob_inicio) * 100
+    return round(crecimiento, 2)
+
+
+def _extremo(funcion, a, b):
+    
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return funcion(a, b)
+
+
+ARCHIVO_JOURNAL = 'poblacion.journal.jsonl'
+
+
+class JournalPoblacion:
+    """Journal JSONL de solo anexado con los cambios pendientes de integrar en poblacion.json."""
+    
+    def __init__(self, nombre_archivo, lote_fsync=100):
+        
+        self.nombre_archivo = nombre_archivo
+        self.lote_fsync = lote_fsync
+        self.registros = 0
+        self.pendientes = 0
+        self.posicion = 0   # bytes leídos hasta la última línea completa
+        self.archivo = None
+    
+    def leer(self, desde=0):
+        """Devuelve los registros desde el byte `desde` sin modificar el archivo. Una línea completa
+        que no es JSON válido se omite con un aviso; una última línea sin salto de línea (escritura
+        cortada o todavía en curso en otro proceso) no se lee."""
+        
+        registros = []
+        posicion = desde
+        try:
+            with open(self.nombre_archivo, 'rb') as archivo:
+                archivo.seek(desde)
+                for linea in archivo:
+                    if not linea.endswith(b"\n"):
+                        break
+                    try:
+                        registros.append(json.loads(linea))
+                    except json.JSONDecodeError:
+                        print(f"Advertencia: Se omitió un registro dañado en {self.nombre_archivo} (byte {posicion}).")
+                    posicion += len(linea)
+        except FileNotFoundError:
+            self.posicion = 0
+            return []
+        
+        self.posicion = posicion
+        self.registros = (self.registros if desde else 0) + len(registros)
+        return registros
+    
+    def _descartar_linea_incompleta(self):
+        """Recorta una última línea sin salto de línea, que dejó una escritura cortada: si no, el siguiente
+        registro quedaría pegado a ella. Solo lo hace el escritor, con el cerrojo tomado en modo compartido."""
+        
+        archivo = self.archivo
+        tamaño = archivo.seek(0, os.SEEK_END)
+        if not tamaño:
+            return
+        archivo.seek(tamaño - 1)
+        if archivo.read(1) == b"\n":
+            return
+        
+        # Se busca hacia atrás el último salto de línea.
+        fin = tamaño
+        while fin > 0:
+            inicio = max(fin - 65536, 0)
+            archivo.seek(inicio)
+            salto = archivo.read(fin - inicio).rfind(b"\n")
+            if salto >= 0:
+                fin = inicio + salto + 1
+                break
+            fin = inicio
+        print(f"Advertencia: Se descartó un registro incompleto al final de {self.nombre_archivo}.")
+        archivo.truncate(fin)
+        archivo.flush()
+        os.fsync(archivo.fileno())
+    
+    def anexar(self, dato):
+        
+        if self.archivo is None:
+            # a+b: las escrituras van siempre al final, y se puede leer la cola del archivo.
+            self.archivo = open(self.nombre_archivo, 'a+b')
+        
+        self._descartar_linea_incompleta()
+        self.archivo.write((json.dumps(dato, ensure_ascii=False) + "\n").encode("utf-8"))
+        self.archivo.flush()
+        self.registros += 1
+        self.pendientes += 1
+        
+        if self.pendientes >= self.lote_fsync:
+            self.sincronizar()
+    
+    def sincronizar(self):
+        
+        if self.archivo is not None and self.pendientes:
+            os.fsync(self.archivo.fileno())
+            self.pendientes = 0
+    
+    def vaciar(self):
+        
+        self.cerrar()
+        with open(self.nombre_archivo, 'w', encoding='utf-8') as archivo:
+            os.fsync(archivo.fileno())
+        self.registros = 0
+        self.posicion = 0
+    
+    def cerrar(self):
+        
+        if self.archivo is not None:
+            self.sincronizar()
+            self.archivo.close()
+            self.archivo = None
+
+
+# Modo compartido: cerrojo entre procesos y número de generación de cada archivo de datos.
+ARCHIVO_BLOQUEO = 'poblacion.lock'
+ARCHIVO_GENERACIONES = 'poblacion.generacion'
+
+
+def _bloquear_archivo(archivo, exclusivo, esperar):
+    
+    if fcntl is not None:
+        modo = fcntl.LOCK_EX if exclusivo else fcntl.LOCK_SH
+        fcntl.flock(archivo.fileno(), modo if esperar else modo | fcntl.LOCK_NB)
+    else:
+        # msvcrt solo tiene cerrojos exclusivos; LK_LOCK reintenta durante unos 10 segundos.
+        archivo.seek(0)
+        msvcrt.locking(archivo.fileno(), msvcrt.LK_LOCK if esperar else msvcrt.LK_NBLCK, 1)
+
+
+def _desbloquear_archivo(archivo):
+    
+    if fcntl is not None:
+        fcntl.flock(archivo.fileno(), fcntl.LOCK_UN)
+    else:
+        archivo.seek(0)
+        msvcrt.locking(archivo.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class BloqueoArchivo:
+    """Cerrojo entre procesos sobre un archivo auxiliar: compartido para leer, exclusivo para escribir.
+    
+    Es reentrante dentro del proceso: solo el primer adquirir y el último liberar tocan el archivo.
+    """
+    
+    def __init__(self, nombre_archivo):
+        
+        self.nombre_archivo = nombre_archivo
+        self.archivo = None
+        self.nivel = 0
+    
+    def adquirir(self, exclusivo=True, esperar=True):
+        """Toma el cerrojo; con esperar=False devuelve False si otro proceso lo tiene."""
+        
+        if self.nivel == 0:
+            archivo = open(self.nombre_archivo, 'a+b')
+            try:
+                _bloquear_archivo(archivo, exclusivo, esperar)
+            except OSError:
+                archivo.close()
+                if esperar:
+                    raise
+                return False
+            self.archivo = archivo
+        self.nivel += 1
+        return True
+    
+    def liberar(self):
+        
+        self.nivel -= 1
+        if self.nivel == 0:
+            _desbloquear_archivo(self.archivo)
+            self.archivo.close()
+            self.archivo = None
+    
+    @contextlib.contextmanager
+    def bloquear(self, exclusivo=True):
+        
+        self.adquirir(exclusivo)
+        try:
+            yield
+        finally:
+            self.liberar()
+
+
+def _leer_generaciones():
+    """Generación de cada archivo de datos (archivo -> número de escrituras en modo compartido)."""
+    
+    try:
+        with open(ARCHIVO_GENERACIONES, 'r', encoding='utf-8') as archivo:
+            return json.load(archivo)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _tamaño_archivo(nombre_archivo):
+    
+    try:
+        return os.path.getsize(nombre_archivo)
+    except FileNotFoundError:
+        return 0
+
+
+def _escritura(metodo):
+    """Decorador de los métodos que modifican datos. En modo compartido los ejecuta con el cerrojo
+    exclusivo, después de comprobar la versión de los archivos (y recargarlos si otro proceso escribió),
+    y al terminar publica la nueva generación de lo que se guardó."""
+    
+    @functools.wraps(metodo)
+    def envoltura(self, *args, **kwargs):
+        
+        if self.bloqueo is None or self.bloqueo.nivel:
+            return metodo(self, *args, **kwargs)
+        
+        with self.bloqueo.bloquear():
+            self.recargar_si_cambio()
+            try:
+                return metodo(self, *args, **kwargs)
+            finally:
+                self._publicar_generaciones()
+    return envoltura
+
+
+def _filas_devueltas(resultado):
+    
+    if resultado is None:
+        return 0
+    if isinstance(resultado, dict):
+        # Las matrices devuelven una fila por país; cualquier otro dict es un único resultado.
+        return len(resultado["valores"]) if isinstance(resultado.get("valores"), list) else 1
+    if isinstance(resultado, (list, tuple, set)):
+        return len(resultado)
+    return 1
+
+
+class PerfilConsultas:
+    """Estadísticas por método (llamadas, tiempo, filas recorridas y devueltas) de los sistemas que
+    se crean con perfil=...; un mismo perfil puede acumular las de varios sistemas.
+    
+    Los tiempos son inclusivos: un reporte incluye el de las consultas que hace. Las filas recorridas
+    son las que el motor leyó para responder (lista: filas accedidas por posición; columnar: filas de
+    cada columna filtrada; sqlite: filas que devolvió SQLite).
+    """
+    
+    def __init__(self):
+        
+        self.metodos = {}           # nombre -> {llamadas, segundos, segundos_max, filas_recorridas, filas_devueltas}
+        self.filas_recorridas = 0   # contador que los motores incrementan al leer filas
+    
+    def instrumentar(self, sistema):
+        """Reemplaza en la instancia los métodos de METODOS_PERFILADOS por versiones medidas."""
+        
+        for nombre in METODOS_PERFILADOS:
+            setattr(sistema, nombre, self.envolver(nombre, getattr(sistema, nombre)))
+        # Las cargas y los guardados se cuentan por archivo.
+        for nombre in ("_cargar_json", "_guardar_json"):
+            setattr(sistema, nombre, self.envolver(nombre, getattr(sistema, nombre), por_archivo=True))
+    
+    def envolver(self, nombre, metodo, por_archivo=False):
+        
+        @functools.wraps(metodo)
+        def medido(*args, **kwargs):
+            
+            recorridas = self.filas_recorridas
+            resultado = None
+            inicio = time.perf_counter()
+            try:
+                resultado = metodo(*args, **kwargs)
+                return resultado
+            finally:
+                self.registrar(f"{nombre}:{args[-1]}" if por_archivo else nombre, time.perf_counter() - inicio,
+                               self.filas_recorridas - recorridas, _filas_devueltas(resultado))
+        return medido
+    
+    def registrar(self, nombre, segundos, filas_recorridas=0, filas_devueltas=0):
+        
+        metodo = self.metodos.get(nombre)
+        if metodo is None:
+            metodo = self.metodos[nombre] = {"llamadas": 0, "segundos": 0.0, "segundos_max": 0.0,
+                                             "filas_recorridas": 0, "filas_devueltas": 0}
+        metodo["llamadas"] += 1
+        metodo["segundos"] += segundos
+        metodo["segundos_max"] = max(metodo["segundos_max"], segundos)
+        metodo["filas_recorridas"] += filas_recorridas
+        metodo["filas_devueltas"] += filas_devueltas
+    
+    def estadisticas(self):
+        """Copia de las estadísticas por método, de mayor a menor tiempo total."""
+        
+        return {nombre: dict(metodo) for nombre, metodo in
+                sorted(self.metodos.items(), key=lambda item: item[1]["segundos"], reverse=True)}
+    
+    def fusionar(self, estadisticas):
+        """Suma las estadísticas de otro perfil (las de un worker de batch, por ejemplo)."""
+        
+        for nombre, otro in estadisticas.items():
+            metodo = self.metodos.get(nombre)
+            if metodo is None:
+                self.metodos[nombre] = dict(otro)
+                continue
+            for campo in ("llamadas", "segundos", "filas_recorridas", "filas_devueltas"):
+                metodo[campo] += otro[campo]
+            metodo["segundos_max"] = max(metodo["segundos_max"], otro["segundos_max"])
+    
+    def a_json(self):
+        
+        return json.dumps({"metodos": self.estadisticas()}, ensure_ascii=False, indent=2)
+    
+    def a_prometheus(self, prefijo="poblacion"):
+        """Formato de texto de Prometheus: un contador por métrica, con el método como etiqueta."""
+        
+        metricas = (("llamadas", "llamadas_total", "Llamadas por método."),
+                    ("segundos", "segundos_total", "Tiempo total por método, en segundos."),
+                    ("filas_recorridas", "filas_recorridas_total", "Filas leídas por el motor."),
+                    ("filas_devueltas", "filas_devueltas_total", "Filas del resultado."))
+        lineas = []
+        for campo, sufijo, ayuda in metricas:
+            lineas.append(f"# HELP {prefijo}_{sufijo} {ayuda}")
+            lineas.append(f"# TYPE {prefijo}_{sufijo} counter")
+            for nombre, metodo in self.metodos.items():
+                etiqueta = nombre.replace("\\", "\\\\").replace('"', '\\"')
+                lineas.append(f'{prefijo}_{sufijo}{{metodo="{etiqueta}"}} {metodo[campo]}')
+        return "\n".join(lineas) + "\n"
+    
+    def guardar(self, nombre_archivo):
+        """Escribe las estadísticas en JSON o, si la extensión es .prom o .txt, en formato Prometheus."""
+        
+        prometheus = nombre_archivo.endswith(('.prom', '.txt'))
+        with open(nombre_archivo, 'w', encoding='utf-8') as archivo:
+            archivo.write(self.a_prometheus() if prometheus else self.a_json())
+    
+    def resumen(self, limite=15):
+        """Tabla de los métodos con más tiempo total."""
+        
+        lineas = ["=== PERFIL (tiempos inclusivos) ===",
+                  f"{'Método':<40} {'Llamadas':>9} {'Total (s)':>10} {'Medio (ms)':>11} {'Recorridas':>11} {'Devueltas':>10}"]
+        for nombre, metodo in list(self.estadisticas().items())[:limite]:
+            lineas.append(f"{nombre[:40]:<40} {metodo['llamadas']:>9} {metodo['segundos']:>10.4f} "
+                          f"{metodo['segundos'] / metodo['llamadas'] * 1000:>11.3f} "
+                          f"{metodo['filas_recorridas']:>11} {metodo['filas_devueltas']:>10}")
+        return "\n".join(lineas)
+
+
+class FilasContadas(list):
+    """Lista de filas que cuenta en el perfil cada acceso por posición (solo con el perfilado activo)."""
+    
+    __slots__ = ("perfil",)
+    
+    def __init__(self, perfil):
+        
+        super().__init__()
+        self.perfil = perfil
+    
+    def __getitem__(self, posicion):
+        
+        self.perfil.filas_recorridas += 1
+        return list.__getitem__(self, posicion)
+
+
+ARCHIVO_CACHE = 'poblacion.cache.db'
+
+
+class CacheResultados:
+    """Caché en disco de resultados de reportes y consultas, compartida entre procesos y ejecuciones.
+    
+    La clave es el método, sus argumentos y la generación de los datos del sistema (_generacion), así
+    que un resultado solo se reutiliza sobre los mismos datos. Los valores se guardan con pickle en una
+    base SQLite; al superar tamaño_maximo bytes se descartan los de acceso más antiguo (LRU). Es una
+    caché de mejor esfuerzo: si la base está ocupada o dañada se calcula el resultado sin ella."""
+    
+    def __init__(self, nombre_archivo=ARCHIVO_CACHE, tamaño_maximo=64 << 20):
+        
+        self.nombre_archivo = nombre_archivo
+        self.tamaño_maximo = tamaño_maximo
+        self.aciertos = 0
+        self.fallos = 0
+        self.conexion = None
+        self.pid = None
+        self.conexiones_heredadas = []
+    
+    def __getstate__(self):
+        
+        # La conexión no se comparte con otros procesos (batch --workers): cada uno abre la suya.
+        estado = dict(self.__dict__)
+        estado["conexion"] = estado["pid"] = None
+        estado["conexiones_heredadas"] = []
+        return estado
+    
+    def _conexion(self):
+        
+        if self.conexion is None or self.pid != os.getpid():
+            if self.conexion is not None:
+                # Heredada por fork(): no se usa ni se cierra desde este proceso.
+                self.conexiones_heredadas.append(self.conexion)
+            self.conexion = sqlite3.connect(self.nombre_archivo, isolation_level=None, timeout=1)
+            self.conexion.execute("PRAGMA journal_mode=WAL")
+            self.conexion.execute("PRAGMA synchronous=NORMAL")
+            self.conexion.executescript(
+                "CREATE TABLE IF NOT EXISTS resultados (clave TEXT PRIMARY KEY, valor BLOB NOT NULL, "
+                "tamaño INTEGER NOT NULL, acceso REAL NOT NULL);"
+                "CREATE INDEX IF NOT EXISTS resultados_acceso ON resultados (acceso);")
+            self.pid = os.getpid()
+        return self.conexion
+    
+    def instrumentar(self, sistema, metodos=None):
+        """Reemplaza en la instancia los métodos dados (por defecto METODOS_CACHEADOS) por versiones con caché."""
+        
+        for nombre in METODOS_CACHEADOS if metodos is None else metodos:
+            setattr(sistema, nombre, self.envolver(sistema, nombre, getattr(sistema, nombre)))
+    
+    def envolver(self, sistema, nombre, metodo):
+        
+        @functools.wraps(metodo)
+        def envoltura(*args, **kwargs):
+            
+            generacion = sistema._generacion()
+            clave = hashlib.sha256(repr((nombre, args, sorted(kwargs.items()), generacion))
+                                   .encode("utf-8")).hexdigest()
+            encontrado, resultado = self.leer(clave)
+            if encontrado:
+                return resultado
+            
+            resultado = metodo(*args, **kwargs)
+            # None es la respuesta de error (ya se imprimió el motivo): se vuelve a calcular cada vez. Si
+            # los datos cambiaron durante el cálculo (SQLite lee en vivo), el resultado no se guarda.
+            if resultado is not None and sistema._generacion() == generacion:
+                self.escribir(clave, resultado)
+            return resultado
+        return envoltura
+    
+    def leer(self, clave):
+        """(True, resultado) si la clave está en la caché; si no, (False, None)."""
+        
+        try:
+            conexion = self._conexion()
+            fila = conexion.execute("SELECT valor FROM resultados WHERE clave = ?", (clave,)).fetchone()
+            if fila is not None:
+                conexion.execute("UPDATE resultados SET acceso = ? WHERE clave = ?", (time.time(), clave))
+                resultado = pickle.loads(fila[0])
+                self.aciertos += 1
+                return True, resultado
+        except (sqlite3.Error, pickle.UnpicklingError):
+            pass
+        
+        self.fallos += 1
+        return False, None
+    
+    def escribir(self, clave, resultado):
+        
+        valor = pickle.dumps(resultado, pickle.HIGHEST_PROTOCOL)
+        if len(valor) > self.tamaño_maximo:
+            return
+        
+        try:
+            conexion = self._conexion()
+            conexion.execute("BEGIN IMMEDIATE")
+            try:
+                conexion.execute("INSERT OR REPLACE INTO resultados VALUES (?, ?, ?, ?)",
+                                 (clave, valor, len(valor), time.time()))
+                self._desalojar(conexion)
+                conexion.execute("COMMIT")
+            except BaseException:
+                conexion.execute("ROLLBACK")
+                raise
+        except sqlite3.Error:
+            pass
+    
+    def _desalojar(self, conexion):
+        
+        exceso = conexion.execute("SELECT COALESCE(SUM(tamaño), 0) FROM resultados").fetchone()[0] - self.tamaño_maximo
+        if exceso <= 0:
+            return
+        
+        claves = []
+        for clave, tamaño in conexion.execute("SELECT clave, tamaño FROM resultados ORDER BY acceso"):
+            claves.append((clave,))
+            exceso -= tamaño
+            if exceso <= 0:
+                break
+        conexion.executemany("DELETE FROM resultados WHERE clave = ?", claves)
+    
+    def estadisticas(self):
+        
+        entradas, tamaño = self._conexion().execute(
+            "SELECT COUNT(*), COALESCE(SUM(tamaño), 0) FROM resultados").fetchone()
+        return {"aciertos": self.aciertos, "fallos": self.fallos, "entradas": entradas, "bytes": tamaño}
+    
+    def vaciar(self):
+        
+        self._conexion().execute("DELETE FROM resultados")
+    
+    def cerrar(self):
+        
+        if self.conexion is not None and self.pid == os.getpid():
+            self.conexion.close()
+        self.conexion = None
+
+
+class ConsultaPoblacion:
+    """Consulta perezosa sobre la población de un sistema, por ejemplo
+    sistema.query().indicador("SP.POP.TOTL").pais("Brasil").años(2000, 2023).agg("avg").
+    
+    Cada filtro devuelve una consulta nueva y nada se ejecuta hasta recorrerla. El almacén resuelve
+    país, indicador y años con su índice (_plan_consulta) y puede aplicar también el rango de valores,
+    el límite y las agregaciones; lo que no aplique se filtra aquí sobre el flujo de filas, que sale en
+    orden de inserción y se corta en cuanto se alcanza el límite."""
+    
+    AGREGACIONES = ("count", "sum", "avg", "min", "max")
+    
+    def __init__(self, sistema):
+        
+        self.sistema = sistema
+        self.filtro_pais = None
+        self.filtro_indicador = None
+        self.desde = None
+        self.hasta = None
+        self.minimo = None
+        self.maximo = None
+        self.predicados = ()
+        self.limite_filas = None
+    
+    def _con(self, **cambios):
+        
+        consulta = object.__new__(ConsultaPoblacion)
+        consulta.__dict__.update(self.__dict__, **cambios)
+        return consulta
+    
+    def pais(self, pais):
+        
+        return self._con(filtro_pais=pais)
+    
+    def indicador(self, indicador_id):
+        
+        return self._con(filtro_indicador=indicador_id)
+    
+    def años(self, desde=None, hasta=None):
+        """Años entre desde y hasta, ambos incluidos (None no limita)."""
+        
+        return self._con(desde=desde, hasta=hasta)
+    
+    def valor_entre(self, minimo=None, maximo=None):
+        """Filas con minimo <= valor <= maximo (None no limita); excluye las filas sin valor."""
+        
+        return self._con(minimo=minimo, maximo=maximo)
+    
+    def donde(self, predicado):
+        """Filtro arbitrario: predicado(fila) recibe la fila como dict."""
+        
+        return self._con(predicados=self.predicados + (predicado,))
+    
+    def limite(self, cantidad):
+        
+        return self._con(limite_filas=max(cantidad, 0))
+    
+    def filtra_valores(self):
+        
+        return self.minimo is not None or self.maximo is not None
+    
+    def _en_rango(self, valor):
+        
+        return (valor is not None and (self.minimo is None or valor >= self.minimo) and
+                (self.maximo is None or valor <= self.maximo))
+    
+    def _cumple(self, fila):
+        
+        return all(predicado(fila) for predicado in self.predicados)
+    
+    def _recorrer(self):
+        """Filas del almacén (en su representación interna) que cumplen la consulta."""
+        
+        sistema = self.sistema
+        _, filas = sistema._plan_consulta(self)
+        if self.filtra_valores():
+            filas = (fila for fila in filas if self._en_rango(sistema._valor_consulta(fila)))
+        if self.predicados:
+            filas = (fila for fila in filas if self._cumple(sistema._fila_consulta(fila)))
+        if self.limite_filas is not None:
+            filas = islice(filas, self.limite_filas)
+        return filas
+    
+    def __iter__(self):
+        
+        return map(self.sistema._fila_consulta, self._recorrer())
+    
+    def valores(self):
+        
+        return map(self.sistema._valor_consulta, self._recorrer())
+    
+    def primero(self):
+        
+        return next(iter(self), None)
+    
+    def a_lista(self):
+        
+        return list(self)
+    
+    def contar(self):
+        
+        return self.agg("count")
+    
+    def agg(self, funcion):
+        """count (filas), sum, avg, min o max de los valores; las filas sin valor no cuentan para las
+        cuatro últimas. sum de ninguna fila es 0; avg, min y max, None."""
+        
+        if funcion not in self.AGREGACIONES:
+            print(f"Error: Agregación '{funcion}' no soportada. Opciones: {', '.join(self.AGREGACIONES)}")
+            return None
+        
+        return self.sistema._agregar_consulta(self, funcion)
+    
+    def explicar(self):
+        """Índice o plan que usa el almacén para la consulta."""
+        
+        return self.sistema._plan_consulta(self)[0]
+
+
+# Reportes del módulo de reportes: código -> (título del menú, parámetros por defecto).
+REPORTES = {
+    "A": ("Datos de población 2000-2023", {"año_inicio": 2000, "año_fin": 2023}),
+    "B": ("Listar países con códigos ISO", {}),
+    "C": ("Datos de población 'SP.POP.TOTL'", {"indicador_id": "SP.POP.TOTL"}),
+    "D": ("Datos de población de los últimos 10 años", {"num_años": 10}),
+    "E": ("Total de población en 2022", {"año": 2022}),
+    "F": ("Población total antes de 2000", {"año": 2000}),
+    "G": ("Población total después de 2010", {"año": 2010}),
+    "H": ("Porcentaje de crecimiento 2010-2020", {"año_inicio": 2010, "año_fin": 2020}),
+    "I": ("Población en 2023", {"año": 2023}),
+    "J": ("Año con población más baja", {}),
+    "K": ("Número de registros por año", {}),
+    "L": ("Países con crecimiento > 2% anual", {"porcentaje": 2, "num_años": 5}),
+    "M": ("Años con población > 1,000 millones", {"umbral": 1_000_000_000}),
+    "N": ("Población total en 2000", {"año": 2000}),
+    "O": ("Población mínima en últimos 20 años", {"num_años": 20}),
+    "P": ("Promedio de población 1980-2020", {"año_inicio": 1980, "año_fin": 2020}),
+    "Q": ("Años con datos de población", {}),
+    "R": ("Países con datos 2000-2023", {"año_inicio": 2000, "año_fin": 2023}),
+    "S": ("Población total en 2019", {"año": 2019}),
+    "T": ("Años con crecimiento > 1 millón", {"umbral": 1_000_000}),
+    "U": ("Población por décadas desde 1960", {"decada_inicio": 1960}),
+    "V": ("Población total en 2023", {"año": 2023}),
+    "W": ("Años sin datos de población", {"año_inicio": 2000, "año_fin": 2023}),
+    "X": ("Año con población más alta", {}),
+    "Y": ("Años con datos de más de 50 países", {"umbral_paises": 50}),
+}
+
+# Reportes que se calculan por país sobre una sola agrupación de los datos: _preparar_series agrupa
+# las series del indicador en una pasada y los reportes leen sus índices sin consultar país por país.
+REPORTES_POR_PAIS = set("HIJMOPQTUWX")
+
+# Indicadores derivados de otros dos: id -> (numerador, denominador, factor).
+INDICADORES_DERIVADOS = {
+    "SP.URB.TOTL.IN.ZS": ("SP.URB.TOTL", "SP.POP.TOTL", 100),  # Población urbana (% del total)
+    "SP.RUR.TOTL.ZS": ("SP.RUR.TOTL", "SP.POP.TOTL", 100),     # Población rural (% del total)
+}
+
 
 class SistemaEstadisticasGlobales:
-    def __init__(self):
+    def __init__(self, usar_journal=False, lote_fsync=100, umbral_compactacion=10000,
+                 indicadores_carga=None, año_desde=None, año_hasta=None, mostrar_progreso=False,
+                 compresion=None, acceso_compartido=False, perfil=None, cache=None, solo_lectura=False):
+        
+        # Caché de resultados en disco opcional. Se instala antes del perfil, que así mide también los aciertos.
+        self.cache = cache
+        if cache is not None:
+            cache.instrumentar(self)
+        
+        # Perfilado opcional: se reemplazan los métodos de esta instancia, así que sin perfil no cuesta nada.
+        self.perfil = perfil
+        if perfil is not None:
+            perfil.instrumentar(self)
+        
+        if compresion not in (None,) + COMPRESIONES:
+            raise ValueError(f"Compresión no soportada: {compresion}")
+        if compresion == "zstd" and _modulo_zstd() is None:
+            raise ImportError("La compresión zstd requiere el paquete zstandard (pip install zstandard).")
+        self.compresion = compresion
+        
+        # Modo compartido: varios procesos usan los mismos archivos. Las escrituras toman un cerrojo
+        # exclusivo y cada archivo guardado incrementa su generación en ARCHIVO_GENERACIONES, que los
+        # demás procesos comparan con la que cargaron para saber qué recargar.
+        self.bloqueo = BloqueoArchivo(ARCHIVO_BLOQUEO) if acceso_compartido else None
+        self.generaciones = {}
+        self.archivos_guardados = set()
+        
+        # version_datos cambia con cada modificación efectiva de la población; si coincide con
+        # version_guardada, poblacion.json ya está al día y no se vuelve a escribir.
+        self.version_datos = 0
+        self.version_guardada = 0
+        
+        # Generación de los datos para CacheResultados: huella de los archivos tal como se cargaron, más
+        # un contador de las escrituras que este proceso hizo después (ver _generacion).
+        self.generacion_datos = None
+        self.escrituras = 0
+        
+        # Filtros de carga: con cualquiera de ellos los datos quedan incompletos y no se guardan.
+        self.indicadores_carga = set(indicadores_carga) if indicadores_carga else None
+        self.año_desde = año_desde
+        self.año_hasta = año_hasta
+        self.mostrar_progreso = mostrar_progreso
+        self.carga_parcial = (self.indicadores_carga is not None or año_desde is not None or
+                              año_hasta is not None)
+        
+        # Solo lectura (report, batch): el journal pendiente se reproduce, pero ningún archivo se modifica;
+        # ni se compacta al iniciar ni se aceptan escrituras.
+        self.solo_lectura = solo_lectura
+        
+        self.journal = JournalPoblacion(ARCHIVO_JOURNAL, lote_fsync)
+        self.umbral_compactacion = umbral_compactacion
+        
+        with self.bloqueo.bloquear(exclusivo=False) if self.bloqueo else contextlib.nullcontext():
+            if self.bloqueo is not None:
+                self.generaciones = _leer_generaciones()
+            self._cargar_indicadores()
+            self._cargar_paises()
+            self._cargar_datos()
+            self._registrar_generacion()
+        
+        if not usar_journal:
+            if self.journal.registros and not self.carga_parcial and not self.solo_lectura:
+                self.compactar()
+            self.journal = None
+    
+    def _cargar_indicadores(self):
+        
+        self.indicadores = self._cargar_json('indicadores.json')
+        self.catalogo_indicadores = CatalogoIndicadores(self.indicadores)
+    
+    def _cargar_paises(self):
+        
+        self.paises = self._cargar_json('paises.json')
+        self.catalogo_paises = CatalogoPaises(self.paises)
+    
+    def _cargar_datos(self):
+        """Carga poblacion.json y reproduce el journal completo."""
+        
+        self.crecimientos = {}   # (pais, indicador_id) -> CrecimientoSerie
+        self.rangos = {}         # (pais, indicador_id) -> RangosSerie
+        self.ordenes_serie = {}  # (pais, indicador_id) -> OrdenValores de (posicion, ano, valor)
+        self.ordenes_año = {}    # (indicador_id, ano) -> OrdenValores de (pais, valor)
+        self.series_preparadas = {}   # indicador_id -> países del catálogo con sus series en caché
+        self._cargar_poblacion()
+        self.version_guardada = self.version_datos
+        
+        # El journal se reproduce siempre: puede quedar de una sesión anterior interrumpida.
+        self._reproducir_journal()
+    
+    def _reproducir_journal(self, desde=0):
+        
+        journal = self.journal or JournalPoblacion(ARCHIVO_JOURNAL)
+        for dato in journal.leer(desde):
+            if self._en_filtro_carga(dato):
+                self._aplicar_dato(dato)
+        self.posicion_journal = journal.posicion
+    
+    def recargar_si_cambio(self):
+        """En modo compartido, lee lo que otros procesos escribieron desde la última carga: los archivos
+        cuya generación cambió y, si solo creció el journal, únicamente sus líneas nuevas.
+        
+        Devuelve True si se recargó algo. Si un escritor tiene el cerrojo no espera: se siguen usando
+        los datos actuales y se vuelve a intentar en la siguiente llamada.
+        """
+        
+        if self.bloqueo is None:
+            return False
+        if (_leer_generaciones() == self.generaciones and
+                _tamaño_archivo(ARCHIVO_JOURNAL) == self.posicion_journal):
+            return False
+        if not self.bloqueo.adquirir(exclusivo=False, esperar=False):
+            return False
+        
+        try:
+            generaciones = _leer_generaciones()
+            cambiados = {nombre for nombre in generaciones.keys() | self.generaciones.keys()
+                         if generaciones.get(nombre) != self.generaciones.get(nombre)}
+            if 'indicadores.json' in cambiados:
+                self._cargar_indicadores()
+            if 'paises.json' in cambiados:
+                self._cargar_paises()
+            
+            if ('poblacion.json' in cambiados or ARCHIVO_JOURNAL in cambiados or
+                    _tamaño_archivo(ARCHIVO_JOURNAL) < self.posicion_journal):
+                self._cargar_datos()
+            else:
+                self._reproducir_journal(self.posicion_journal)
+            self.generaciones = generaciones
+            self._registrar_generacion()
+        finally:
+            self.bloqueo.liberar()
+        return True
+    
+    def _archivos_datos(self):
+        
+        return ('indicadores.json', 'paises.json', 'poblacion.json', ARCHIVO_JOURNAL)
+    
+    def _registrar_generacion(self):
+        """Toma la huella (inodo, tamaño y fecha de modificación) de los archivos recién cargados, junto con
+        el almacén y los filtros de carga. Otro proceso que cargue los mismos archivos obtiene la misma."""
+        
+        partes = [type(self).__name__, sorted(self.indicadores_carga or ()), self.año_desde, self.año_hasta]
+        for nombre_archivo in self._archivos_datos():
+            try:
+                estado = os.stat(nombre_archivo)
+                partes.append((nombre_archivo, estado.st_ino, estado.st_size, estado.st_mtime_ns))
+            except FileNotFoundError:
+                partes.append((nombre_archivo, None))
+        self.generacion_datos = hashlib.sha256(repr(partes).encode("utf-8")).hexdigest()
+        self.escrituras = 0
+    
+    def _nueva_generacion(self):
+        
+        # Las escrituras de este proceso llevan un identificador propio: sus resultados no se mezclan con
+        # los de otro proceso que haya partido de los mismos archivos y escrito otra cosa.
+        if not self.escrituras:
+            self.id_escrituras = os.urandom(8).hex()
+        self.escrituras += 1
+    
+    def _generacion(self):
+        
+        if not self.escrituras:
+            return self.generacion_datos
+        return f"{self.generacion_datos}:{self.id_escrituras}:{self.escrituras}"
+    
+    def _publicar_generaciones(self):
+        """Incrementa la generación de los archivos guardados en esta escritura (con el cerrojo tomado)."""
+        
+        if self.archivos_guardados:
+            generaciones = _leer_generaciones()
+            for nombre_archivo in self.archivos_guardados:
+                generaciones[nombre_archivo] = generaciones.get(nombre_archivo, 0) + 1
+            
+            temporal = ARCHIVO_GENERACIONES + '.tmp'
+            with open(temporal, 'w', encoding='utf-8') as archivo:
+                json.dump(generaciones, archivo)
+            os.replace(temporal, ARCHIVO_GENERACIONES)
+            
+            self.generaciones = generaciones
+            self.archivos_guardados.clear()
+        
+        # Lo que este proceso anexó al journal ya está aplicado en memoria.
+        self.posicion_journal = _tamaño_archivo(ARCHIVO_JOURNAL)
+    
+    def _cargar_poblacion(self):
+        
+        self._inicializar_poblacion(self._leer_poblacion('poblacion.json'))
+    
+    def _inicializar_poblacion(self, datos):
+        
+        # datos puede ser un generador: cada fila se indexa a medida que se lee.
+        self.poblacion = [] if self.perfil is None else FilasContadas(self.perfil)
+        self.indice = IndicePoblacion()
+        for dato in datos:
+            registro = RegistroPoblacion.desde_dict(dato)
+            self.poblacion.append(registro)
+            self.indice.agregar(len(self.poblacion) - 1, registro)
+    
+    def _en_filtro_carga(self, dato):
+        
+        return ((self.indicadores_carga is None or dato["indicador_id"] in self.indicadores_carga) and
+                (self.año_desde is None or dato["ano"] >= self.año_desde) and
+                (self.año_hasta is None or dato["ano"] <= self.año_hasta))
+    
+    def _leer_poblacion(self, nombre_archivo):
+        """Genera las filas de poblacion.json sin cargar el archivo completo, aplicando los filtros de carga."""
+        
+        try:
+            archivo = abrir_json(nombre_archivo)
+        except FileNotFoundError:
+            print(f"Advertencia: El archivo {nombre_archivo} no fue encontrado. Se inicializará vacío.")
+            return
+        
+        progreso = None
+        if self.mostrar_progreso:
+            tamaño = max(os.path.getsize(nombre_archivo), 1)
+            
+            def progreso(leidos):
+                print(f"\rCargando {nombre_archivo}: {min(leidos / tamaño, 1):.0%}", end="", file=sys.stderr, flush=True)
+        
+        filas = 0
+        with archivo:
+            try:
+                for dato in leer_json_en_flujo(archivo, progreso=progreso):
+                    if self.carga_parcial and not self._en_filtro_carga(dato):
+                        continue
+                    filas += 1
+                    yield dato
+            except json.JSONDecodeError:
+                # Lo ya leído se conserva, pero no se guarda encima del archivo dañado.
+                print(f"Error: El archivo {nombre_archivo} no contiene JSON válido.")
+                self.carga_parcial = True
+        
+        if self.mostrar_progreso:
+            print(f"\rCargando {nombre_archivo}: 100% ({filas} filas)", file=sys.stderr)
+    
+    def _permitir_escritura(self, catalogo=False):
+        
+        if self.solo_lectura:
+            print("Error: El sistema se abrió en modo de solo lectura; no se pueden guardar cambios.")
+            return False
+        if self.carga_parcial and not catalogo:
+            print("Error: Los datos de población se cargaron de forma parcial; no se pueden guardar cambios.")
+            return False
+        return True
+    
+    def _estadisticas(self):
+        
+        return self.indice.estadisticas
+    
+    def _cobertura(self):
+        
+        return self.indice.cobertura
+    
+    def _año_maximo(self):
+        
+        return self._estadisticas().año_maximo
+    
+    def _cargar_json(self, nombre_archivo):
+        
+        try:
+            with abrir_json(nombre_archivo) as archivo:
+                return json.load(archivo)
+        except FileNotFoundError:
+            print(f"Advertencia: El archivo {nombre_archivo} no fue encontrado. Se inicializará vacío.")
+            return []
+        except json.JSONDecodeError:
+            print(f"Error: El archivo {nombre_archivo} no contiene JSON válido.")
+            return []
+    
+    def _guardar_json(self, datos, nombre_archivo):
+        """Escritura atómica: archivo temporal, fsync y os.replace, así un corte nunca deja el archivo a medias.
+        
+        poblacion.json se escribe compacto (y comprimido si se configuró); los catálogos, indentados.
+        """
+        
+        es_poblacion = nombre_archivo == 'poblacion.json'
+        contenido = _codificar_json(datos, compacto=es_poblacion)
+        compresion = self.compresion if es_poblacion else None
+        
+        # El nombre temporal lleva el pid: dos procesos que guardan a la vez no se pisan el archivo.
+        temporal = f"{nombre_archivo}.{os.getpid()}.tmp"
+        with open(temporal, 'wb') as archivo:
+            if compresion == 'gzip':
+                with gzip.GzipFile(filename='', fileobj=archivo, mode='wb', compresslevel=6) as comprimido:
+                    comprimido.write(contenido)
+            elif compresion == 'zstd':
+                with _modulo_zstd().open(archivo, 'wb') as comprimido:
+                    comprimido.write(contenido)
+            else:
+                archivo.write(contenido)
+            archivo.flush()
+            os.fsync(archivo.fileno())
+        os.replace(temporal, nombre_archivo)
+        if self.bloqueo is not None:
+            self.archivos_guardados.add(nombre_archivo)
+        
+        if hasattr(os, 'O_DIRECTORY'):
+            directorio = os.open(os.path.dirname(os.path.abspath(nombre_archivo)), os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(directorio)
+            finally:
+                os.close(directorio)
+    
+    def _aplicar_dato(self, dato):
+        
+        posicion = self.indice.por_clave.get((dato["ano"], dato["codigo_iso3"], dato["indicador_id"]))
+        if posicion is not None:
+            
+            registro = self.poblacion[posicion]
+            if (_mismo_valor(registro.valor, dato["valor"]) and registro.estado == dato["estado"] and
+                    registro.unidad == dato["unidad"]):
+                return posicion
+            
+            self.version_datos += 1
+            registro.valor = dato["valor"]
+            registro.estado = _internar(dato["estado"])
+            registro.unidad = _internar(dato["unidad"])
+            self._invalidar_serie(registro.pais, dato["indicador_id"], dato["ano"])
+            return posicion
+        
+        self.version_datos += 1
+        registro = RegistroPoblacion.desde_dict(dato)
+        self.poblacion.append(registro)
+        self.indice.agregar(len(self.poblacion) - 1, registro)
+        self._invalidar_serie(dato["pais"], dato["indicador_id"], dato["ano"])
+        return len(self.poblacion) - 1
+    
+    def _invalidar_serie(self, pais, indicador_id, año):
+        """Descarta el crecimiento y los órdenes por valor precalculados y actualiza el año en el árbol de rangos."""
+        
+        self.crecimientos.pop((pais, indicador_id), None)
+        self.ordenes_serie.pop((pais, indicador_id), None)
+        self.ordenes_año.pop((indicador_id, año), None)
+        self.series_preparadas.pop(indicador_id, None)
+        
+        rangos = self.rangos.get((pais, indicador_id))
+        if rangos is not None:
+            if rangos.contiene(año):
+                rangos.asignar(año, self._valores_serie(pais, indicador_id, año, año)[1])
+            else:
+                del self.rangos[(pais, indicador_id)]
+    
+    def _guardar_poblacion(self):
+        """Guarda poblacion.json, salvo que no haya cambios desde el último guardado."""
+        
+        if self.version_guardada == self.version_datos:
+            return
+        self._guardar_json(self.poblacion, 'poblacion.json')
+        self.version_guardada = self.version_datos
+        
+        # En modo compartido el journal puede tener cambios de otros procesos, que ya se reprodujeron
+        # y quedaron en poblacion.json: se vacía para que no se vuelvan a aplicar sobre los nuevos.
+        if self.bloqueo is not None and _tamaño_archivo(ARCHIVO_JOURNAL):
+            self._vaciar_journal()
+    
+    def _vaciar_journal(self):
+        
+        (self.journal or JournalPoblacion(ARCHIVO_JOURNAL)).vaciar()
+        if self.bloqueo is not None:
+            self.archivos_guardados.add(ARCHIVO_JOURNAL)
+    
+    def _persistir_dato(self, dato):
+        
+        if self.journal is None:
+            self._guardar_poblacion()
+            return
+        
+        self.journal.anexar(dato)
+        if self.journal.registros >= self.umbral_compactacion:
+            self.compactar()
+    
+    @_escritura
+    def compactar(self):
+        """Integra el journal en poblacion.json (escritura atómica) y lo vacía."""
+        
+        if self.journal is None or self.carga_parcial or self.solo_lectura:
+            return
+        
+        self.journal.sincronizar()
+        self._guardar_poblacion()
+        self._vaciar_journal()
+    
+    def cerrar(self):
+        
+        if self.journal is not None:
+            self.journal.cerrar()
+    
+    def _nombre_pais(self, pais):
+        """Nombre de un país dado por nombre, ISO2, ISO3 o alias; si no está en el catálogo se devuelve tal cual."""
+        
+        id_pais = self.catalogo_paises.buscar(pais)
+        return pais if id_pais is None else self.paises[id_pais]["nombre"]
+    
+    def _id_indicador(self, indicador_id):
+        
+        id_interno = self.catalogo_indicadores.buscar(indicador_id)
+        return indicador_id if id_interno is None else self.indicadores[id_interno]["id_indicador"]
+    
+    @_escritura
+    def agregar_dato_poblacion(self, año, pais, indicador_id, valor, estado="disponible", unidad="personas"):
+        
+        
+        if not self._permitir_escritura():
+            return False
+        
+        id_pais = self.catalogo_paises.buscar(pais)
+        codigo_iso3 = self.paises[id_pais]["codigo_iso3"] if id_pais is not None else None
+        
+        if not codigo_iso3:
+            print(f"Error: País '{pais}' no encontrado.")
+            return False
+        
+        id_interno = self.catalogo_indicadores.buscar(indicador_id)
+        descripcion_indicador = self.indicadores[id_interno]["descripcion"] if id_interno is not None else None
+        
+        if not descripcion_indicador:
+            print(f"Error: Indicador '{indicador_id}' no encontrado.")
+            return False
+        
+        nuevo_dato = {
+            "ano": año,
+            "pais": self.paises[id_pais]["nombre"],
+            "codigo_iso3": codigo_iso3,
+            "indicador_id": self.indicadores[id_interno]["id_indicador"],
+            "descripcion": descripcion_indicador,
+            "valor": valor,
+            "estado": estado,
+            "unidad": unidad
+        }
+        
+        version = self.version_datos
+        self._aplicar_dato(nuevo_dato)
+        if self.version_datos != version:
+            self._nueva_generacion()
+            self._persistir_dato(nuevo_dato)
+        return True
+    
+    @_escritura
+    def agregar_datos_poblacion_lote(self, filas):
+        """Inserta o actualiza muchas filas y guarda una sola vez al final.
+        
+        Cada fila es un dict con ano (o año), pais (nombre, ISO2, ISO3 o alias; o codigo_iso3),
+        indicador_id, valor y, opcionalmente, estado y unidad. Devuelve los conteos y los rechazos
+        por número de fila; las filas iguales a las ya guardadas cuentan como sin_cambios y no se
+        vuelve a guardar nada si todas lo son.
+        """
+        
+        resultado = {"insertados": 0, "actualizados": 0, "sin_cambios": 0, "rechazados": []}
+        rechazados = resultado["rechazados"]
+        if not self._permitir_escritura():
+            rechazados.append((0, "Datos cargados de forma parcial"))
+            return resultado
+        
+        for numero, fila in enumerate(filas, 1):
+            if fila is None:
+                rechazados.append((numero, "Fila ilegible"))
+                continue
+            
+            try:
+                año = int(fila["ano"] if "ano" in fila else fila["año"])
+                valor = _convertir_valor(fila["valor"])
+            except (KeyError, TypeError, ValueError):
+                rechazados.append((numero, "Año o valor inválido"))
+                continue
+            
+            id_pais = self.catalogo_paises.buscar(fila.get("pais"))
+            if id_pais is None:
+                id_pais = self.catalogo_paises.buscar(fila.get("codigo_iso3"))
+            if id_pais is None:
+                rechazados.append((numero, f"País '{fila.get('pais')}' no encontrado"))
+                continue
+            
+            id_interno = self.catalogo_indicadores.buscar(fila.get("indicador_id"))
+            indicador = self.indicadores[id_interno] if id_interno is not None else None
+            if not indicador or not indicador["descripcion"]:
+                rechazados.append((numero, f"Indicador '{fila.get('indicador_id')}' no encontrado"))
+                continue
+            
+            pais = self.paises[id_pais]
+            total = len(self.poblacion)
+            version = self.version_datos
+            self._aplicar_dato({
+                "ano": año,
+                "pais": pais["nombre"],
+                "codigo_iso3": pais["codigo_iso3"],
+                "indicador_id": indicador["id_indicador"],
+                "descripcion": indicador["descripcion"],
+                "valor": valor,
+                "estado": fila.get("estado") or "disponible",
+                "unidad": fila.get("unidad") or "personas"
+            })
+            if len(self.poblacion) > total:
+                resultado["insertados"] += 1
+            elif self.version_datos != version:
+                resultado["actualizados"] += 1
+            else:
+                resultado["sin_cambios"] += 1
+        
+        if resultado["insertados"] or resultado["actualizados"]:
+            self._nueva_generacion()
+            if self.journal is None:
+                self._guardar_poblacion()
+            else:
+                self.compactar()
+        
+        return resultado
+    
+    @_escritura
+    def agregar_pais(self, nombre, codigo_iso, codigo_iso3):
+        
+        if not self._permitir_escritura(catalogo=True):
+            return False
+        
+        if codigo_iso3 in self.catalogo_paises.por_iso3:
+            print(f"Error: Ya existe un país con el código ISO3 '{codigo_iso3}'.")
+            return False
+        
+        nuevo_pais = {
+            "nombre": nombre,
+            "codigo_iso": codigo_iso,
+            "codigo_iso3": codigo_iso3
+        }
+        
+        self.catalogo_paises.agregar(nuevo_pais)
+        self._nueva_generacion()
+        self._guardar_json(self.paises, 'paises.json')
+        return True
+    
+    @_escritura
+    def agregar_indicador(self, id_indicador, descripcion):
+        
+        if not self._permitir_escritura(catalogo=True):
+            return False
+        
+        if id_indicador in self.catalogo_indicadores.por_id:
+            print(f"Error: Ya existe un indicador con el ID '{id_indicador}'.")
+            return False
+        
+        nuevo_indicador = {
+            "id_indicador": id_indicador,
+            "descripcion": descripcion
+        }
+        
+        self.catalogo_indicadores.agregar(nuevo_indicador)
+        self._nueva_generacion()
+        self._guardar_json(self.indicadores, 'indicadores.json')
+        return True
+    
+    def _serie(self, pais, indicador_id):
+        
+        return self.indice.serie(self._nombre_pais(pais), self._id_indicador(indicador_id))
+    
+    def query(self):
+        """Consulta perezosa y componible sobre la población (ver ConsultaPoblacion)."""
+        
+        return ConsultaPoblacion(self)
+    
+    def _plan_consulta(self, consulta):
+        """(índice elegido, posiciones en orden de inserción) según los filtros de país, indicador y años."""
+        
+        indice = self.indice
+        indicador_id = None if consulta.filtro_indicador is None else self._id_indicador(consulta.filtro_indicador)
+        
+        if consulta.filtro_pais is not None:
+            pais = self._nombre_pais(consulta.filtro_pais)
+            if indicador_id is not None:
+                return "serie", iter(sorted(indice.serie(pais, indicador_id).rango(consulta.desde, consulta.hasta)))
+            # Una serie por indicador del país, mezcladas por posición.
+            return "series del país", heapq.merge(*(sorted(indice.serie(pais, indicador).rango(consulta.desde, consulta.hasta))
+                                                     for indicador in indice.indicadores_pais.get(pais, [])))
+        
+        if indicador_id is not None and consulta.desde is not None and consulta.desde == consulta.hasta:
+            return "año", iter(indice.por_año.get((consulta.desde, indicador_id), ()))
+        if indicador_id is not None or consulta.desde is not None or consulta.hasta is not None:
+            return "años", indice.posiciones_años(indicador_id, consulta.desde, consulta.hasta)
+        
+        return "recorrido completo", iter(range(len(self.poblacion)))
+    
+    def _fila_consulta(self, posicion):
+        
+        return self.poblacion[posicion].a_dict()
+    
+    def _valor_consulta(self, posicion):
+        
+        return self.poblacion[posicion].valor
+    
+    def _agregar_consulta(self, consulta, funcion):
+        
+        if funcion == "count":
+            return sum(1 for _ in consulta._recorrer())
+        
+        valores = (valor for valor in consulta.valores() if valor is not None)
+        if funcion == "sum":
+            return sum(valores)
+        if funcion == "min":
+            return min(valores, default=None)
+        if funcion == "max":
+            return max(valores, default=None)
+        
+        suma = cantidad = 0
+        for valor in valores:
+            suma += valor
+            cantidad += 1
+        return suma / cantidad if cantidad else None
+    
+    def obtener_datos_poblacion_pais(self, pais, año_inicio, año_fin):
+        
+        return self.query().pais(pais).años(año_inicio, año_fin).a_lista()
+    
+    def _crecimiento_serie(self, pais, indicador_id):
+        
+        pais, indicador_id = self._nombre_pais(pais), self._id_indicador(indicador_id)
+        crecimiento = self.crecimientos.get((pais, indicador_id))
+        if crecimiento is None:
+            crecimiento = self.crecimientos[(pais, indicador_id)] = self._calcular_crecimiento_serie(pais, indicador_id)
+        return crecimiento
+    
+    def _calcular_crecimiento_serie(self, pais, indicador_id):
+        
+        serie = self.indice.serie(pais, indicador_id)
+        return CrecimientoSerie.desde_valores(serie.años, [self.poblacion[posicion].valor
+                                                          for posicion in serie.posiciones])
+    
+    def _valores_serie(self, pais, indicador_id, año_inicio=None, año_fin=None):
+        """Devuelve (años, valores) de la serie ordenada por año, opcionalmente limitada a un rango."""
+        
+        serie = self.indice.serie(pais, indicador_id)
+        if año_inicio is None:
+            return serie.años, [self.poblacion[posicion].valor for posicion in serie.posiciones]
+        
+        inicio = bisect.bisect_left(serie.años, año_inicio)
+        fin = bisect.bisect_right(serie.años, año_fin)
+        return serie.años[inicio:fin], [self.poblacion[posicion].valor for posicion in serie.posiciones[inicio:fin]]
+    
+    def _rangos_serie(self, pais, indicador_id):
+        
+        pais, indicador_id = self._nombre_pais(pais), self._id_indicador(indicador_id)
+        rangos = self.rangos.get((pais, indicador_id))
+        if rangos is None:
+            rangos = self.rangos[(pais, indicador_id)] = RangosSerie(*self._valores_serie(pais, indicador_id))
+        return rangos
+    
+    def _resumen_rango(self, pais, indicador_id, año_inicio, año_fin):
+        """(suma, cantidad, mínimo, máximo) de los valores de la serie entre dos años, o None."""
+        
+        return self._rangos_serie(pais, indicador_id).consultar(año_inicio, año_fin)
+    
+    def calcular_crecimiento_poblacional(self, pais, año_inicio, año_fin, indicador_id="SP.POP.TOTL"):
+        """Calcula el crecimiento poblacional año a año para un país"""
+        
+        crecimiento = self._crecimiento_serie(pais, indicador_id)
+        inicio, fin = crecimiento.rango(año_inicio, año_fin)
+        
+        return [{
+            "año": crecimiento.años[k],
+            "poblacion": crecimiento.valores[k],
+            "crecimiento_absoluto": crecimiento.absolutos[k - 1],
+            "crecimiento_porcentual": crecimiento.porcentajes[k - 1]
+        } for k in range(inicio, fin)]
+    
+    def listar_paises(self):
+        
+        return self.paises
+    
+    def obtener_datos_por_indicador(self, indicador_id):
+        
+        return self.query().indicador(indicador_id).a_lista()
+    
+    def obtener_datos_ultimos_años(self, num_años):
+        
+        
+        if not self.poblacion:
+            return []
+        
+        año_máximo = self._año_maximo()
+        año_inicio = año_máximo - num_años + 1  
+        
+        return self.query().años(desde=año_inicio).a_lista()
+    
+    def obtener_poblacion_pais_año(self, pais, año, indicador_id="SP.POP.TOTL"):
+        
+        return next(self.query().pais(pais).indicador(indicador_id).años(año, año).valores(), None)
+    
+    def obtener_poblacion_antes_año(self, año, indicador_id="SP.POP.TOTL"):
+        
+        return self.query().indicador(indicador_id).años(hasta=año - 1).a_lista()
+    
+    def obtener_poblacion_despues_año(self, año, indicador_id="SP.POP.TOTL"):
+        
+        return self.query().indicador(indicador_id).años(desde=año + 1).a_lista()
+    
+    def calcular_porcentaje_crecimiento(self, pais, año_inicio, año_fin, indicador_id="SP.POP.TOTL"):
+        
+        pob_inicio = self.obtener_poblacion_pais_año(pais, año_inicio, indicador_id)
+        pob_fin = self.obtener_poblacion_pais_año(pais, año_fin, indicador_id)
+        
+        return _porcentaje_crecimiento(pob_inicio, pob_fin)
+    
+    def obtener_año_poblacion_minima(self, pais, indicador_id="SP.POP.TOTL"):
+        
+        fila = self._orden_serie(pais, indicador_id).minimo()
+        return fila[1] if fila is not None else None
+    
+    def contar_registros_por_año(self):
+        
+        return dict(self._estadisticas().registros_por_año)
+    
+    def paises_crecimiento_mayor(self, porcentaje, num_años, indicador_id="SP.POP.TOTL"):
+        
+        
+        if not self.poblacion:
+            return []
+        
+        año_máximo = self._año_maximo()
+        año_inicio = año_máximo - num_años + 1
+        
+        resultados = []
+        
+        for pais in self.paises:
+            nombre_pais = pais["nombre"]
+            
+            crecimiento = self._crecimiento_serie(nombre_pais, indicador_id)
+            inicio, fin = crecimiento.rango(año_inicio, año_máximo)
+            
+            if inicio < fin:
+                crecimiento_promedio = sum(crecimiento.porcentajes[inicio - 1:fin - 1]) / (fin - inicio)
+                
+                if crecimiento_promedio > porcentaje:
+                    resultados.append({
+                        "pais": nombre_pais,
+                        "crecimiento_promedio": round(crecimiento_promedio, 2)
+                    })
+        
+        return resultados
+    
+    def años_poblacion_mayor(self, pais, umbral, indicador_id="SP.POP.TOTL"):
+        
+        # Las filas sobre el umbral salen por valor; se devuelven en orden de inserción.
+        return [año for _, año, _ in sorted(self._orden_serie(pais, indicador_id).sobre(umbral))]
+    
+    def obtener_poblacion_total_año(self, año, indicador_id="SP.POP.TOTL"):
+        
+        return self.query().indicador(indicador_id).años(año, año).agg("sum")
+    
+    def obtener_poblacion_minima_periodo(self, pais, num_años, indicador_id="SP.POP.TOTL"):
+        
+        
+        if not self.poblacion:
+            return None
+        
+        año_máximo = self._año_maximo()
+        año_inicio = año_máximo - num_años + 1
+        
+        resumen = self._resumen_rango(pais, indicador_id, año_inicio, año_máximo)
+        
+        if resumen is None:
+            return None
+        
+        return resumen[2]
+    
+    def calcular_promedio_poblacion(self, pais, año_inicio, año_fin, indicador_id="SP.POP.TOTL"):
+        
+        resumen = self._resumen_rango(pais, indicador_id, año_inicio, año_fin)
+        
+        if resumen is None:
+            return None
+        
+        suma, cantidad, _, _ = resumen
+        return round(suma / cantidad, 2)
+    
+    def resumen_periodo(self, pais, año_inicio, año_fin, indicador_id="SP.POP.TOTL"):
+        """Suma, cantidad, promedio, mínimo y máximo de los valores de un país entre dos años."""
         
-        self.indicadores = self._cargar_json('indicadores.json')
-        self.paises = self._cargar_json('paises.json')
-        self.poblacion = self._cargar_json('poblacion.json')
+        resumen = self._resumen_rango(pais, indicador_id, año_inicio, año_fin)
+        
+        if resumen is None:
+            return None
+        
+        suma, cantidad, minimo, maximo = resumen
+        return {
+            "suma": suma,
+            "cantidad": cantidad,
+            "promedio": round(suma / cantidad, 2),
+            "minimo": minimo,
+            "maximo": maximo
+        }
     
-    def _cargar_json(self, nombre_archivo):
+    def contar_años_datos_disponibles(self, pais, indicador_id="SP.POP.TOTL"):
         
-        try:
-            with open(nombre_archivo, 'r', encoding='utf-8') as archivo:
-                return json.load(archivo)
-        except FileNotFoundError:
-            print(f"Advertencia: El archivo {nombre_archivo} no fue encontrado. Se inicializará vacío.")
-            return []
-        except json.JSONDecodeError:
-            print(f"Error: El archivo {nombre_archivo} no contiene JSON válido.")
-            return []
+        return self._cobertura().cantidad(self._nombre_pais(pais), self._id_indicador(indicador_id))
     
-    def _guardar_json(self, datos, nombre_archivo):
+    def paises_datos_completos(self, año_inicio, año_fin, indicador_id="SP.POP.TOTL"):
         
-        with open(nombre_archivo, 'w', encoding='utf-8') as archivo:
-            json.dump(datos, archivo, indent=4, ensure_ascii=False)
+        return self._cobertura().completos([pais["nombre"] for pais in self.paises],
+                                           self._id_indicador(indicador_id), año_inicio, año_fin)
     
-    def agregar_dato_poblacion(self, año, pais, indicador_id, valor, estado="disponible", unidad="personas"):
+    def años_crecimiento_mayor(self, pais, umbral, indicador_id="SP.POP.TOTL"):
         
+        return self._crecimiento_serie(pais, indicador_id).años_mayor(umbral)
+    
+    def obtener_poblacion_por_decada(self, pais, decada_inicio, indicador_id="SP.POP.TOTL"):
         
-        codigo_iso3 = None
-        for p in self.paises:
-            if p["nombre"] == pais:
-                codigo_iso3 = p["codigo_iso3"]
-                break
         
-        if not codigo_iso3:
-            print(f"Error: País '{pais}' no encontrado.")
-            return False
+        decada_inicio = (decada_inicio // 10) * 10
         
-        descripcion_indicador = None
-        for ind in self.indicadores:
-            if ind["id_indicador"] == indicador_id:
-                descripcion_indicador = ind["descripcion"]
-                break
+        if not self.poblacion:
+            return []
         
-        if not descripcion_indicador:
-            print(f"Error: Indicador '{indicador_id}' no encontrado.")
-            return False
+        return self._crecimiento_serie(pais, indicador_id).por_decada(decada_inicio, self._año_maximo())
+    
+    def años_sin_datos(self, pais, año_inicio, año_fin, indicador_id="SP.POP.TOTL"):
         
-        for i, dato in enumerate(self.poblacion):
-            if (dato["ano"] == año and 
-                dato["codigo_iso3"] == codigo_iso3 and 
-                dato["indicador_id"] == indicador_id):
-                
-                self.poblacion[i]["valor"] = valor
-                self.poblacion[i]["estado"] = estado
-                self.poblacion[i]["unidad"] = unidad
-                self._guardar_json(self.poblacion, 'poblacion.json')
-                return True
+        return self._cobertura().faltantes(self._nombre_pais(pais), self._id_indicador(indicador_id),
+                                           año_inicio, año_fin)
+    
+    def obtener_año_poblacion_maxima(self, pais, indicador_id="SP.POP.TOTL"):
         
-        nuevo_dato = {
-            "ano": año,
-            "pais": pais,
-            "codigo_iso3": codigo_iso3,
-            "indicador_id": indicador_id,
-            "descripcion": descripcion_indicador,
-            "valor": valor,
-            "estado": estado,
-            "unidad": unidad
-        }
+        fila = self._orden_serie(pais, indicador_id).maximo()
+        return fila[1] if fila is not None else None
+    
+    def top_k(self, indicador_id, año, k=10):
+        """Los k países con mayor valor del indicador en el año, de mayor a menor."""
         
-        self.poblacion.append(nuevo_dato)
-        self._guardar_json(self.poblacion, 'poblacion.json')
-        return True
+        return [{"pais": pais, "valor": valor}
+                for pais, valor in self._orden_año(self._id_indicador(indicador_id), año).mayores(k)]
     
-    def agregar_pais(self, nombre, codigo_iso, codigo_iso3):
+    def valores_entre(self, indicador_id, minimo=None, maximo=None, año_inicio=None, año_fin=None):
+        """Filas (país, año, valor) del indicador con minimo <= valor <= maximo (None no limita), por año
+        y de mayor a menor valor dentro de cada año."""
         
+        indicador_id = self._id_indicador(indicador_id)
+        resultados = []
+        for año in sorted(self._cobertura().paises_por_año.get(indicador_id, ())):
+            if (año_inicio is None or año >= año_inicio) and (año_fin is None or año <= año_fin):
+                resultados.extend({"pais": pais, "año": año, "valor": valor}
+                                  for pais, valor in self._orden_año(indicador_id, año).entre(minimo, maximo))
+        return resultados
+    
+    def _orden_serie(self, pais, indicador_id):
+        
+        clave = (self._nombre_pais(pais), self._id_indicador(indicador_id))
+        orden = self.ordenes_serie.get(clave)
+        if orden is None:
+            posiciones, años, valores = self._filas_serie(*clave)
+            orden = self.ordenes_serie[clave] = OrdenValores(valores, list(zip(posiciones, años, valores)))
+        return orden
+    
+    def _orden_año(self, indicador_id, año):
         
-        for pais in self.paises:
-            if pais["codigo_iso3"] == codigo_iso3:
-                print(f"Error: Ya existe un país con el código ISO3 '{codigo_iso3}'.")
-                return False
+        orden = self.ordenes_año.get((indicador_id, año))
+        if orden is None:
+            paises, valores = self._filas_año(indicador_id, año)
+            orden = self.ordenes_año[(indicador_id, año)] = OrdenValores(valores, list(zip(paises, valores)))
+        return orden
+    
+    def _filas_serie(self, pais, indicador_id):
+        """(posiciones, años, valores) de las filas de la serie, en orden de inserción."""
         
-        nuevo_pais = {
-            "nombre": nombre,
-            "codigo_iso": codigo_iso,
-            "codigo_iso3": codigo_iso3
-        }
+        posiciones = sorted(self.indice.serie(pais, indicador_id).posiciones)
+        return (posiciones, [self.poblacion[posicion].ano for posicion in posiciones],
+                [self.poblacion[posicion].valor for posicion in posiciones])
+    
+    def _filas_año(self, indicador_id, año):
+        """(países, valores) de las filas del indicador en el año, en orden de inserción."""
         
-        self.paises.append(nuevo_pais)
-        self._guardar_json(self.paises, 'paises.json')
-        return True
+        posiciones = self.indice.por_año.get((año, indicador_id), [])
+        return ([self.poblacion[posicion].pais for posicion in posiciones],
+                [self.poblacion[posicion].valor for posicion in posiciones])
     
-    def agregar_indicador(self, id_indicador, descripcion):
+    def años_datos_multiples_paises(self, umbral_paises, indicador_id="SP.POP.TOTL"):
         
+        conteos = self._cobertura().paises_por_año.get(self._id_indicador(indicador_id), {})
+        return [año for año, paises in conteos.items() if paises > umbral_paises]
+    
+    def obtener_estadisticas(self):
+        """Resumen del conjunto de datos: años extremos y número de filas total, por año y por indicador."""
+        
+        estadisticas = self._estadisticas()
+        return {
+            "registros": len(self.poblacion),
+            "año_minimo": estadisticas.año_minimo,
+            "año_maximo": estadisticas.año_maximo,
+            "registros_por_año": dict(estadisticas.registros_por_año),
+            "registros_por_indicador": dict(estadisticas.registros_por_indicador)
+        }
+    
+    def matriz_indicador(self, indicador_id="SP.POP.TOTL", año_inicio=None, año_fin=None):
+        """Matriz país × año de un indicador, o de uno de INDICADORES_DERIVADOS.
+        
+        Las filas son los países con datos en el rango (en el orden del catálogo) y las columnas todos
+        los años del rango, por defecto del primero al último con datos; None marca un dato faltante.
+        """
+        
+        if indicador_id in INDICADORES_DERIVADOS:
+            numerador, denominador, factor = INDICADORES_DERIVADOS[indicador_id]
+            matriz = self.razon_indicadores(numerador, denominador, año_inicio, año_fin, factor)
+            matriz["indicador_id"] = indicador_id
+            return matriz
+        
+        indicador_id = self._id_indicador(indicador_id)
+        paises, años = self._ejes_matriz((indicador_id,), año_inicio, año_fin)
+        return {
+            "indicador_id": indicador_id,
+            "paises": paises,
+            "años": años,
+            "valores": self._valores_matriz(self._posiciones_matriz(indicador_id, paises, años))
+        }
+    
+    def razon_indicadores(self, numerador, denominador, año_inicio=None, año_fin=None, factor=1):
+        """Matriz país × año de factor * numerador / denominador (por ejemplo, población urbana sobre
+        total). Es None donde falta alguno de los dos valores o el denominador es cero."""
+        
+        numerador, denominador = self._id_indicador(numerador), self._id_indicador(denominador)
+        paises, años = self._ejes_matriz((numerador, denominador), año_inicio, año_fin)
+        return {
+            "indicador_id": f"{numerador}/{denominador}",
+            "paises": paises,
+            "años": años,
+            "valores": self._razon_matriz(self._posiciones_matriz(numerador, paises, años),
+                                          self._posiciones_matriz(denominador, paises, años), factor)
+        }
+    
+    def _ordenar_paises(self, nombres):
+        """Países en el orden del catálogo; los que no están en él van al final, por nombre."""
         
-        for indicador in self.indicadores:
-            if indicador["id_indicador"] == id_indicador:
-                print(f"Error: Ya existe un indicador con el ID '{id_indicador}'.")
-                return False
+        orden = {pais["nombre"]: i for i, pais in enumerate(self.paises)}
+        return sorted(nombres, key=lambda nombre: (orden.get(nombre, len(orden)), nombre))
+    
+    def _ejes_matriz(self, indicadores, año_inicio, año_fin):
+        
+        paises = set()
+        primero = ultimo = None
+        for (pais, ind), serie in self.indice.series.items():
+            if ind not in indicadores:
+                continue
+            inicio = 0 if año_inicio is None else bisect.bisect_left(serie.años, año_inicio)
+            fin = len(serie.años) if año_fin is None else bisect.bisect_right(serie.años, año_fin)
+            if inicio < fin:
+                paises.add(pais)
+                primero = _extremo(min, primero, serie.años[inicio])
+                ultimo = _extremo(max, ultimo, serie.años[fin - 1])
+        
+        return self._rango_ejes(paises, primero, ultimo, año_inicio, año_fin)
+    
+    def _rango_ejes(self, paises, primero, ultimo, año_inicio, año_fin):
         
-        nuevo_indicador = {
-            "id_indicador": id_indicador,
-            "descripcion": descripcion
-        }
+        año_inicio = primero if año_inicio is None else año_inicio
+        año_fin = ultimo if año_fin is None else año_fin
+        años = list(range(año_inicio, año_fin + 1)) if año_inicio is not None and año_fin is not None else []
+        return self._ordenar_paises(paises), años
+    
+    def _posiciones_matriz(self, indicador_id, paises, años):
+        """Posición de la fila de cada (país, año), o None; con años repetidos vale la primera fila."""
+        
+        matriz = []
+        for pais in paises:
+            fila = [None] * len(años)
+            serie = self.indice.serie(pais, indicador_id)
+            inicio = bisect.bisect_left(serie.años, años[0])
+            fin = bisect.bisect_right(serie.años, años[-1])
+            for año, posicion in zip(serie.años[inicio:fin], serie.posiciones[inicio:fin]):
+                if fila[año - años[0]] is None:
+                    fila[año - años[0]] = posicion
+            matriz.append(fila)
+        return matriz
+    
+    def _valores_matriz(self, posiciones):
         
-        self.indicadores.append(nuevo_indicador)
-        self._guardar_json(self.indicadores, 'indicadores.json')
-        return True
+        return [[None if posicion is None else self.poblacion[posicion].valor for posicion in fila]
+                for fila in posiciones]
     
-    def obtener_datos_poblacion_pais(self, pais, año_inicio, año_fin):
+    def _razon_matriz(self, numeradores, denominadores, factor):
+        
+        resultado = []
+        for fila_numerador, fila_denominador in zip(self._valores_matriz(numeradores),
+                                                    self._valores_matriz(denominadores)):
+            resultado.append([a / b * factor if a is not None and b else None
+                              for a, b in zip(fila_numerador, fila_denominador)])
+        return resultado
+    
+    def generar_reporte(self, codigo, **parametros):
+        """Calcula un reporte del módulo de reportes (A-Y) y devuelve sus datos sin imprimir.
         
-        resultados = []
+        Los parámetros por defecto son los de REPORTES y se pueden reemplazar por nombre; indicador_id
+        cambia el indicador de todos los reportes (por defecto SP.POP.TOTL).
+        """
         
-        for dato in self.poblacion:
-            if (dato["pais"] == pais and 
-                año_inicio <= dato["ano"] <= año_fin):
-                resultados.append(dato)
+        codigo = codigo.upper()
+        if codigo not in REPORTES:
+            print(f"Error: Reporte '{codigo}' no encontrado.")
+            return None
         
-        return resultados
+        p = {"indicador_id": "SP.POP.TOTL", **REPORTES[codigo][1]}
+        p.update(parametros)
+        indicador_id = p["indicador_id"]
+        
+        if codigo in REPORTES_POR_PAIS:
+            return self._reporte_por_pais(codigo, p)
+        
+        if codigo == 'A':
+            return [{"pais": pais["nombre"],
+                     "datos": self.obtener_datos_poblacion_pais(pais["nombre"], p["año_inicio"], p["año_fin"])}
+                    for pais in self.listar_paises()]
+        elif codigo == 'B':
+            return self.listar_paises()
+        elif codigo == 'C':
+            return self.obtener_datos_por_indicador(p["indicador_id"])
+        elif codigo == 'D':
+            return self.obtener_datos_ultimos_años(p["num_años"])
+        elif codigo in ('E', 'N', 'S', 'V'):
+            return {"año": p["año"], "total": self.obtener_poblacion_total_año(p["año"], indicador_id)}
+        elif codigo == 'F':
+            return self.obtener_poblacion_antes_año(p["año"], indicador_id)
+        elif codigo == 'G':
+            return self.obtener_poblacion_despues_año(p["año"], indicador_id)
+        elif codigo == 'K':
+            return [{"año": año, "registros": registros}
+                    for año, registros in sorted(self.contar_registros_por_año().items())]
+        elif codigo == 'L':
+            return self.paises_crecimiento_mayor(p["porcentaje"], p["num_años"], indicador_id)
+        elif codigo == 'R':
+            return self.paises_datos_completos(p["año_inicio"], p["año_fin"], indicador_id)
+        elif codigo == 'Y':
+            return self.años_datos_multiples_paises(p["umbral_paises"], indicador_id)
     
-    def calcular_crecimiento_poblacional(self, pais, año_inicio, año_fin):
-        """Calcula el crecimiento poblacional año a año para un país"""
+    def _agrupar_series(self, indicador_id):
+        """{pais: (posiciones, años, valores)} de cada serie del indicador, ordenada por año."""
         
-        datos_poblacion = []
-        for dato in self.poblacion:
-            if (dato["pais"] == pais and 
-                año_inicio <= dato["ano"] <= año_fin and
-                dato["indicador_id"] == "SP.POP.TOTL"):
-                datos_poblacion.append(dato)
+        return {pais: (serie.posiciones, serie.años, [self.poblacion[posicion].valor for posicion in serie.posiciones])
+                for (pais, ind), serie in self.indice.series.items() if ind == indicador_id}
+    
+    def _preparar_series(self, indicador_id):
+        """Agrupa en una sola pasada las series del indicador y deja en caché, para cada país del catálogo
+        que aún no los tenga, su CrecimientoSerie, su RangosSerie y su OrdenValores."""
+        
+        if self.series_preparadas.get(indicador_id) == len(self.paises):
+            return
+        
+        series = self._agrupar_series(indicador_id)
+        for pais in self.paises:
+            clave = (pais["nombre"], indicador_id)
+            posiciones, años, valores = series.get(pais["nombre"], ([], [], []))
+            if clave not in self.crecimientos:
+                self.crecimientos[clave] = CrecimientoSerie.desde_valores(años, valores)
+            if clave not in self.rangos:
+                self.rangos[clave] = RangosSerie(años, valores)
+            if clave not in self.ordenes_serie:
+                # OrdenValores recibe las filas en orden de inserción, como en _orden_serie.
+                orden = sorted(range(len(posiciones)), key=posiciones.__getitem__)
+                self.ordenes_serie[clave] = OrdenValores([valores[k] for k in orden],
+                                                         [(posiciones[k], años[k], valores[k]) for k in orden])
+        self.series_preparadas[indicador_id] = len(self.paises)
+    
+    def _reporte_por_pais(self, codigo, p):
         
-        datos_poblacion.sort(key=lambda x: x["ano"])
+        indicador_id = self._id_indicador(p["indicador_id"])
+        self._preparar_series(indicador_id)
+        año_máximo = self._año_maximo() if len(self.poblacion) else None
         
         resultados = []
-        for i in range(1, len(datos_poblacion)):
-            año_actual = datos_poblacion[i]["ano"]
-            pob_actual = datos_poblacion[i]["valor"]
-            pob_anterior = datos_poblacion[i-1]["valor"]
+        for pais in self.listar_paises():
+            nombre = pais["nombre"]
+            # La serie del país ordenada por año (con su crecimiento), sus rangos y su orden por valor.
+            serie = self.crecimientos[(nombre, indicador_id)]
+            rangos = self.rangos[(nombre, indicador_id)]
+            orden = self.ordenes_serie[(nombre, indicador_id)]
             
-            crecimiento_absoluto = pob_actual - pob_anterior
-            crecimiento_porcentual = (crecimiento_absoluto / pob_anterior) * 100 if pob_anterior > 0 else 0
+            if codigo == 'H':
+                crecimiento = _porcentaje_crecimiento(serie.valor_año(p["año_inicio"]), serie.valor_año(p["año_fin"]))
+                if crecimiento is not None:
+                    resultados.append({"pais": nombre, "crecimiento": crecimiento})
             
-            resultados.append({
-                "año": año_actual,
-                "poblacion": pob_actual,
-                "crecimiento_absoluto": crecimiento_absoluto,
-                "crecimiento_porcentual": round(crecimiento_porcentual, 2)
-            })
+            elif codigo == 'I':
+                poblacion = serie.valor_año(p["año"])
+                if poblacion is not None:
+                    resultados.append({"pais": nombre, "poblacion": poblacion})
+            
+            elif codigo in ('J', 'X'):
+                # La fila del extremo ya trae su año y su valor.
+                fila = orden.minimo() if codigo == 'J' else orden.maximo()
+                if fila is not None:
+                    resultados.append({"pais": nombre, "año": fila[1], "poblacion": fila[2]})
+            
+            elif codigo in ('M', 'T', 'W'):
+                if codigo == 'M':
+                    años = [año for _, año, _ in sorted(orden.sobre(p["umbral"]))]
+                elif codigo == 'T':
+                    años = serie.años_mayor(p["umbral"])
+                else:
+                    disponibles = set(serie.años)
+                    años = [año for año in range(p["año_inicio"], p["año_fin"] + 1) if año not in disponibles]
+                if años:
+                    resultados.append({"pais": nombre, "años": años})
+            
+            elif codigo == 'O':
+                resumen = (rangos.consultar(año_máximo - p["num_años"] + 1, año_máximo)
+                           if año_máximo is not None else None)
+                if resumen is not None:
+                    resultados.append({"pais": nombre, "poblacion_minima": resumen[2]})
+            
+            elif codigo == 'P':
+                resumen = rangos.consultar(p["año_inicio"], p["año_fin"])
+                if resumen is not None:
+                    resultados.append({"pais": nombre, "promedio": round(resumen[0] / resumen[1], 2)})
+            
+            elif codigo == 'Q':
+                resultados.append({"pais": nombre, "años": len(set(serie.años))})
+            
+            elif codigo == 'U':
+                decadas = (serie.por_decada((p["decada_inicio"] // 10) * 10, año_máximo)
+                           if año_máximo is not None else [])
+                resultados.append({"pais": nombre, "decadas": decadas})
         
         return resultados
+
+class ColumnasPoblacion:
+    """Observaciones en columnas NumPy; los textos repetidos se guardan como códigos de categoría."""
     
-    def listar_paises(self):
-        
-        return self.paises
+    CATEGORICAS = ("pais", "codigo_iso3", "indicador_id", "descripcion", "unidad")
+    CAMPOS = frozenset(("ano", "valor", "estado") + CATEGORICAS)
+    DISPONIBLE = 1
+    ENTERO = 2
+    NULO = 4
     
-    def obtener_datos_por_indicador(self, indicador_id):
+    # Instantánea binaria: cabecera, una columna de ancho fijo por campo (alineada a 8 bytes)
+    # y al final el diccionario de textos (y claves adicionales) en JSON.
+    MAGIA = b"POBLAC01"
+    VERSION = 2
+    COLUMNAS_BINARIAS = (("ano", "<i2"), ("pais", "<i4"), ("codigo_iso3", "<i4"),
+                         ("indicador_id", "<i4"), ("descripcion", "<i4"), ("unidad", "<i4"),
+                         ("valor", "<f8"), ("banderas", "u1"))
+    CABECERA = struct.Struct("<8sIIQqqQQ" + "Q" * len(COLUMNAS_BINARIAS))
+    
+    def __init__(self, datos=()):
+        
+        self.n = 0
+        self.capacidad = 0
+        self.columnas = {}
+        self.categorias = {campo: [] for campo in self.CATEGORICAS}
+        self.codigos = {campo: {} for campo in self.CATEGORICAS}
+        self.otros_estados = {}   # posicion -> estado distinto de "disponible"/"no disponible"
+        self.otros = {}           # posicion -> claves adicionales del JSON, como RegistroPoblacion.otros
+        
+        self._reservar(max(len(datos) if hasattr(datos, "__len__") else 0, 1024))
+        for dato in datos:
+            self.append(dato)
+    
+    def _reservar(self, capacidad):
         
-        return [dato for dato in self.poblacion if dato["indicador_id"] == indicador_id]
+        tipos = {"ano": np.int16, "valor": np.float64, "banderas": np.uint8}
+        tipos.update((campo, np.int32) for campo in self.CATEGORICAS)
+        
+        for campo, tipo in tipos.items():
+            nueva = np.empty(capacidad, dtype=tipo)
+            if campo in self.columnas:
+                nueva[:self.n] = self.columnas[campo][:self.n]
+            self.columnas[campo] = nueva
+        self.capacidad = capacidad
     
-    def obtener_datos_ultimos_años(self, num_años):
+    @classmethod
+    def desde_binario(cls, nombre_archivo, origen=None):
+        """Abre la instantánea con mmap sin copiar las columnas.
         
+        Devuelve None si el archivo falta, no es válido o quedó desactualizado respecto a origen.
+        """
         
-        if not self.poblacion:
-            return []
+        try:
+            with open(nombre_archivo, 'rb') as archivo:
+                mapa = mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            return None
         
-        año_máximo = max(dato["ano"] for dato in self.poblacion)
-        año_inicio = año_máximo - num_años + 1  
+        if len(mapa) < cls.CABECERA.size:
+            return None
+        magia, version, _, n, mtime_origen, tamaño_origen, inicio_diccionario, largo_diccionario, *offsets = \
+            cls.CABECERA.unpack_from(mapa)
+        if magia != cls.MAGIA or version != cls.VERSION:
+            print(f"Advertencia: {nombre_archivo} no es una instantánea válida; se usará JSON.")
+            return None
+        if inicio_diccionario + largo_diccionario > len(mapa):
+            print(f"Advertencia: {nombre_archivo} está incompleto; se usará JSON.")
+            return None
         
-        return [dato for dato in self.poblacion if dato["ano"] >= año_inicio]
+        if origen is not None:
+            try:
+                estado = os.stat(origen)
+            except FileNotFoundError:
+                estado = None
+            if estado is not None and (estado.st_mtime_ns, estado.st_size) != (mtime_origen, tamaño_origen):
+                print(f"Advertencia: {nombre_archivo} es anterior a {origen}; se usará JSON.")
+                return None
+        
+        columnas = cls()
+        for (campo, tipo), offset in zip(cls.COLUMNAS_BINARIAS, offsets):
+            columnas.columnas[campo] = np.frombuffer(mapa, dtype=tipo, count=n, offset=offset)
+        
+        diccionario = json.loads(mapa[inicio_diccionario:inicio_diccionario + largo_diccionario])
+        columnas.categorias = diccionario["categorias"]
+        columnas.codigos = {campo: {texto: codigo for codigo, texto in enumerate(textos)}
+                            for campo, textos in columnas.categorias.items()}
+        columnas.otros_estados = {int(posicion): estado for posicion, estado in diccionario["otros_estados"].items()}
+        columnas.otros = {int(posicion): otros for posicion, otros in diccionario["otros"].items()}
+        columnas.n = columnas.capacidad = n
+        columnas.mapa = mapa
+        return columnas
     
-    def obtener_poblacion_pais_año(self, pais, año):
+    def escribir_binario(self, nombre_archivo, origen=None):
+        """Escribe la instantánea de forma atómica; origen es el JSON del que queda sincronizada."""
+        
+        diccionario = json.dumps({"categorias": self.categorias, "otros_estados": self.otros_estados,
+                                  "otros": self.otros}, ensure_ascii=False).encode('utf-8')
+        
+        offsets = []
+        fin = self.CABECERA.size
+        for _, tipo in self.COLUMNAS_BINARIAS:
+            fin = (fin + 7) // 8 * 8
+            offsets.append(fin)
+            fin += self.n * np.dtype(tipo).itemsize
+        
+        mtime_origen, tamaño_origen = -1, -1
+        if origen is not None and os.path.exists(origen):
+            estado = os.stat(origen)
+            mtime_origen, tamaño_origen = estado.st_mtime_ns, estado.st_size
+        
+        temporal = f"{nombre_archivo}.{os.getpid()}.tmp"
+        with open(temporal, 'wb') as archivo:
+            archivo.write(self.CABECERA.pack(self.MAGIA, self.VERSION, 0, self.n, mtime_origen, tamaño_origen,
+                                             fin, len(diccionario), *offsets))
+            for (campo, tipo), offset in zip(self.COLUMNAS_BINARIAS, offsets):
+                archivo.write(b"\0" * (offset - archivo.tell()))
+                archivo.write(self.columna(campo).astype(tipo, copy=False).data)
+            archivo.write(diccionario)
+            archivo.flush()
+            os.fsync(archivo.fileno())
+        os.replace(temporal, nombre_archivo)
+    
+    def _asegurar_escritura(self):
         
-        for dato in self.poblacion:
-            if (dato["pais"] == pais and 
-                dato["ano"] == año and 
-                dato["indicador_id"] == "SP.POP.TOTL"):
-                return dato["valor"]
+        # Las columnas de una instantánea mapeada son de solo lectura: se copian a memoria al primer cambio.
+        if not self.columnas["valor"].flags.writeable:
+            self._reservar(max(self.capacidad, 1024))
+    
+    def columna(self, campo):
         
-        return None
+        return self.columnas[campo][:self.n]
     
-    def obtener_poblacion_antes_año(self, año):
+    def codigo(self, campo, texto):
         
-        return [dato for dato in self.poblacion 
-                if dato["ano"] < año and dato["indicador_id"] == "SP.POP.TOTL"]
+        return self.codigos[campo].get(texto)
     
-    def obtener_poblacion_despues_año(self, año):
+    def _codificar(self, campo, texto):
         
-        return [dato for dato in self.poblacion 
-                if dato["ano"] > año and dato["indicador_id"] == "SP.POP.TOTL"]
+        codigo = self.codigos[campo].get(texto)
+        if codigo is None:
+            codigo = self.codigos[campo][texto] = len(self.categorias[campo])
+            self.categorias[campo].append(texto)
+        return codigo
+    
+    def _escribir_valor(self, posicion, valor, estado):
+        
+        banderas = 0
+        self.otros_estados.pop(posicion, None)
+        if estado == "disponible":
+            banderas |= self.DISPONIBLE
+        elif estado != "no disponible":
+            self.otros_estados[posicion] = estado
+        
+        if valor is None:
+            banderas |= self.NULO
+            valor = np.nan
+        elif isinstance(valor, int):
+            banderas |= self.ENTERO
+        
+        self.columnas["valor"][posicion] = valor
+        self.columnas["banderas"][posicion] = banderas
     
-    def calcular_porcentaje_crecimiento(self, pais, año_inicio, año_fin):
+    def append(self, dato):
+        
+        self._asegurar_escritura()
+        if self.n == self.capacidad:
+            self._reservar(self.capacidad * 2)
+        
+        posicion = self.n
+        self.columnas["ano"][posicion] = dato["ano"]
+        for campo in ("pais", "codigo_iso3", "indicador_id"):
+            self.columnas[campo][posicion] = self._codificar(campo, dato[campo])
+        # Los opcionales y las claves adicionales se tratan igual que en RegistroPoblacion.desde_dict.
+        self.columnas["descripcion"][posicion] = self._codificar("descripcion", dato.get("descripcion", ""))
+        self.columnas["unidad"][posicion] = self._codificar("unidad", dato.get("unidad"))
+        self._escribir_valor(posicion, dato["valor"], dato.get("estado"))
+        otros = dato.keys() - self.CAMPOS
+        if otros:
+            self.otros[posicion] = {clave: dato[clave] for clave in otros}
+        self.n += 1
+    
+    def actualizar(self, posicion, valor, estado, unidad):
         
-        pob_inicio = self.obtener_poblacion_pais_año(pais, año_inicio)
-        pob_fin = self.obtener_poblacion_pais_año(pais, año_fin)
+        self._asegurar_escritura()
+        self._escribir_valor(posicion, valor, estado)
+        self.columnas["unidad"][posicion] = self._codificar("unidad", unidad)
+    
+    def valor(self, posicion):
         
-        if pob_inicio is None or pob_fin is None:
+        banderas = self.columnas["banderas"][posicion]
+        if banderas & self.NULO:
             return None
+        valor = self.columnas["valor"][posicion].item()
+        return int(valor) if banderas & self.ENTERO else valor
+    
+    def estado(self, posicion):
+        
+        if posicion in self.otros_estados:
+            return self.otros_estados[posicion]
+        return "disponible" if self.columnas["banderas"][posicion] & self.DISPONIBLE else "no disponible"
+    
+    def valores(self, posiciones):
+        
+        valores = self.columna("valor")[posiciones].tolist()
+        banderas = self.columna("banderas")[posiciones].tolist()
+        return [None if bandera & self.NULO else int(valor) if bandera & self.ENTERO else valor
+                for valor, bandera in zip(valores, banderas)]
+    
+    def suma(self, posiciones):
+        
+        total = self.columna("valor")[posiciones].sum().item()
+        if (self.columna("banderas")[posiciones] & self.ENTERO).all():
+            return int(total)
+        return total
+    
+    def __len__(self):
+        
+        return self.n
+    
+    def __getitem__(self, posicion):
+        
+        columnas = self.columnas
+        categorias = self.categorias
+        dato = {
+            "ano": columnas["ano"][posicion].item(),
+            "pais": categorias["pais"][columnas["pais"][posicion]],
+            "codigo_iso3": categorias["codigo_iso3"][columnas["codigo_iso3"][posicion]],
+            "indicador_id": categorias["indicador_id"][columnas["indicador_id"][posicion]],
+            "descripcion": categorias["descripcion"][columnas["descripcion"][posicion]],
+            "valor": self.valor(posicion),
+            "estado": self.estado(posicion),
+            "unidad": categorias["unidad"][columnas["unidad"][posicion]]
+        }
+        if posicion in self.otros:
+            dato.update(self.otros[posicion])
+        return dato
+    
+    def __iter__(self):
+        
+        for posicion in range(self.n):
+            yield self[posicion]
+    
+    def a_lista(self):
+        
+        return list(self)
+
+
+class SistemaEstadisticasColumnar(SistemaEstadisticasGlobales):
+    """Variante con almacenamiento columnar: las consultas son máscaras y reducciones de NumPy."""
+    
+    def __init__(self, *args, archivo_binario='poblacion.bin', **kwargs):
+        
+        if _cargar_numpy() is None:
+            raise ImportError("El almacenamiento columnar requiere numpy (pip install numpy).")
+        self.archivo_binario = archivo_binario
+        super().__init__(*args, **kwargs)
+    
+    def _cargar_poblacion(self):
+        
+        columnas = None
+        # La instantánea binaria se carga completa; con filtros de carga se lee el JSON en flujo.
+        if self.archivo_binario and not self.carga_parcial:
+            columnas = ColumnasPoblacion.desde_binario(self.archivo_binario, 'poblacion.json')
+        
+        if columnas is None:
+            super()._cargar_poblacion()
+            return
+        
+        self.poblacion = columnas
+        self.indice = None
+        self.claves = None
+        self.estadisticas = None
+        self.cobertura = None
+        self.series = None
+    
+    def _actualizar_binario(self, nombre_archivo):
+        
+        # La instantánea binaria solo se mantiene si ya existe (se crea con el comando convert).
+        if (nombre_archivo == 'poblacion.json' and self.archivo_binario and
+                os.path.exists(self.archivo_binario)):
+            self.poblacion.escribir_binario(self.archivo_binario, nombre_archivo)
+    
+    def _inicializar_poblacion(self, datos):
+        
+        self.poblacion = ColumnasPoblacion(datos)
+        self.indice = None
+        self.claves = None
+        self.estadisticas = None
+        self.cobertura = None
+        self.series = None
+    
+    def _guardar_json(self, datos, nombre_archivo):
+        
+        if isinstance(datos, ColumnasPoblacion):
+            datos = datos.a_lista()
+        super()._guardar_json(datos, nombre_archivo)
+        self._actualizar_binario(nombre_archivo)
+    
+    def _clave(self, año, codigo_iso3, indicador_id):
+        
+        c = self.poblacion
+        return (año, c.codigo("codigo_iso3", codigo_iso3), c.codigo("indicador_id", indicador_id))
+    
+    def _aplicar_dato(self, dato):
+        
+        c = self.poblacion
+        if self.claves is None:
+            # Solo las escrituras necesitan el índice de claves; se construye al primer uso.
+            self.claves = {}
+            for posicion, clave in enumerate(zip(c.columna("ano").tolist(),
+                                                 c.columna("codigo_iso3").tolist(),
+                                                 c.columna("indicador_id").tolist())):
+                self.claves.setdefault(clave, posicion)
+        
+        posicion = self.claves.get(self._clave(dato["ano"], dato["codigo_iso3"], dato["indicador_id"]))
+        if posicion is not None:
+            if (_mismo_valor(c.valor(posicion), dato["valor"]) and c.estado(posicion) == dato["estado"] and
+                    c.categorias["unidad"][c.columnas["unidad"][posicion]] == dato["unidad"]):
+                return posicion
+            
+            self.version_datos += 1
+            c.actualizar(posicion, dato["valor"], dato["estado"], dato["unidad"])
+            self._invalidar_serie(c.categorias["pais"][c.columnas["pais"][posicion]], dato["indicador_id"], dato["ano"])
+            return posicion
+        
+        self.version_datos += 1
+        self._invalidar_serie(dato["pais"], dato["indicador_id"], dato["ano"])
+        if self.estadisticas is not None:
+            self.estadisticas.agregar(dato["ano"], dato["indicador_id"])
+        if self.cobertura is not None:
+            self.cobertura.agregar(dato["pais"], dato["indicador_id"], dato["ano"])
+        c.append(dato)
+        posicion = len(c) - 1
+        self.claves[self._clave(dato["ano"], dato["codigo_iso3"], dato["indicador_id"])] = posicion
+        series = self.series.get(dato["indicador_id"]) if self.series is not None else None
+        if series is not None:
+            # La fila nueva va detrás de las del mismo año, como en el agrupado estable.
+            posiciones = series.get(dato["pais"], np.zeros(0, dtype=np.int64))
+            i = np.searchsorted(c.columna("ano")[posiciones], dato["ano"], side="right")
+            series[dato["pais"]] = np.insert(posiciones, i, posicion)
+        return posicion
+    
+    def _invalidar_serie(self, pais, indicador_id, año):
+        
+        # Sin índice por serie, actualizar un año costaría una máscara completa: el árbol se
+        # descarta y se reconstruye en la siguiente consulta de rangos.
+        self.crecimientos.pop((pais, indicador_id), None)
+        self.rangos.pop((pais, indicador_id), None)
+        self.ordenes_serie.pop((pais, indicador_id), None)
+        self.ordenes_año.pop((indicador_id, año), None)
+        self.series_preparadas.pop(indicador_id, None)
+    
+    def _estadisticas(self):
+        
+        # Se calculan con NumPy al primer uso y desde entonces se actualizan en cada inserción.
+        if self.estadisticas is None:
+            self.estadisticas = self._calcular_estadisticas()
+        return self.estadisticas
+    
+    def _cobertura(self):
+        
+        # Como las estadísticas: se construye al primer uso y se actualiza en cada inserción.
+        if self.cobertura is None:
+            c = self.poblacion
+            self.cobertura = CoberturaAños()
+            if len(c):
+                ternas, primeros = np.unique(np.stack([c.columna("pais"), c.columna("indicador_id"),
+                                                       c.columna("ano")]), axis=1, return_index=True)
+                # En orden de aparición, para que los países por año conserven el orden de los años.
+                paises = c.categorias["pais"]
+                indicadores = c.categorias["indicador_id"]
+                for pais, indicador, año in zip(*ternas[:, np.argsort(primeros)].tolist()):
+                    self.cobertura.agregar(paises[pais], indicadores[indicador], año)
+        return self.cobertura
+    
+    def _calcular_estadisticas(self):
+        
+        c = self.poblacion
+        estadisticas = EstadisticasPoblacion()
+        if not len(c):
+            return estadisticas
+        
+        años = c.columna("ano")
+        indicadores = c.columna("indicador_id")
+        estadisticas.año_minimo = años.min().item()
+        estadisticas.año_maximo = años.max().item()
+        
+        # np.unique ordena por valor; return_index permite recuperar el orden de aparición.
+        valores, primeros, conteos = np.unique(años, return_index=True, return_counts=True)
+        orden = np.argsort(primeros)
+        estadisticas.registros_por_año = dict(zip(valores[orden].tolist(), conteos[orden].tolist()))
+        
+        valores, primeros, conteos = np.unique(indicadores, return_index=True, return_counts=True)
+        orden = np.argsort(primeros)
+        estadisticas.registros_por_indicador = {c.categorias["indicador_id"][codigo]: conteo for codigo, conteo
+                                                in zip(valores[orden].tolist(), conteos[orden].tolist())}
+        return estadisticas
+    
+    def _mascara(self, pais=None, indicador_id="SP.POP.TOTL", desde=None, hasta=None):
+        
+        c = self.poblacion
+        mascara = np.ones(len(c), dtype=bool)
+        if self.perfil is not None:
+            self.perfil.filas_recorridas += len(c)
+        
+        if pais is not None:
+            pais = self._nombre_pais(pais)
+        if indicador_id is not None:
+            indicador_id = self._id_indicador(indicador_id)
+        
+        for campo, texto in (("pais", pais), ("indicador_id", indicador_id)):
+            if texto is not None:
+                codigo = c.codigo(campo, texto)
+                if codigo is None:
+                    return np.zeros(len(c), dtype=bool)
+                mascara &= c.columna(campo) == codigo
+        
+        if desde is not None:
+            mascara &= c.columna("ano") >= desde
+        if hasta is not None:
+            mascara &= c.columna("ano") <= hasta
+        return mascara
+    
+    def _mascara_consulta(self, consulta):
+        
+        c = self.poblacion
+        mascara = self._mascara(consulta.filtro_pais, consulta.filtro_indicador, consulta.desde, consulta.hasta)
+        if consulta.filtra_valores():
+            mascara &= (c.columna("banderas") & c.NULO) == 0
+            if consulta.minimo is not None:
+                mascara &= c.columna("valor") >= consulta.minimo
+            if consulta.maximo is not None:
+                mascara &= c.columna("valor") <= consulta.maximo
+        return mascara
+    
+    def _plan_consulta(self, consulta):
+        
+        if consulta.filtro_pais is not None and consulta.filtro_indicador is not None:
+            # Con país e indicador basta la serie agrupada, sin recorrer las columnas completas.
+            c = self.poblacion
+            posiciones = np.sort(self._serie_ordenada(consulta.filtro_pais, consulta.desde, consulta.hasta,
+                                                      consulta.filtro_indicador))
+            if consulta.filtra_valores():
+                valores = c.columna("valor")[posiciones]
+                validas = (c.columna("banderas")[posiciones] & c.NULO) == 0
+                if consulta.minimo is not None:
+                    validas &= valores >= consulta.minimo
+                if consulta.maximo is not None:
+                    validas &= valores <= consulta.maximo
+                posiciones = posiciones[validas]
+            return "serie", iter(posiciones.tolist())
+        
+        return "máscara", iter(np.flatnonzero(self._mascara_consulta(consulta)).tolist())
+    
+    def _fila_consulta(self, posicion):
         
-        crecimiento = ((pob_fin - pob_inicio) / pob_inicio) * 100
-        return round(crecimiento, 2)
+        return self.poblacion[posicion]
     
-    def obtener_año_poblacion_minima(self, pais):
+    def _valor_consulta(self, posicion):
         
-        datos_pais = [dato for dato in self.poblacion 
-                     if dato["pais"] == pais and dato["indicador_id"] == "SP.POP.TOTL"]
+        return self.poblacion.valor(posicion)
+    
+    def _agregar_consulta(self, consulta, funcion):
+        
+        # Los predicados y el límite dependen del orden de las filas: esos casos se recorren.
+        if consulta.predicados or consulta.limite_filas is not None:
+            return super()._agregar_consulta(consulta, funcion)
         
-        if not datos_pais:
+        c = self.poblacion
+        mascara = self._mascara_consulta(consulta)
+        if funcion == "count":
+            return int(mascara.sum())
+        
+        posiciones = np.flatnonzero(mascara & ((c.columna("banderas") & c.NULO) == 0))
+        if funcion == "sum":
+            return c.suma(posiciones) if len(posiciones) else 0
+        if not len(posiciones):
             return None
+        if funcion == "avg":
+            return c.suma(posiciones) / len(posiciones)
         
-        return min(datos_pais, key=lambda x: x["valor"])["ano"]
+        valores = c.columna("valor")[posiciones]
+        return c.valor(posiciones[np.argmin(valores) if funcion == "min" else np.argmax(valores)].item())
     
-    def contar_registros_por_año(self):
+    def _series_indicador(self, indicador_id):
+        """Posiciones de cada país con el indicador, ordenadas por año; se agrupan al primer uso."""
+        
+        if self.series is None:
+            self.series = {}
+        series = self.series.get(indicador_id)
+        if series is None:
+            c = self.poblacion
+            posiciones = np.flatnonzero(self._mascara(indicador_id=indicador_id))
+            # lexsort es estable: dentro de un mismo (pais, año) se conserva el orden de inserción.
+            posiciones = posiciones[np.lexsort((c.columna("ano")[posiciones], c.columna("pais")[posiciones]))]
+            paises = c.columna("pais")[posiciones]
+            cortes = (np.flatnonzero(np.diff(paises)) + 1).tolist()
+            series = self.series[indicador_id] = {
+                c.categorias["pais"][paises[inicio]]: posiciones[inicio:fin]
+                for inicio, fin in zip([0] + cortes, cortes + [len(posiciones)]) if inicio < fin}
+        return series
+    
+    def _agrupar_series(self, indicador_id):
         
-        conteo = {}
-        for dato in self.poblacion:
-            año = dato["ano"]
-            conteo[año] = conteo.get(año, 0) + 1
+        c = self.poblacion
+        return {pais: (posiciones.tolist(), c.columna("ano")[posiciones].tolist(), c.valores(posiciones))
+                for pais, posiciones in self._series_indicador(indicador_id).items()}
+    
+    def _serie_ordenada(self, pais, desde=None, hasta=None, indicador_id="SP.POP.TOTL"):
+        
+        posiciones = self._series_indicador(self._id_indicador(indicador_id)).get(self._nombre_pais(pais))
+        if posiciones is None:
+            return np.zeros(0, dtype=np.int64)
+        if desde is not None or hasta is not None:
+            años = self.poblacion.columna("ano")[posiciones]
+            inicio = 0 if desde is None else np.searchsorted(años, desde, side="left")
+            fin = len(años) if hasta is None else np.searchsorted(años, hasta, side="right")
+            posiciones = posiciones[inicio:fin]
+        return posiciones
+    
+    def _valores_serie(self, pais, indicador_id, año_inicio=None, año_fin=None):
         
-        return conteo
+        posiciones = self._serie_ordenada(pais, año_inicio, año_fin, indicador_id)
+        return self.poblacion.columna("ano")[posiciones].tolist(), self.poblacion.valores(posiciones)
     
-    def paises_crecimiento_mayor(self, porcentaje, num_años):
+    def _ejes_matriz(self, indicadores, año_inicio, año_fin):
         
+        c = self.poblacion
+        mascara = np.zeros(len(c), dtype=bool)
+        for indicador_id in indicadores:
+            mascara |= self._mascara(indicador_id=indicador_id, desde=año_inicio, hasta=año_fin)
         
-        if not self.poblacion:
-            return []
+        if not mascara.any():
+            return self._rango_ejes((), None, None, año_inicio, año_fin)
         
-        año_máximo = max(dato["ano"] for dato in self.poblacion)
-        año_inicio = año_máximo - num_años + 1
+        años = c.columna("ano")[mascara]
+        paises = [c.categorias["pais"][codigo] for codigo in np.unique(c.columna("pais")[mascara]).tolist()]
+        return self._rango_ejes(paises, años.min().item(), años.max().item(), año_inicio, año_fin)
+    
+    def _posiciones_matriz(self, indicador_id, paises, años):
+        
+        c = self.poblacion
+        matriz = np.full((len(paises), len(años)), -1, dtype=np.int64)
+        if not paises or not años:
+            return matriz
+        
+        filas_pais = np.full(len(c.categorias["pais"]), -1, dtype=np.int64)
+        for fila, pais in enumerate(paises):
+            codigo = c.codigo("pais", pais)
+            if codigo is not None:
+                filas_pais[codigo] = fila
+        
+        posiciones = np.flatnonzero(self._mascara(indicador_id=indicador_id, desde=años[0], hasta=años[-1]))
+        filas = filas_pais[c.columna("pais")[posiciones]]
+        posiciones, filas = posiciones[filas >= 0], filas[filas >= 0]
+        celdas = filas * len(años) + (c.columna("ano")[posiciones] - años[0])
+        # np.unique devuelve la primera aparición de cada celda: con años repetidos vale la primera fila.
+        celdas, primeras = np.unique(celdas, return_index=True)
+        matriz.flat[celdas] = posiciones[primeras]
+        return matriz
+    
+    def _valores_matriz(self, posiciones):
         
-        resultados = []
+        validas = posiciones >= 0
+        valores = np.full(posiciones.shape, None, dtype=object)
+        # dtype=object conserva los int de Python (valores() distingue enteros de decimales).
+        valores[validas] = np.array(self.poblacion.valores(posiciones[validas]), dtype=object)
+        return valores.tolist()
+    
+    def _razon_matriz(self, numeradores, denominadores, factor):
         
-        for pais in self.paises:
-            nombre_pais = pais["nombre"]
-            
-            crecimiento = self.calcular_crecimiento_poblacional(nombre_pais, año_inicio, año_máximo)
-            
-            if crecimiento:
-                crecimiento_promedio = sum(dato["crecimiento_porcentual"] for dato in crecimiento) / len(crecimiento)
-                
-                if crecimiento_promedio > porcentaje:
-                    resultados.append({
-                        "pais": nombre_pais,
-                        "crecimiento_promedio": round(crecimiento_promedio, 2)
-                    })
+        columna = self.poblacion.columna("valor")
+        a = np.where(numeradores >= 0, columna[numeradores], np.nan)
+        b = np.where(denominadores >= 0, columna[denominadores], np.nan)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            razon = a / b * factor
+        
+        resultado = razon.astype(object)
+        resultado[~np.isfinite(razon) | (b == 0)] = None
+        return resultado.tolist()
+    
+    def _calcular_crecimiento_serie(self, pais, indicador_id):
+        
+        c = self.poblacion
+        posiciones = self._serie_ordenada(pais, indicador_id=indicador_id)
+        valores = c.columna("valor")[posiciones]
+        
+        absolutos = np.diff(valores)
+        anteriores = valores[:-1]
+        porcentajes = np.divide(absolutos, anteriores, out=np.zeros_like(absolutos),
+                                where=anteriores > 0) * 100
+        enteros = ((c.columna("banderas")[posiciones] & ColumnasPoblacion.ENTERO) != 0).tolist()
+        
+        return CrecimientoSerie(
+            c.columna("ano")[posiciones].tolist(),
+            c.valores(posiciones),
+            [int(absoluto) if enteros[k] and enteros[k + 1] else absoluto
+             for k, absoluto in enumerate(absolutos.tolist())],
+            [round(porcentaje, 2) if anterior > 0 else 0
+             for porcentaje, anterior in zip(porcentajes.tolist(), anteriores.tolist())]
+        )
+    
+    def _filas_serie(self, pais, indicador_id):
+        
+        posiciones = np.sort(self._serie_ordenada(pais, indicador_id=indicador_id))
+        return (posiciones.tolist(), self.poblacion.columna("ano")[posiciones].tolist(),
+                self.poblacion.valores(posiciones))
+    
+    def _filas_año(self, indicador_id, año):
+        
+        c = self.poblacion
+        posiciones = np.flatnonzero(self._mascara(indicador_id=indicador_id, desde=año, hasta=año))
+        return [c.categorias["pais"][codigo] for codigo in c.columna("pais")[posiciones].tolist()], c.valores(posiciones)
+
+
+def convertir_a_binario(nombre_json='poblacion.json', nombre_binario='poblacion.bin'):
+    """Genera la instantánea binaria mapeable a partir del JSON (requiere numpy)."""
+    
+    if _cargar_numpy() is None:
+        print("Error: La conversión a formato binario requiere numpy.")
+        return False
+    
+    try:
+        with abrir_json(nombre_json) as archivo:
+            columnas = ColumnasPoblacion(leer_json_en_flujo(archivo))
+    except (FileNotFoundError, json.JSONDecodeError):
+        print(f"Error: No se pudo leer {nombre_json}.")
+        return False
+    
+    columnas.escribir_binario(nombre_binario, nombre_json)
+    return True
+
+
+# Esquema de la base SQLite. valor no declara tipo para que SQLite guarde int y float tal cual
+# (5 y 5.0 son valores distintos, como en el JSON). posicion es el orden de inserción.
+ESQUEMA_SQLITE = """
+CREATE TABLE IF NOT EXISTS poblacion (
+    posicion INTEGER PRIMARY KEY,
+    ano INTEGER NOT NULL,
+    pais TEXT NOT NULL,
+    codigo_iso3 TEXT,
+    indicador_id TEXT NOT NULL,
+    descripcion TEXT,
+    valor,
+    estado TEXT,
+    unidad TEXT,
+    otros TEXT
+);
+CREATE INDEX IF NOT EXISTS poblacion_pais_indicador_ano ON poblacion (pais, indicador_id, ano);
+CREATE INDEX IF NOT EXISTS poblacion_indicador_ano ON poblacion (indicador_id, ano);
+CREATE INDEX IF NOT EXISTS poblacion_indicador_pais ON poblacion (indicador_id, pais, ano);
+CREATE INDEX IF NOT EXISTS poblacion_clave ON poblacion (codigo_iso3, indicador_id, ano);
+CREATE INDEX IF NOT EXISTS poblacion_indicador_ano_valor ON poblacion (indicador_id, ano, valor);
+CREATE INDEX IF NOT EXISTS poblacion_ano ON poblacion (ano);
+CREATE TABLE IF NOT EXISTS paises (
+    posicion INTEGER PRIMARY KEY,
+    nombre TEXT,
+    codigo_iso TEXT,
+    codigo_iso3 TEXT,
+    otros TEXT
+);
+CREATE TABLE IF NOT EXISTS indicadores (
+    posicion INTEGER PRIMARY KEY,
+    id_indicador TEXT,
+    descripcion TEXT,
+    otros TEXT
+);
+CREATE TABLE IF NOT EXISTS generacion (valor TEXT NOT NULL);
+INSERT INTO generacion SELECT hex(randomblob(8)) WHERE NOT EXISTS (SELECT 1 FROM generacion);
+"""
+
+CAMPOS_POBLACION = ("ano", "pais", "codigo_iso3", "indicador_id", "descripcion", "valor", "estado", "unidad")
+# Valor de los campos que faltan en el dict, si no es NULL (el mismo que usa RegistroPoblacion.desde_dict).
+POR_DEFECTO_SQL = {"descripcion": ""}
+CAMPOS_CATALOGOS = {
+    "paises": ("nombre", "codigo_iso", "codigo_iso3"),
+    "indicadores": ("id_indicador", "descripcion"),
+}
+
+SELECCIONAR_FILAS = f"SELECT {', '.join(CAMPOS_POBLACION)}, otros FROM poblacion"
+INSERTAR_FILA = (f"INSERT INTO poblacion (posicion, {', '.join(CAMPOS_POBLACION)}, otros) "
+                 f"VALUES ({', '.join('?' * (len(CAMPOS_POBLACION) + 2))})")
+
+
+def _fila_sql(campos, dato):
+    """Valores de un dict para las columnas dadas; las claves adicionales van en JSON a la columna otros."""
+    
+    otros = dato.keys() - set(campos)
+    return tuple(dato.get(campo, POR_DEFECTO_SQL.get(campo)) for campo in campos) + (
+        json.dumps({clave: dato[clave] for clave in otros}, ensure_ascii=False) if otros else None,)
+
+
+def _dict_sql(campos, fila):
+    
+    dato = dict(zip(campos, fila))
+    if fila[len(campos)]:
+        dato.update(json.loads(fila[len(campos)]))
+    return dato
+
+
+class TablaPoblacion:
+    """Vista de secuencia sobre la tabla poblacion (len, acceso por posición e iteración), con la misma
+    interfaz que la lista de registros y ColumnasPoblacion."""
+    
+    def __init__(self, conexion):
+        
+        self.conexion = conexion
+        self.actualizar()
+    
+    def actualizar(self):
+        
+        # Las posiciones son 0..n-1 sin huecos: MAX usa la clave primaria y no recorre la tabla.
+        self.n = self.conexion.execute("SELECT COALESCE(MAX(posicion), -1) + 1 FROM poblacion").fetchone()[0]
+    
+    def __len__(self):
+        
+        return self.n
+    
+    def __getitem__(self, posicion):
+        
+        fila = self.conexion.execute(SELECCIONAR_FILAS + " WHERE posicion = ?", (posicion,)).fetchone()
+        if fila is None:
+            raise IndexError(posicion)
+        return _dict_sql(CAMPOS_POBLACION, fila)
+    
+    def __iter__(self):
+        
+        for fila in self.conexion.execute(SELECCIONAR_FILAS + " ORDER BY posicion"):
+            yield _dict_sql(CAMPOS_POBLACION, fila)
+    
+    def a_lista(self):
+        
+        return list(self)
+
+
+class SistemaEstadisticasSQLite(SistemaEstadisticasGlobales):
+    """Variante sobre SQLite: los datos quedan en disco y las consultas se resuelven con índices y
+    agregados SQL, sin cargar la población en memoria.
+    
+    La base usa WAL (muchos lectores mientras un proceso escribe). Sin usar_journal cada inserción se
+    confirma al momento; con usar_journal se agrupan en transacciones de lote_fsync filas, que se
+    confirman también al compactar o cerrar. Si la base no existe se crea desde los archivos JSON.
+    """
+    
+    COLUMNA_VALOR = CAMPOS_POBLACION.index("valor")   # en las filas de SELECCIONAR_FILAS
+    
+    def __init__(self, usar_journal=False, lote_fsync=100, umbral_compactacion=10000,
+                 archivo_db='poblacion.db', **kwargs):
+        
+        self.archivo_db = archivo_db
+        self.lote_transaccion = lote_fsync if usar_journal else 1
+        self.pendientes = 0
+        self.version_sqlite = None
+        
+        self.conexiones_heredadas = []
+        
+        nueva = not os.path.exists(archivo_db)
+        self._conexion = self._conectar()
+        
+        # SQLite coordina a los procesos por su cuenta: no hace falta el cerrojo del modo compartido.
+        kwargs["acceso_compartido"] = False
+        super().__init__(usar_journal, lote_fsync, umbral_compactacion, **kwargs)
+        self.journal = None
+        if nueva:
+            self._importar_json()
+    
+    def _conectar(self):
+        
+        # isolation_level=None: las transacciones se abren a mano con BEGIN IMMEDIATE antes de leer la
+        # clave que se va a escribir, así dos procesos no insertan la misma fila.
+        conexion = sqlite3.connect(self.archivo_db, isolation_level=None, timeout=30, cached_statements=256)
+        conexion.execute("PRAGMA journal_mode=WAL")
+        conexion.execute("PRAGMA synchronous=NORMAL")
+        conexion.executescript(ESQUEMA_SQLITE)
+        self.pid_conexion = os.getpid()
+        return conexion
+    
+    @property
+    def conexion(self):
+        """Conexión de este proceso. SQLite no admite usar tras fork() una conexión abierta en el padre
+        (batch --workers): el proceso hijo abre la suya la primera vez que la necesita."""
+        
+        if self.pid_conexion != os.getpid():
+            # La heredada no se cierra ni se libera: cerrarla desde el hijo también está prohibido.
+            self.conexiones_heredadas.append(self._conexion)
+            self._conexion = self._conectar()
+            if isinstance(getattr(self, "poblacion", None), TablaPoblacion):
+                self.poblacion.conexion = self._conexion
+        return self._conexion
+    
+    def _importar_json(self):
+        """Llena la base desde paises.json, indicadores.json, poblacion.json y el journal pendiente."""
+        
+        c = self.conexion
+        c.execute("BEGIN IMMEDIATE")
+        for tabla in ("poblacion", "paises", "indicadores"):
+            c.execute(f"DELETE FROM {tabla}")
+        
+        self.paises = self._cargar_json('paises.json')
+        self.indicadores = self._cargar_json('indicadores.json')
+        self._escribir_catalogo("paises", self.paises)
+        self._escribir_catalogo("indicadores", self.indicadores)
+        
+        # executemany consume el generador: poblacion.json se inserta en flujo, sin cargarlo entero.
+        c.executemany(INSERTAR_FILA, ((posicion,) + _fila_sql(CAMPOS_POBLACION, dato) for posicion, dato
+                                      in enumerate(self._leer_poblacion('poblacion.json'))))
+        self.poblacion.actualizar()
+        for dato in JournalPoblacion(ARCHIVO_JOURNAL).leer():
+            self._aplicar_dato(dato)
+        c.execute("COMMIT")
+        
+        self.catalogo_paises = CatalogoPaises(self.paises)
+        self.catalogo_indicadores = CatalogoIndicadores(self.indicadores)
+        self.version_guardada = self.version_datos
+    
+    def _leer_catalogo(self, tabla):
+        
+        campos = CAMPOS_CATALOGOS[tabla]
+        return [_dict_sql(campos, fila) for fila in
+                self.conexion.execute(f"SELECT {', '.join(campos)}, otros FROM {tabla} ORDER BY posicion")]
+    
+    def _escribir_catalogo(self, tabla, datos):
+        
+        campos = CAMPOS_CATALOGOS[tabla]
+        self._cambiar_generacion()
+        self.conexion.execute(f"DELETE FROM {tabla}")
+        self.conexion.executemany(
+            f"INSERT INTO {tabla} (posicion, {', '.join(campos)}, otros) VALUES ({', '.join('?' * (len(campos) + 2))})",
+            ((posicion,) + _fila_sql(campos, dato) for posicion, dato in enumerate(datos)))
+    
+    def _cargar_indicadores(self):
+        
+        self.indicadores = self._leer_catalogo("indicadores")
+        self.catalogo_indicadores = CatalogoIndicadores(self.indicadores)
+    
+    def _cargar_paises(self):
+        
+        self.paises = self._leer_catalogo("paises")
+        self.catalogo_paises = CatalogoPaises(self.paises)
+    
+    def _cargar_poblacion(self):
+        
+        if self.carga_parcial:
+            # Los filtros de carga sirven para ahorrar memoria; aquí los datos no se cargan.
+            print("Advertencia: Los filtros de carga no se aplican al almacenamiento SQLite.")
+            self.indicadores_carga = self.año_desde = self.año_hasta = None
+            self.carga_parcial = False
+        
+        self.poblacion = TablaPoblacion(self.conexion)
+        self.indice = None
+        self.estadisticas = None
+        self.version_sqlite = self.conexion.execute("PRAGMA data_version").fetchone()[0]
+    
+    def _reproducir_journal(self, desde=0):
+        
+        # El journal JSON pertenece a poblacion.json; solo se integra al importar.
+        self.posicion_journal = 0
+    
+    def recargar_si_cambio(self):
+        """Detecta con PRAGMA data_version si otra conexión confirmó cambios; en ese caso recarga los
+        catálogos y descarta los resultados precalculados."""
+        
+        version = self.conexion.execute("PRAGMA data_version").fetchone()[0]
+        if version == self.version_sqlite:
+            return False
+        
+        self._cargar_indicadores()
+        self._cargar_paises()
+        self.poblacion.actualizar()
+        self.crecimientos = {}
+        self.rangos = {}
+        self.ordenes_serie = {}
+        self.series_preparadas = {}
+        self.estadisticas = None
+        self.version_sqlite = version
+        return True
+    
+    def _generacion(self):
+        
+        # La generación vive en la base: cada transacción que modifica datos la cambia por un valor
+        # aleatorio (_cambiar_generacion), así que es la misma para todas las conexiones que ven esos datos.
+        self.recargar_si_cambio()
+        return "sqlite:" + self.conexion.execute("SELECT valor FROM generacion").fetchone()[0]
+    
+    def _cambiar_generacion(self):
         
-        return resultados
+        self.conexion.execute("UPDATE generacion SET valor = hex(randomblob(8))")
     
-    def años_poblacion_mayor(self, pais, umbral):
+    def _guardar_json(self, datos, nombre_archivo):
         
-        return [dato["ano"] for dato in self.poblacion 
-                if dato["pais"] == pais and 
-                   dato["indicador_id"] == "SP.POP.TOTL" and 
-                   dato["valor"] > umbral]
+        # Los catálogos se guardan en sus tablas; la población ya está en la base.
+        tabla = {'paises.json': "paises", 'indicadores.json': "indicadores"}.get(nombre_archivo)
+        if tabla is not None:
+            self._iniciar_transaccion()
+            self._escribir_catalogo(tabla, datos)
+            self._confirmar()
     
-    def obtener_poblacion_total_año(self, año):
+    def _iniciar_transaccion(self):
         
-        datos_año = [dato for dato in self.poblacion 
-                    if dato["ano"] == año and dato["indicador_id"] == "SP.POP.TOTL"]
+        if self.conexion.in_transaction:
+            return False
+        self.conexion.execute("BEGIN IMMEDIATE")
+        return True
+    
+    def _confirmar(self):
         
-        return sum(dato["valor"] for dato in datos_año)
+        if self.conexion.in_transaction:
+            self.conexion.execute("COMMIT")
+        self.pendientes = 0
+        self.version_guardada = self.version_datos
+    
+    def _aplicar_dato(self, dato):
+        
+        c = self.conexion
+        iniciada = self._iniciar_transaccion()
+        fila = c.execute("SELECT posicion, pais, valor, estado, unidad FROM poblacion "
+                         "WHERE codigo_iso3 = ? AND indicador_id = ? AND ano = ? ORDER BY posicion LIMIT 1",
+                         (dato["codigo_iso3"], dato["indicador_id"], dato["ano"])).fetchone()
+        
+        if fila is not None:
+            posicion, pais, valor, estado, unidad = fila
+            if _mismo_valor(valor, dato["valor"]) and estado == dato["estado"] and unidad == dato["unidad"]:
+                if iniciada:
+                    c.execute("COMMIT")
+                return posicion
+            
+            self.version_datos += 1
+            self._cambiar_generacion()
+            c.execute("UPDATE poblacion SET valor = ?, estado = ?, unidad = ? WHERE posicion = ?",
+                      (dato["valor"], dato["estado"], dato["unidad"], posicion))
+            self._invalidar_serie(pais, dato["indicador_id"], dato["ano"])
+            return posicion
+        
+        self.version_datos += 1
+        self._cambiar_generacion()
+        # La posición se calcula dentro de la transacción: otro proceso pudo insertar antes.
+        posicion = c.execute("SELECT COALESCE(MAX(posicion), -1) + 1 FROM poblacion").fetchone()[0]
+        c.execute(INSERTAR_FILA, (posicion,) + _fila_sql(CAMPOS_POBLACION, dato))
+        self.poblacion.n = posicion + 1
+        self._invalidar_serie(dato["pais"], dato["indicador_id"], dato["ano"])
+        return posicion
     
-    def obtener_poblacion_minima_periodo(self, pais, num_años):
+    def _invalidar_serie(self, pais, indicador_id, año):
         
+        self.crecimientos.pop((pais, indicador_id), None)
+        self.rangos.pop((pais, indicador_id), None)
+        self.ordenes_serie.pop((pais, indicador_id), None)
+        self.series_preparadas.pop(indicador_id, None)
+        self.estadisticas = None
+    
+    def _guardar_poblacion(self):
         
-        if not self.poblacion:
-            return None
+        self._confirmar()
+    
+    def _persistir_dato(self, dato):
         
-        año_máximo = max(dato["ano"] for dato in self.poblacion)
-        año_inicio = año_máximo - num_años + 1
+        self.pendientes += 1
+        if self.pendientes >= self.lote_transaccion:
+            self._confirmar()
+    
+    def compactar(self):
+        """Confirma la transacción pendiente e integra el WAL en la base."""
         
-        datos_periodo = [dato for dato in self.poblacion 
-                        if dato["pais"] == pais and 
-                           año_inicio <= dato["ano"] <= año_máximo and
-                           dato["indicador_id"] == "SP.POP.TOTL"]
+        if self.solo_lectura:
+            return
+        self._confirmar()
+        self.conexion.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    
+    def cerrar(self):
         
-        if not datos_periodo:
-            return None
+        self._confirmar()
+        self.conexion.close()
+    
+    def _consultar(self, consulta, parametros=()):
         
-        return min(datos_periodo, key=lambda x: x["valor"])["valor"]
+        filas = self.conexion.execute(consulta, parametros).fetchall()
+        if self.perfil is not None:
+            self.perfil.filas_recorridas += len(filas)
+        return filas
+    
+    def _condicion_consulta(self, consulta):
+        
+        pais = None if consulta.filtro_pais is None else self._nombre_pais(consulta.filtro_pais)
+        indicador_id = None if consulta.filtro_indicador is None else self._id_indicador(consulta.filtro_indicador)
+        condiciones, parametros = [], []
+        for condicion, valor in (("pais = ?", pais), ("indicador_id = ?", indicador_id),
+                                 ("ano >= ?", consulta.desde), ("ano <= ?", consulta.hasta),
+                                 ("valor >= ?", consulta.minimo), ("valor <= ?", consulta.maximo)):
+            if valor is not None:
+                condiciones.append(condicion)
+                parametros.append(valor)
+        return " AND ".join(condiciones) or "1", parametros
     
-    def calcular_promedio_poblacion(self, pais, año_inicio, año_fin):
+    def _plan_consulta(self, consulta):
+        
+        # El rango de valores y, sin predicados de Python, el límite también van en el SQL.
+        condicion, parametros = self._condicion_consulta(consulta)
+        sql = f"{SELECCIONAR_FILAS} WHERE {condicion} ORDER BY posicion"
+        if consulta.limite_filas is not None and not consulta.predicados:
+            sql += " LIMIT ?"
+            parametros.append(consulta.limite_filas)
+        return sql, self._recorrer_sql(sql, parametros)
+    
+    def _recorrer_sql(self, consulta, parametros):
         
-        datos_periodo = [dato for dato in self.poblacion 
-                        if dato["pais"] == pais and 
-                           año_inicio <= dato["ano"] <= año_fin and
-                           dato["indicador_id"] == "SP.POP.TOTL"]
+        # Generador: la consulta se ejecuta al recorrerlo y las filas llegan del cursor una a una.
+        for fila in self.conexion.execute(consulta, parametros):
+            if self.perfil is not None:
+                self.perfil.filas_recorridas += 1
+            yield fila
+    
+    def _fila_consulta(self, fila):
         
-        if not datos_periodo:
-            return None
+        return _dict_sql(CAMPOS_POBLACION, fila)
+    
+    def _valor_consulta(self, fila):
         
-        return round(sum(dato["valor"] for dato in datos_periodo) / len(datos_periodo), 2)
+        return fila[self.COLUMNA_VALOR]
     
-    def contar_años_datos_disponibles(self, pais):
+    def _agregar_consulta(self, consulta, funcion):
         
-        años = set(dato["ano"] for dato in self.poblacion 
-                  if dato["pais"] == pais and dato["indicador_id"] == "SP.POP.TOTL")
+        if consulta.predicados or consulta.limite_filas is not None:
+            return super()._agregar_consulta(consulta, funcion)
+        
+        condicion, parametros = self._condicion_consulta(consulta)
+        expresion = {"count": "COUNT(*)", "sum": "COALESCE(SUM(valor), 0)", "avg": "AVG(valor)",
+                     "min": "MIN(valor)", "max": "MAX(valor)"}[funcion]
+        return self._consultar(f"SELECT {expresion} FROM poblacion WHERE {condicion}", parametros)[0][0]
+    
+    def _columna(self, consulta, parametros=()):
         
-        return len(años)
+        return [fila[0] for fila in self._consultar(consulta, parametros)]
     
-    def paises_datos_completos(self, año_inicio, año_fin):
+    def _estadisticas(self):
+        
+        if self.estadisticas is None:
+            estadisticas = EstadisticasPoblacion()
+            estadisticas.año_minimo, estadisticas.año_maximo = self._consultar(
+                "SELECT MIN(ano), MAX(ano) FROM poblacion")[0]
+            # ORDER BY MIN(posicion) conserva el orden de aparición de cada clave, como en las otras variantes.
+            estadisticas.registros_por_año = dict(self._consultar(
+                "SELECT ano, COUNT(*) FROM poblacion GROUP BY ano ORDER BY MIN(posicion)"))
+            estadisticas.registros_por_indicador = dict(self._consultar(
+                "SELECT indicador_id, COUNT(*) FROM poblacion GROUP BY indicador_id ORDER BY MIN(posicion)"))
+            self.estadisticas = estadisticas
+        return self.estadisticas
+    
+    def _año_maximo(self):
         
-        paises_completos = []
-        años_requeridos = set(range(año_inicio, año_fin + 1))
+        return self._consultar("SELECT MAX(ano) FROM poblacion")[0][0]
+    
+    def _serie_sql(self, pais, indicador_id, desde=None):
+        """(años, valores) de la serie ordenada por año (y por orden de inserción dentro del año)."""
+        
+        filas = self._consultar(
+            "SELECT ano, valor FROM poblacion WHERE pais = ? AND indicador_id = ? AND ano >= ? "
+            "ORDER BY ano, posicion",
+            (self._nombre_pais(pais), self._id_indicador(indicador_id), -2 ** 63 if desde is None else desde))
+        return [año for año, _ in filas], [valor for _, valor in filas]
+    
+    def _calcular_crecimiento_serie(self, pais, indicador_id):
         
-        for pais in self.paises:
-            nombre_pais = pais["nombre"]
-            años_disponibles = set(dato["ano"] for dato in self.poblacion 
-                                  if dato["pais"] == nombre_pais and 
-                                     dato["indicador_id"] == "SP.POP.TOTL")
-            
-            if años_requeridos.issubset(años_disponibles):
-                paises_completos.append(nombre_pais)
+        return CrecimientoSerie.desde_valores(*self._serie_sql(pais, indicador_id))
+    
+    def _resumen_rango(self, pais, indicador_id, año_inicio, año_fin):
         
-        return paises_completos
+        suma, cantidad, minimo, maximo = self._consultar(
+            "SELECT SUM(valor), COUNT(valor), MIN(valor), MAX(valor) FROM poblacion "
+            "WHERE pais = ? AND indicador_id = ? AND ano BETWEEN ? AND ?",
+            (self._nombre_pais(pais), self._id_indicador(indicador_id), año_inicio, año_fin))[0]
+        return (suma, cantidad, minimo, maximo) if cantidad else None
+    
+    def _agrupar_series(self, indicador_id):
+        
+        series = {}
+        for pais, posicion, año, valor in self._consultar(
+                "SELECT pais, posicion, ano, valor FROM poblacion WHERE indicador_id = ? "
+                "ORDER BY pais, ano, posicion", (indicador_id,)):
+            serie = series.get(pais)
+            if serie is None:
+                serie = series[pais] = ([], [], [])
+            serie[0].append(posicion)
+            serie[1].append(año)
+            serie[2].append(valor)
+        return series
     
-    def años_crecimiento_mayor(self, pais, umbral):
+    def _ejes_matriz(self, indicadores, año_inicio, año_fin):
+        
+        condicion = (f"indicador_id IN ({', '.join('?' * len(indicadores))}) AND ano BETWEEN ? AND ?")
+        parametros = (*indicadores, -2 ** 63 if año_inicio is None else año_inicio,
+                      2 ** 63 - 1 if año_fin is None else año_fin)
+        primero, ultimo = self._consultar(
+            f"SELECT MIN(ano), MAX(ano) FROM poblacion WHERE {condicion}", parametros)[0]
+        paises = self._columna(f"SELECT DISTINCT pais FROM poblacion WHERE {condicion}", parametros)
+        return self._rango_ejes(paises, primero, ultimo, año_inicio, año_fin)
+    
+    def _posiciones_matriz(self, indicador_id, paises, años):
+        
+        # Aquí cada celda lleva directamente el valor: con MIN(posicion), SQLite toma las demás
+        # columnas de esa misma fila (la primera de cada país y año).
+        matriz = [[None] * len(años) for _ in paises]
+        if not paises:
+            return matriz
+        
+        filas_pais = {pais: fila for fila, pais in enumerate(paises)}
+        for pais, año, _, valor in self._consultar(
+                "SELECT pais, ano, MIN(posicion), valor FROM poblacion "
+                "WHERE indicador_id = ? AND ano BETWEEN ? AND ? GROUP BY pais, ano",
+                (indicador_id, años[0], años[-1])):
+            if pais in filas_pais:
+                matriz[filas_pais[pais]][año - años[0]] = valor
+        return matriz
+    
+    def _valores_matriz(self, posiciones):
         
+        return posiciones
+    
+    def _año_extremo(self, pais, indicador_id, orden):
         
-        datos_pais = [dato for dato in self.poblacion 
-                     if dato["pais"] == pais and dato["indicador_id"] == "SP.POP.TOTL"]
+        filas = self._consultar(
+            f"SELECT ano FROM poblacion WHERE pais = ? AND indicador_id = ? AND valor IS NOT NULL "
+            f"ORDER BY valor {orden}, posicion LIMIT 1",
+            (self._nombre_pais(pais), self._id_indicador(indicador_id)))
+        return filas[0][0] if filas else None
+    
+    def obtener_año_poblacion_minima(self, pais, indicador_id="SP.POP.TOTL"):
         
-        datos_ordenados = sorted(datos_pais, key=lambda x: x["ano"])
+        return self._año_extremo(pais, indicador_id, "ASC")
+    
+    def obtener_año_poblacion_maxima(self, pais, indicador_id="SP.POP.TOTL"):
         
-        años_crecimiento = []
-        for i in range(1, len(datos_ordenados)):
-            año_actual = datos_ordenados[i]["ano"]
-            pob_actual = datos_ordenados[i]["valor"]
-            pob_anterior = datos_ordenados[i-1]["valor"]
-            
-            crecimiento = pob_actual - pob_anterior
-            
-            if crecimiento > umbral:
-                años_crecimiento.append(año_actual)
+        return self._año_extremo(pais, indicador_id, "DESC")
+    
+    def años_poblacion_mayor(self, pais, umbral, indicador_id="SP.POP.TOTL"):
         
-        return años_crecimiento
+        return self._columna(
+            "SELECT ano FROM poblacion WHERE pais = ? AND indicador_id = ? AND valor > ? ORDER BY posicion",
+            (self._nombre_pais(pais), self._id_indicador(indicador_id), umbral))
     
-    def obtener_poblacion_por_decada(self, pais, decada_inicio):
+    def top_k(self, indicador_id, año, k=10):
         
+        return [{"pais": pais, "valor": valor} for pais, valor in self._consultar(
+            "SELECT pais, valor FROM poblacion WHERE indicador_id = ? AND ano = ? AND valor IS NOT NULL "
+            "ORDER BY valor DESC, posicion LIMIT ?", (self._id_indicador(indicador_id), año, max(k, 0)))]
+    
+    def valores_entre(self, indicador_id, minimo=None, maximo=None, año_inicio=None, año_fin=None):
+        
+        consulta = "SELECT pais, ano, valor FROM poblacion WHERE indicador_id = ? AND valor IS NOT NULL"
+        parametros = [self._id_indicador(indicador_id)]
+        for condicion, valor in (("valor >= ?", minimo), ("valor <= ?", maximo),
+                                 ("ano >= ?", año_inicio), ("ano <= ?", año_fin)):
+            if valor is not None:
+                consulta += f" AND {condicion}"
+                parametros.append(valor)
+        return [{"pais": pais, "año": año, "valor": valor} for pais, año, valor in
+                self._consultar(consulta + " ORDER BY ano, valor DESC, posicion", parametros)]
+    
+    def contar_años_datos_disponibles(self, pais, indicador_id="SP.POP.TOTL"):
         
-        decada_inicio = (decada_inicio // 10) * 10
+        return self._consultar(
+            "SELECT COUNT(DISTINCT ano) FROM poblacion WHERE pais = ? AND indicador_id = ?",
+            (self._nombre_pais(pais), self._id_indicador(indicador_id)))[0][0]
+    
+    def paises_datos_completos(self, año_inicio, año_fin, indicador_id="SP.POP.TOTL"):
         
-        if not self.poblacion:
-            return []
+        requeridos = año_fin - año_inicio + 1
+        años_por_pais = dict(self._consultar(
+            "SELECT pais, COUNT(DISTINCT ano) FROM poblacion WHERE indicador_id = ? AND ano BETWEEN ? AND ? "
+            "GROUP BY pais", (self._id_indicador(indicador_id), año_inicio, año_fin)))
         
-        año_máximo = max(dato["ano"] for dato in self.poblacion)
+        return [pais["nombre"] for pais in self.paises
+                if requeridos <= 0 or años_por_pais.get(pais["nombre"]) == requeridos]
+    
+    def obtener_poblacion_por_decada(self, pais, decada_inicio, indicador_id="SP.POP.TOTL"):
         
-        resultados = []
-        for década in range(decada_inicio, año_máximo + 10, 10): 
-            def obtener_poblacion_por_decada(self, pais, decada_inicio):decada_inicio = (decada_inicio // 10) * 10
+        decada_inicio = (decada_inicio // 10) * 10
         
-        if not self.poblacion:
+        if not len(self.poblacion):
             return []
         
-        año_máximo = max(dato["ano"] for dato in self.poblacion)
-        
+        años, valores = self._serie_sql(pais, indicador_id, desde=decada_inicio)
         resultados = []
-        for década in range(decada_inicio, año_máximo + 10, 10):
-            
-            datos_década = [dato for dato in self.poblacion 
-                          if dato["pais"] == pais and
-                             década <= dato["ano"] < década + 10 and
-                             dato["indicador_id"] == "SP.POP.TOTL"]
-            
-            if datos_década:
-                
-                datos_ordenados = sorted(datos_década, key=lambda x: abs(x["ano"] - década))
-                dato_representativo = datos_ordenados[0]
-                
+        for década in range(decada_inicio, self._año_maximo() + 10, 10):
+            i = bisect.bisect_left(años, década)
+            if i < len(años) and años[i] < década + 10:
                 resultados.append({
                     "decada": f"{década}s",
-                    "año": dato_representativo["ano"],
-                    "poblacion": dato_representativo["valor"]
+                    "año": años[i],
+                    "poblacion": valores[i]
                 })
         
         return resultados
     
-    def años_sin_datos(self, pais, año_inicio, año_fin):
+    def años_sin_datos(self, pais, año_inicio, año_fin, indicador_id="SP.POP.TOTL"):
         
-        años_disponibles = set(dato["ano"] for dato in self.poblacion 
-                              if dato["pais"] == pais and 
-                                 dato["indicador_id"] == "SP.POP.TOTL")
+        años_disponibles = set(self._columna(
+            "SELECT DISTINCT ano FROM poblacion WHERE pais = ? AND indicador_id = ? AND ano BETWEEN ? AND ?",
+            (self._nombre_pais(pais), self._id_indicador(indicador_id), año_inicio, año_fin)))
         
         return [año for año in range(año_inicio, año_fin + 1) if año not in años_disponibles]
     
-    def obtener_año_poblacion_maxima(self, pais):
-        
-        datos_pais = [dato for dato in self.poblacion 
-                     if dato["pais"] == pais and dato["indicador_id"] == "SP.POP.TOTL"]
+    def años_datos_multiples_paises(self, umbral_paises, indicador_id="SP.POP.TOTL"):
         
-        if not datos_pais:
-            return None
-        
-        return max(datos_pais, key=lambda x: x["valor"])["ano"]
+        return self._columna(
+            "SELECT ano FROM poblacion WHERE indicador_id = ? GROUP BY ano "
+            "HAVING COUNT(DISTINCT pais) > ? ORDER BY MIN(posicion)",
+            (self._id_indicador(indicador_id), umbral_paises))
+
+
+def migrar_a_sqlite(nombre_db='poblacion.db', mostrar_progreso=False):
+    """Crea la base SQLite (reemplazando la que exista) desde los tres archivos JSON y el journal
+    pendiente. Devuelve el número de filas de población migradas."""
     
-    def años_datos_multiples_paises(self, umbral_paises):
-        
-        conteo_paises_por_año = {}
-        
-        for dato in self.poblacion:
-            if dato["indicador_id"] == "SP.POP.TOTL":
-                año = dato["ano"]
-                pais = dato["pais"]
-                
-                if año not in conteo_paises_por_año:
-                    conteo_paises_por_año[año] = set()
-                
-                conteo_paises_por_año[año].add(pais)
-        
-        return [año for año, paises in conteo_paises_por_año.items() 
-               if len(paises) > umbral_paises]
+    for sufijo in ("", "-wal", "-shm"):
+        if os.path.exists(nombre_db + sufijo):
+            os.remove(nombre_db + sufijo)
+    
+    sistema = SistemaEstadisticasSQLite(archivo_db=nombre_db, mostrar_progreso=mostrar_progreso)
+    filas = len(sistema.poblacion)
+    sistema.compactar()
+    sistema.cerrar()
+    return filas
+
+
+ALMACENES = {
+    "lista": SistemaEstadisticasGlobales,
+    "columnar": SistemaEstadisticasColumnar,
+    "sqlite": SistemaEstadisticasSQLite,
+}
+
+
+def _convertir_valor(valor):
+    
+    if isinstance(valor, str):
+        valor = valor.strip()
+        try:
+            return int(valor)
+        except ValueError:
+            return float(valor)
+    
+    if isinstance(valor, bool) or not isinstance(valor, (int, float)):
+        raise TypeError(f"Valor no numérico: {valor!r}")
+    return valor
+
+
+_ESPACIOS_JSON = re.compile(r"[ \t\n\r]*")
+
+def leer_json_en_flujo(archivo, tamaño_bloque=1 << 20, progreso=None):
+    """Genera uno a uno los elementos del arreglo JSON principal de un archivo de texto, leyéndolo
+    por bloques en lugar de cargarlo completo.
+    
+    progreso, si se indica, recibe los caracteres leídos tras cada bloque. Lanza json.JSONDecodeError
+    si el contenido no es un arreglo JSON válido.
+    """
+    
+    decodificador = json.JSONDecoder()
+    buffer = ""
+    i = 0
+    leidos = 0
+    agotado = False
+    estado = "inicio"   # inicio -> elemento -> separador -> elemento ... -> fin
+    
+    while True:
+        i = _ESPACIOS_JSON.match(buffer, i).end()
+        
+        pendiente = i == len(buffer)
+        if not pendiente and estado == "elemento" and buffer[i] != "]":
+            try:
+                elemento, fin = decodificador.raw_decode(buffer, i)
+                # Si tras el elemento no viene ',' o ']' en este bloque, puede estar cortado
+                # (un número como "-7.5e" se leería como -7.5): se lee más antes de aceptarlo.
+                siguiente = _ESPACIOS_JSON.match(buffer, fin).end()
+                pendiente = not agotado and (siguiente == len(buffer) or buffer[siguiente] not in ",]")
+            except json.JSONDecodeError:
+                if agotado:
+                    raise
+                pendiente = True
+        
+        if pendiente:
+            if agotado:
+                break
+            bloque = archivo.read(tamaño_bloque)
+            agotado = not bloque
+            leidos += len(bloque)
+            buffer = buffer[i:] + bloque
+            i = 0
+            if progreso is not None:
+                progreso(leidos)
+            continue
+        
+        caracter = buffer[i]
+        if estado == "fin":
+            raise json.JSONDecodeError("Contenido después del arreglo", buffer, i)
+        elif estado == "inicio":
+            if caracter != "[":
+                raise json.JSONDecodeError("Se esperaba un arreglo", buffer, i)
+            i += 1
+            estado = "primero"
+        elif caracter == "]" and estado in ("primero", "separador"):
+            i += 1
+            estado = "fin"
+        elif estado == "separador":
+            if caracter != ",":
+                raise json.JSONDecodeError("Se esperaba ',' o ']'", buffer, i)
+            i += 1
+            estado = "elemento"
+        elif estado == "primero":
+            estado = "elemento"
+        elif caracter == "]":
+            raise json.JSONDecodeError("Se esperaba un valor", buffer, i)
+        else:
+            yield elemento
+            i = fin
+            estado = "separador"
+    
+    if estado != "fin":
+        raise json.JSONDecodeError("Arreglo incompleto", buffer, i)
+
+
+def leer_filas_csv(archivo):
+    """Genera las filas de un CSV con encabezado (ano, pais, indicador_id, valor, ...)."""
+    
+    yield from csv.DictReader(archivo)
+
+
+def leer_filas_jsonl(archivo):
+    """Genera un dict por línea; las líneas que no son un objeto JSON se generan como None."""
+    
+    for linea in archivo:
+        if not linea.strip():
+            continue
+        try:
+            fila = json.loads(linea)
+        except json.JSONDecodeError:
+            fila = None
+        yield fila if isinstance(fila, dict) else None
+
+
+def ejecutar_ingest(args):
+    
+    formato = args.formato or ('jsonl' if args.archivo.endswith(('.jsonl', '.ndjson')) else 'csv')
+    lector = leer_filas_jsonl if formato == 'jsonl' else leer_filas_csv
+    
+    sistema = ALMACENES[args.almacen](usar_journal=args.journal, **opciones_sistema(args))
+    if args.archivo == '-':
+        resultado = sistema.agregar_datos_poblacion_lote(lector(sys.stdin))
+    else:
+        with open(args.archivo, 'r', encoding='utf-8', newline='') as archivo:
+            resultado = sistema.agregar_datos_poblacion_lote(lector(archivo))
+    sistema.cerrar()
+    
+    rechazados = resultado["rechazados"]
+    print(f"Insertados: {resultado['insertados']}, actualizados: {resultado['actualizados']}, "
+          f"sin cambios: {resultado['sin_cambios']}, rechazados: {len(rechazados)}")
+    for numero, motivo in rechazados[:20]:
+        print(f"  Fila {numero}: {motivo}")
+    if len(rechazados) > 20:
+        print(f"  ... y {len(rechazados) - 20} rechazos más")
+    
+    return 1 if rechazados else 0
+
+def lineas_reporte(codigo, resultado, parametros=None):
+    """Genera las líneas de texto de un reporte, tal como las muestra el módulo de reportes."""
+    
+    p = dict(REPORTES[codigo][1])
+    p.update(parametros or {})
+    
+    if codigo == 'A':
+        yield f"\n=== DATOS DE POBLACIÓN {p['año_inicio']}-{p['año_fin']} ==="
+        for registro in resultado:
+            yield f"\n{registro['pais']}:"
+            for dato in registro['datos']:
+                yield f"  Año: {dato['ano']}, Población: {dato['valor']:,} {dato['unidad']}"
+    
+    
+    elif codigo == 'B':
+        yield "\n=== PAÍSES CON CÓDIGOS ISO ==="
+        for pais in resultado:
+            yield f"{pais['nombre']}: ISO2 {pais['codigo_iso']}, ISO3 {pais['codigo_iso3']}"
+    
+    
+    elif codigo in ('C', 'D', 'F', 'G'):
+        titulos = {
+            'C': f"DATOS {p.get('indicador_id')}",
+            'D': f"DATOS ÚLTIMOS {p.get('num_años')} AÑOS",
+            'F': f"POBLACIÓN TOTAL ANTES DE {p.get('año')}",
+            'G': f"POBLACIÓN TOTAL DESPUÉS DE {p.get('año')}"
+        }
+        yield f"\n=== {titulos[codigo]} ==="
+        for dato in resultado:
+            yield f"{dato['pais']} ({dato['ano']}): {dato['valor']:,} {dato['unidad']}"
+    
+    
+    elif codigo in ('E', 'N', 'S', 'V'):
+        if codigo == 'E':
+            yield f"\n=== POBLACIÓN TOTAL {resultado['año']} ==="
+        else:
+            yield f"\n=== POBLACIÓN TOTAL EN {resultado['año']} ==="
+        yield f"Población total en {resultado['año']}: {resultado['total']:,} personas"
+    
+    
+    elif codigo == 'H':
+        yield f"\n=== PORCENTAJE DE CRECIMIENTO {p['año_inicio']}-{p['año_fin']} ==="
+        for registro in resultado:
+            yield f"{registro['pais']}: {registro['crecimiento']}%"
+    
+    
+    elif codigo == 'I':
+        yield f"\n=== POBLACIÓN EN {p['año']} ==="
+        for registro in resultado:
+            yield f"{registro['pais']}: {registro['poblacion']:,} personas"
+    
+    
+    elif codigo in ('J', 'X'):
+        yield "\n=== AÑO CON POBLACIÓN MÁS BAJA ===" if codigo == 'J' else "\n=== AÑO CON POBLACIÓN MÁS ALTA ==="
+        for registro in resultado:
+            yield f"{registro['pais']}: Año {registro['año']}, Población {registro['poblacion']:,} personas"
+    
+    
+    elif codigo == 'K':
+        yield "\n=== NÚMERO DE REGISTROS POR AÑO ==="
+        for registro in resultado:
+            yield f"Año {registro['año']}: {registro['registros']} registros"
+    
+    
+    elif codigo == 'L':
+        yield f"\n=== PAÍSES CON CRECIMIENTO > {p['porcentaje']:g}% ANUAL ==="
+        for pais in resultado:
+            yield f"{pais['pais']}: {pais['crecimiento_promedio']}%"
+    
+    
+    elif codigo in ('M', 'T', 'W'):
+        millones = p.get('umbral', 0) / 1_000_000
+        titulos = {
+            'M': f"AÑOS CON POBLACIÓN > {millones:,g} MILLONES",
+            'T': f"AÑOS CON CRECIMIENTO > {millones:,g} {'MILLÓN' if millones == 1 else 'MILLONES'}",
+            'W': "AÑOS SIN DATOS DE POBLACIÓN"
+        }
+        yield f"\n=== {titulos[codigo]} ==="
+        for registro in resultado:
+            yield f"{registro['pais']}: {registro['años']}"
+    
+    
+    elif codigo == 'O':
+        yield f"\n=== POBLACIÓN MÍNIMA EN ÚLTIMOS {p['num_años']} AÑOS ==="
+        for registro in resultado:
+            yield f"{registro['pais']}: {registro['poblacion_minima']:,} personas"
+    
+    
+    elif codigo == 'P':
+        yield f"\n=== PROMEDIO DE POBLACIÓN {p['año_inicio']}-{p['año_fin']} ==="
+        for registro in resultado:
+            yield f"{registro['pais']}: {registro['promedio']:,} personas"
+    
+    
+    elif codigo == 'Q':
+        yield "\n=== AÑOS CON DATOS DE POBLACIÓN ==="
+        for registro in resultado:
+            yield f"{registro['pais']}: {registro['años']} años"
+    
+    
+    elif codigo == 'R':
+        yield f"\n=== PAÍSES CON DATOS {p['año_inicio']}-{p['año_fin']} ==="
+        yield f"Países con datos completos: {resultado}"
+    
+    
+    elif codigo == 'U':
+        yield f"\n=== POBLACIÓN POR DÉCADAS DESDE {p['decada_inicio']} ==="
+        for registro in resultado:
+            yield f"\n{registro['pais']}:"
+            for decada in registro['decadas']:
+                yield f"  {decada['decada']}: {decada['poblacion']:,} personas (año {decada['año']})"
+    
+    
+    elif codigo == 'Y':
+        yield f"\n=== AÑOS CON DATOS DE MÁS DE {p['umbral_paises']} PAÍSES ==="
+        yield f"Años: {resultado}"
+
+def imprimir_reporte(codigo, resultado, parametros=None, archivo=None):
+    
+    (archivo or sys.stdout).write("\n".join(lineas_reporte(codigo, resultado, parametros)) + "\n")
+
+def filas_reporte(codigo, resultado):
+    """Aplana el resultado de un reporte en filas (dicts sin listas) para exportarlo a CSV."""
+    
+    if resultado is None:
+        return []
+    if isinstance(resultado, dict):
+        return [dict(resultado)]
+    
+    filas = []
+    for registro in resultado:
+        if not isinstance(registro, dict):
+            filas.append({"pais" if codigo == 'R' else "año": registro})
+            continue
+        
+        base = {clave: valor for clave, valor in registro.items() if not isinstance(valor, list)}
+        anidados = [(clave, valor) for clave, valor in registro.items() if isinstance(valor, list)]
+        if not anidados:
+            filas.append(base)
+        for clave, lista in anidados:
+            for elemento in lista:
+                if isinstance(elemento, dict):
+                    filas.append({**base, **elemento})
+                else:
+                    filas.append({**base, "año" if clave == "años" else clave: elemento})
+    return filas
 
 def generar_reportes(sistema):
     
     while True:
         print("\n=== MÓDULO DE REPORTES ===")
-        print("A. Datos de población 2000-2023")
-        print("B. Listar países con códigos ISO")
-        print("C. Datos de población 'SP.POP.TOTL'")
-        print("D. Datos de población de los últimos 10 años")
-        print("E. Total de población en 2022")
-        print("F. Población total antes de 2000")
-        print("G. Población total después de 2010")
-        print("H. Porcentaje de crecimiento 2010-2020")
-        print("I. Población en 2023")
-        print("J. Año con población más baja")
-        print("K. Número de registros por año")
-        print("L. Países con crecimiento > 2% anual")
-        print("M. Años con población > 1,000 millones")
-        print("N. Población total en 2000")
-        print("O. Población mínima en últimos 20 años")
-        print("P. Promedio de población 1980-2020")
-        print("Q. Años con datos de población")
-        print("R. Países con datos 2000-2023")
-        print("S. Población total en 2019")
-        print("T. Años con crecimiento > 1 millón")
-        print("U. Población por décadas desde 1960")
-        print("V. Población total en 2023")
-        print("W. Años sin datos de población")
-        print("X. Año con población más alta")
-        print("Y. Años con datos de más de 50 países")
+        for codigo, (titulo, _) in REPORTES.items():
+            print(f"{codigo}. {titulo}")
         print("Z. Volver al menú principal")
         
         opcion = input("\nSeleccione una opción (A-Z): ").upper()
         
+        if opcion == 'Z':
+            break
+        elif opcion in REPORTES:
+            imprimir_reporte(opcion, sistema.generar_reporte(opcion))
+        else:
+            print("Opción no válida. Intente de nuevo.")
+
+# Sistema compartido por los procesos del modo por lotes (heredado por fork o cargado en cada proceso).
+_SISTEMA_LOTE = None
+
+def _iniciar_trabajador_lote(almacen, opciones):
+    global _SISTEMA_LOTE
+    
+    # El perfil del worker empieza vacío: lo que heredó ya está contado en el del proceso principal.
+    if opciones.get("perfil") is not None:
+        opciones["perfil"].metodos.clear()
+    if _SISTEMA_LOTE is None:
+        _SISTEMA_LOTE = ALMACENES[almacen](solo_lectura=True, **opciones)
+
+def _ejecutar_reporte_lote(codigo, directorio, formato):
+    
+    inicio = time.perf_counter()
+    resultado = _SISTEMA_LOTE.generar_reporte(codigo)
+    
+    ruta = os.path.join(directorio, f"reporte_{codigo}.{'json' if formato == 'json' else 'txt'}")
+    with open(ruta, 'w', encoding='utf-8') as archivo:
+        if formato == 'json':
+            json.dump(resultado, archivo, ensure_ascii=False, indent=2)
+        else:
+            imprimir_reporte(codigo, resultado, archivo=archivo)
+    
+    return codigo, ruta, time.perf_counter() - inicio
+
+def _ejecutar_reporte_trabajador(codigo, directorio, formato):
+    """_ejecutar_reporte_lote en un worker; devuelve también lo que midió su perfil en esta tarea."""
+    
+    resultado = _ejecutar_reporte_lote(codigo, directorio, formato)
+    perfil = _SISTEMA_LOTE.perfil
+    if perfil is None:
+        return resultado, None
+    estadisticas = perfil.estadisticas()
+    perfil.metodos.clear()
+    return resultado, estadisticas
+
+def generar_reportes_lote(codigos, directorio, workers=1, formato='texto', almacen='lista', opciones=None):
+    """Genera cada reporte en su propio archivo, repartiendo los reportes entre workers procesos.
+    
+    Devuelve (codigo, ruta, segundos) en el mismo orden que codigos.
+    """
+    global _SISTEMA_LOTE
+    
+    os.makedirs(directorio, exist_ok=True)
+    opciones = opciones or {}
+    _SISTEMA_LOTE = ALMACENES[almacen](solo_lectura=True, **opciones)
+    
+    try:
+        if workers <= 1:
+            return [_ejecutar_reporte_lote(codigo, directorio, formato) for codigo in codigos]
+        
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        
+        # Con fork los procesos heredan los datos ya cargados sin copiarlos (copy-on-write).
+        metodo = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else None
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(metodo),
+                                 initializer=_iniciar_trabajador_lote, initargs=(almacen, opciones)) as ejecutor:
+            resultados = []
+            for resultado, estadisticas in ejecutor.map(_ejecutar_reporte_trabajador, codigos,
+                                                         repeat(directorio), repeat(formato)):
+                # Las estadísticas de cada worker se suman al perfil del proceso principal.
+                if estadisticas:
+                    opciones["perfil"].fusionar(estadisticas)
+                resultados.append(resultado)
+            return resultados
+    finally:
+        # Cierra la conexión o el journal y suelta los datos (y el mmap de la instantánea) al terminar.
+        _SISTEMA_LOTE.cerrar()
+        _SISTEMA_LOTE = None
+
+def ejecutar_batch(args):
+    
+    codigos = [codigo for codigo in args.reportes.upper() if codigo in REPORTES]
+    if not codigos:
+        print("Error: No se indicó ningún reporte válido (A-Y).")
+        return 1
+    
+    for codigo, ruta, segundos in generar_reportes_lote(codigos, args.salida, args.workers,
+                                                        args.formato, args.almacen, opciones_sistema(args)):
+        print(f"Reporte {codigo}: {ruta} ({segundos:.3f} s)")
+    return 0
+
+# Opciones de `report` -> nombre del parámetro en REPORTES.
+PARAMETROS_CLI = {
+    "pct": "porcentaje",
+    "years": "num_años",
+    "year": "año",
+    "desde": "año_inicio",
+    "hasta": "año_fin",
+    "threshold": "umbral",
+    "countries": "umbral_paises",
+    "decade": "decada_inicio",
+    "indicator": "indicador_id",
+}
+
+def ejecutar_report(args):
+    
+    codigos = [codigo for grupo in args.codigos for codigo in grupo.upper()]
+    invalidos = [codigo for codigo in codigos if codigo not in REPORTES]
+    if invalidos:
+        print(f"Error: Reportes no válidos: {', '.join(invalidos)}", file=sys.stderr)
+        return 2
+    
+    sistema = ALMACENES[args.almacen](solo_lectura=True, **opciones_sistema(args))
+    salida = sys.stdout
+    
+    for codigo in codigos:
+        # --indicator vale para todos los reportes; el resto solo para los que usan ese parámetro.
+        parametros = {nombre: getattr(args, opcion) for opcion, nombre in PARAMETROS_CLI.items()
+                      if getattr(args, opcion) is not None and
+                         (nombre in REPORTES[codigo][1] or nombre == "indicador_id")}
+        resultado = sistema.generar_reporte(codigo, **parametros)
+        
+        if args.formato == 'json':
+            salida.write(json.dumps({"reporte": codigo, "parametros": {**REPORTES[codigo][1], **parametros},
+                                     "resultado": resultado}, ensure_ascii=False) + "\n")
+        elif args.formato == 'csv':
+            filas = filas_reporte(codigo, resultado)
+            columnas = ["reporte"] + list(dict.fromkeys(clave for fila in filas for clave in fila))
+            escritor = csv.DictWriter(salida, fieldnames=columnas, lineterminator="\n")
+            escritor.writeheader()
+            escritor.writerows({"reporte": codigo, **fila} for fila in filas)
+        else:
+            imprimir_reporte(codigo, resultado, parametros, salida)
+    
+    salida.flush()
+    return 0
+
+# Consultas de SistemaEstadisticasGlobales expuestas por el servidor HTTP (GET /consultas/<nombre>).
+CONSULTAS_HTTP = (
+    "obtener_datos_poblacion_pais",
+    "calcular_crecimiento_poblacional",
+    "listar_paises",
+    "obtener_datos_por_indicador",
+    "obtener_datos_ultimos_años",
+    "obtener_poblacion_pais_año",
+    "obtener_poblacion_antes_año",
+    "obtener_poblacion_despues_año",
+    "calcular_porcentaje_crecimiento",
+    "obtener_año_poblacion_minima",
+    "contar_registros_por_año",
+    "paises_crecimiento_mayor",
+    "años_poblacion_mayor",
+    "obtener_poblacion_total_año",
+    "obtener_poblacion_minima_periodo",
+    "calcular_promedio_poblacion",
+    "resumen_periodo",
+    "contar_años_datos_disponibles",
+    "paises_datos_completos",
+    "años_crecimiento_mayor",
+    "obtener_poblacion_por_decada",
+    "años_sin_datos",
+    "obtener_año_poblacion_maxima",
+    "años_datos_multiples_paises",
+    "obtener_estadisticas",
+    "matriz_indicador",
+    "razon_indicadores",
+    "top_k",
+    "valores_entre",
+)
+
+# Métodos que mide PerfilConsultas (--profile): las consultas públicas, los reportes, las escrituras
+# y la carga y el guardado de la población (_cargar_json y _guardar_json se miden por archivo).
+METODOS_PERFILADOS = CONSULTAS_HTTP + (
+    "generar_reporte",
+    "agregar_dato_poblacion",
+    "agregar_datos_poblacion_lote",
+    "agregar_pais",
+    "agregar_indicador",
+    "compactar",
+    "_cargar_poblacion",
+    "_guardar_poblacion",
+)
+
+# Métodos que guarda CacheResultados (--cache-resultados): los reportes y las consultas que recorren todo
+# el conjunto de datos. Las demás se resuelven con los índices en memoria antes de lo que cuesta leer la caché.
+METODOS_CACHEADOS = (
+    "generar_reporte",
+    "matriz_indicador",
+    "razon_indicadores",
+)
+
+# Conversión de los parámetros que no son enteros (los de la URL llegan como texto).
+TIPOS_PARAMETRO = {
+    "pais": str,
+    "indicador_id": str,
+    "numerador": str,
+    "denominador": str,
+    "porcentaje": float,
+    "factor": float,
+    "umbral": _convertir_valor,
+    "minimo": _convertir_valor,
+    "maximo": _convertir_valor,
+}
+
+ESTADOS_HTTP = {200: "OK", 201: "Created", 304: "Not Modified", 400: "Bad Request", 404: "Not Found",
+                405: "Method Not Allowed", 409: "Conflict", 500: "Internal Server Error"}
+
+
+class ServidorConsultas:
+    """Servidor HTTP/1.1 sobre asyncio (solo biblioteca estándar) para consultas y reportes en JSON.
+    
+    Los datos se cargan una vez en `sistema`. Las respuestas GET se guardan en una caché LRU con
+    ETag, que se vacía en cada escritura (POST).
+    """
+    
+    def __init__(self, sistema, capacidad_cache=256):
         
-        if opcion == 'A':
-            print("\n=== DATOS DE POBLACIÓN 2000-2023 ===")
-            for pais in sistema.listar_paises():
-                datos = sistema.obtener_datos_poblacion_pais(pais['nombre'], 2000, 2023)
-                print(f"\n{pais['nombre']}:")
-                for dato in datos:
-                    print(f"  Año: {dato['ano']}, Población: {dato['valor']:,} {dato['unidad']}")
-        
-        
-        elif opcion == 'B':
-            print("\n=== PAÍSES CON CÓDIGOS ISO ===")
-            for pais in sistema.listar_paises():
-                print(f"{pais['nombre']}: ISO2 {pais['codigo_iso']}, ISO3 {pais['codigo_iso3']}")
-        
-        
-        elif opcion == 'C':
-            print("\n=== DATOS SP.POP.TOTL ===")
-            datos = sistema.obtener_datos_por_indicador("SP.POP.TOTL")
-            for dato in datos:
-                print(f"{dato['pais']} ({dato['ano']}): {dato['valor']:,} {dato['unidad']}")
-        
-        
-        elif opcion == 'D':
-            print("\n=== DATOS ÚLTIMOS 10 AÑOS ===")
-            datos = sistema.obtener_datos_ultimos_años(10)
-            for dato in datos:
-                print(f"{dato['pais']} ({dato['ano']}): {dato['valor']:,} {dato['unidad']}")
-        
-        
-        elif opcion == 'E':
-            print("\n=== POBLACIÓN TOTAL 2022 ===")
-            total = sistema.obtener_poblacion_total_año(2022)
-            print(f"Población total en 2022: {total:,} personas")
-        
-        
-        elif opcion == 'F':
-            print("\n=== POBLACIÓN TOTAL ANTES DE 2000 ===")
-            datos = sistema.obtener_poblacion_antes_año(2000)
-            for dato in datos:
-                print(f"{dato['pais']} ({dato['ano']}): {dato['valor']:,} {dato['unidad']}")
-        
-        
-        elif opcion == 'G':
-            print("\n=== POBLACIÓN TOTAL DESPUÉS DE 2010 ===")
-            datos = sistema.obtener_poblacion_despues_año(2010)
-            for dato in datos:
-                print(f"{dato['pais']} ({dato['ano']}): {dato['valor']:,} {dato['unidad']}")
-        
-        
-        elif opcion == 'H':
-            print("\n=== PORCENTAJE DE CRECIMIENTO 2010-2020 ===")
-            for pais in sistema.listar_paises():
-                crecimiento = sistema.calcular_porcentaje_crecimiento(pais['nombre'], 2010, 2020)
-                if crecimiento is not None:
-                    print(f"{pais['nombre']}: {crecimiento}%")
-        
-        
-        elif opcion == 'I':
-            print("\n=== POBLACIÓN EN 2023 ===")
-            for pais in sistema.listar_paises():
-                poblacion = sistema.obtener_poblacion_pais_año(pais['nombre'], 2023)
-                if poblacion is not None:
-                    print(f"{pais['nombre']}: {poblacion:,} personas")
-        
-        
-        elif opcion == 'J':
-            print("\n=== AÑO CON POBLACIÓN MÁS BAJA ===")
-            for pais in sistema.listar_paises():
-                año = sistema.obtener_año_poblacion_minima(pais['nombre'])
-                if año is not None:
-                    poblacion = sistema.obtener_poblacion_pais_año(pais['nombre'], año)
-                    print(f"{pais['nombre']}: Año {año}, Población {poblacion:,} personas")
-        
-        
-        elif opcion == 'K':
-            print("\n=== NÚMERO DE REGISTROS POR AÑO ===")
-            registros = sistema.contar_registros_por_año()
-            for año, num_registros in sorted(registros.items()):
-                print(f"Año {año}: {num_registros} registros")
-        
-        
-        elif opcion == 'L':
-            print("\n=== PAÍSES CON CRECIMIENTO > 2% ANUAL ===")
-            paises = sistema.paises_crecimiento_mayor(2, 5)
-            for pais in paises:
-                print(f"{pais['pais']}: {pais['crecimiento_promedio']}%")
-        
-        
-        elif opcion == 'M':
-            print("\n=== AÑOS CON POBLACIÓN > 1,000 MILLONES ===")
-            for pais in sistema.listar_paises():
-                años = sistema.años_poblacion_mayor(pais['nombre'], 1_000_000_000)
-                if años:
-                    print(f"{pais['nombre']}: {años}")
-        
-        
-        elif opcion == 'N':
-            print("\n=== POBLACIÓN TOTAL EN 2000 ===")
-            total = sistema.obtener_poblacion_total_año(2000)
-            print(f"Población total en 2000: {total:,} personas")
-        
-        
-        elif opcion == 'O':
-            print("\n=== POBLACIÓN MÍNIMA EN ÚLTIMOS 20 AÑOS ===")
-            for pais in sistema.listar_paises():
-                poblacion_min = sistema.obtener_poblacion_minima_periodo(pais['nombre'], 20)
-                if poblacion_min is not None:
-                    print(f"{pais['nombre']}: {poblacion_min:,} personas")
-        
-        
-        elif opcion == 'P':
-            print("\n=== PROMEDIO DE POBLACIÓN 1980-2020 ===")
-            for pais in sistema.listar_paises():
-                promedio = sistema.calcular_promedio_poblacion(pais['nombre'], 1980, 2020)
-                if promedio is not None:
-                    print(f"{pais['nombre']}: {promedio:,} personas")
-        
-        
-        elif opcion == 'Q':
-            print("\n=== AÑOS CON DATOS DE POBLACIÓN ===")
-            for pais in sistema.listar_paises():
-                años = sistema.contar_años_datos_disponibles(pais['nombre'])
-                print(f"{pais['nombre']}: {años} años")
-        
-        
-        elif opcion == 'R':
-            print("\n=== PAÍSES CON DATOS 2000-2023 ===")
-            paises = sistema.paises_datos_completos(2000, 2023)
-            print("Países con datos completos:", paises)
-        
-       
-        elif opcion == 'S':
-            print("\n=== POBLACIÓN TOTAL EN 2019 ===")
-            total = sistema.obtener_poblacion_total_año(2019)
-            print(f"Población total en 2019: {total:,} personas")
-        
-        
-        elif opcion == 'T':
-            print("\n=== AÑOS CON CRECIMIENTO > 1 MILLÓN ===")
-            for pais in sistema.listar_paises():
-                años = sistema.años_crecimiento_mayor(pais['nombre'], 1_000_000)
-                if años:
-                    print(f"{pais['nombre']}: {años}")
-        
-        
-        elif opcion == 'U':
-            print("\n=== POBLACIÓN POR DÉCADAS DESDE 1960 ===")
-            for pais in sistema.listar_paises():
-                poblacion_decadas = sistema.obtener_poblacion_por_decada(pais['nombre'], 1960)
-                print(f"\n{pais['nombre']}:")
-                for registro in poblacion_decadas:
-                    print(f"  {registro['decada']}: {registro['poblacion']:,} personas (año {registro['año']})")
-        
-        
-        elif opcion == 'V':
-            print("\n=== POBLACIÓN TOTAL EN 2023 ===")
-            total = sistema.obtener_poblacion_total_año(2023)
-            print(f"Población total en 2023: {total:,} personas")
-        
-        
-        elif opcion == 'W':
-            print("\n=== AÑOS SIN DATOS DE POBLACIÓN ===")
-            for pais in sistema.listar_paises():
-                años = sistema.años_sin_datos(pais['nombre'], 2000, 2023)
-                if años:
-                    print(f"{pais['nombre']}: {años}")
+        self.sistema = sistema
+        self.capacidad_cache = capacidad_cache
+        self.cache = OrderedDict()   # (ruta, parámetros) -> (etag, cuerpo)
+        self.generacion = 0
+    
+    async def iniciar(self, host="127.0.0.1", puerto=8000):
+        """Empieza a escuchar y devuelve el asyncio.Server (puerto 0 elige uno libre)."""
+        import asyncio
         
+        return await asyncio.start_server(self._atender, host, puerto)
+    
+    async def _atender(self, lector, escritor):
         
-        elif opcion == 'X':
-            print("\n=== AÑO CON POBLACIÓN MÁS ALTA ===")
-            for pais in sistema.listar_paises():
-                año = sistema.obtener_año_poblacion_maxima(pais['nombre'])
-                if año is not None:
-                    poblacion = sistema.obtener_poblacion_pais_año(pais['nombre'], año)
-                    print(f"{pais['nombre']}: Año {año}, Población {poblacion:,} personas")
+        try:
+            while True:
+                linea = await lector.readline()
+                if not linea.strip():
+                    break
+                
+                cabeceras = {}
+                while True:
+                    cabecera = await lector.readline()
+                    if not cabecera.strip():
+                        break
+                    nombre, _, valor = cabecera.decode('latin-1').partition(':')
+                    cabeceras[nombre.strip().lower()] = valor.strip()
+                
+                try:
+                    metodo, destino, version = linea.decode('latin-1').split()
+                    cuerpo = await lector.readexactly(int(cabeceras.get('content-length') or 0))
+                except ValueError:
+                    escritor.write(self._respuesta(400, None, self._error("Solicitud mal formada"), False))
+                    break
+                
+                mantener = version == 'HTTP/1.1' and cabeceras.get('connection', '').lower() != 'close'
+                try:
+                    estado, etag, datos = self.procesar(metodo, destino, cuerpo, cabeceras.get('if-none-match'))
+                except Exception as error:
+                    # Un fallo en una consulta responde 500 en lugar de cortar la conexión sin respuesta.
+                    print(f"Error: {metodo} {destino}: {error!r}")
+                    estado, etag, datos = 500, None, self._error(f"Error interno: {error}")
+                # HEAD lleva las mismas cabeceras que GET (incluido Content-Length), pero sin cuerpo.
+                escritor.write(self._respuesta(estado, etag, datos, mantener, con_cuerpo=metodo != 'HEAD'))
+                await escritor.drain()
+                if not mantener:
+                    break
+        except (ConnectionError, EOFError):
+            pass
+        finally:
+            escritor.close()
+    
+    def _respuesta(self, estado, etag, datos, mantener, con_cuerpo=True):
+        
+        cabeceras = [f"HTTP/1.1 {estado} {ESTADOS_HTTP[estado]}",
+                     f"Content-Length: {len(datos)}",
+                     f"Connection: {'keep-alive' if mantener else 'close'}"]
+        if datos:
+            cabeceras.append("Content-Type: application/json; charset=utf-8")
+        if etag:
+            cabeceras.append(f"ETag: {etag}")
+        return ("\r\n".join(cabeceras) + "\r\n\r\n").encode('latin-1') + (datos if con_cuerpo else b'')
+    
+    def _error(self, mensaje):
         
+        return json.dumps({"error": mensaje}, ensure_ascii=False).encode('utf-8')
+    
+    def invalidar(self):
         
-        elif opcion == 'Y':
-            print("\n=== AÑOS CON DATOS DE MÁS DE 50 PAÍSES ===")
-            años = sistema.años_datos_multiples_paises(50)
-            print("Años:", años)
-        elif opcion == 'Z':
-            break
+        self.generacion += 1
+        self.cache.clear()
+    
+    def procesar(self, metodo, destino, cuerpo=b'', si_no_coincide=None):
+        """Atiende una solicitud ya leída y devuelve (estado HTTP, ETag, cuerpo en bytes); para HEAD el
+        cuerpo es el del GET equivalente y quien responde lo omite."""
+        
+        url = urlsplit(destino)
+        partes = [unquote(parte) for parte in url.path.split('/') if parte]
+        
+        if metodo == 'POST':
+            try:
+                datos = json.loads(cuerpo or b'null')
+            except ValueError:
+                return 400, None, self._error("El cuerpo no es JSON válido")
+            estado, resultado = self._escribir(partes, datos)
+            return estado, None, json.dumps(resultado, ensure_ascii=False).encode('utf-8')
+        
+        if metodo not in ('GET', 'HEAD'):
+            return 405, None, self._error(f"Método {metodo} no permitido")
+        
+        # En modo compartido, otro proceso pudo escribir: las respuestas en caché ya no valen.
+        if self.sistema.recargar_si_cambio():
+            self.invalidar()
+        
+        parametros = dict(parse_qsl(url.query))
+        clave = ("/".join(partes), tuple(sorted(parametros.items())))
+        if clave in self.cache:
+            self.cache.move_to_end(clave)
+            etag, datos = self.cache[clave]
         else:
-            print("Opción no válida. Intente de nuevo.")
+            estado, resultado = self._consultar(partes, parametros)
+            datos = json.dumps(resultado, ensure_ascii=False).encode('utf-8')
+            if estado != 200:
+                return estado, None, datos
+            
+            etag = f'"{hashlib.sha1(datos).hexdigest()}"'
+            self.cache[clave] = (etag, datos)
+            if len(self.cache) > self.capacidad_cache:
+                self.cache.popitem(last=False)
+        
+        if si_no_coincide and (si_no_coincide.strip() == '*' or
+                               etag in (valor.strip() for valor in si_no_coincide.split(','))):
+            return 304, etag, b''
+        return 200, etag, datos
+    
+    def _argumentos(self, nombres, parametros, tipos):
+        
+        argumentos = {}
+        for nombre, tipo in zip(nombres, tipos):
+            # En la URL también se acepta "ano" por "año" (num_anos, ano_inicio...).
+            texto = parametros.get(nombre, parametros.get(nombre.replace("ñ", "n")))
+            if texto is not None:
+                argumentos[nombre] = tipo(texto)
+        return argumentos
+    
+    def _consultar(self, partes, parametros):
+        
+        if not partes:
+            return 200, {"consultas": {nombre: list(inspect.signature(getattr(self.sistema, nombre)).parameters)
+                                       for nombre in CONSULTAS_HTTP},
+                         "reportes": {codigo: titulo for codigo, (titulo, _) in REPORTES.items()}}
+        
+        if len(partes) == 2 and partes[0] == 'consultas' and partes[1] in CONSULTAS_HTTP:
+            firma = inspect.signature(getattr(self.sistema, partes[1])).parameters.values()
+            tipos = [TIPOS_PARAMETRO.get(p.name, int if p.default in (p.empty, None) else type(p.default))
+                     for p in firma]
+            try:
+                argumentos = self._argumentos([p.name for p in firma], parametros, tipos)
+            except (TypeError, ValueError) as error:
+                return 400, {"error": f"Parámetro inválido: {error}"}
+            
+            faltantes = [p.name for p in firma if p.name not in argumentos and p.default is p.empty]
+            if faltantes:
+                return 400, {"error": f"Faltan parámetros: {', '.join(faltantes)}"}
+            return 200, getattr(self.sistema, partes[1])(**argumentos)
+        
+        if len(partes) == 2 and partes[0] == 'reportes' and partes[1].upper() in REPORTES:
+            por_defecto = {"indicador_id": "SP.POP.TOTL", **REPORTES[partes[1].upper()][1]}
+            try:
+                argumentos = self._argumentos(list(por_defecto), parametros,
+                                              [TIPOS_PARAMETRO.get(nombre, type(valor))
+                                               for nombre, valor in por_defecto.items()])
+            except (TypeError, ValueError) as error:
+                return 400, {"error": f"Parámetro inválido: {error}"}
+            return 200, self.sistema.generar_reporte(partes[1], **argumentos)
+        
+        return 404, {"error": f"Ruta no encontrada: /{'/'.join(partes)}"}
+    
+    def _escribir(self, partes, datos):
+        
+        if partes == ['datos']:
+            filas = datos if isinstance(datos, list) else [datos]
+            resultado = self.sistema.agregar_datos_poblacion_lote(
+                fila if isinstance(fila, dict) else None for fila in filas)
+            if resultado["insertados"] or resultado["actualizados"]:
+                self.invalidar()
+            return (200 if not resultado["rechazados"] else 400), resultado
+        
+        campos = {"paises": ("nombre", "codigo_iso", "codigo_iso3"),
+                  "indicadores": ("id_indicador", "descripcion")}
+        if len(partes) != 1 or partes[0] not in campos:
+            return 404, {"error": f"Ruta no encontrada: /{'/'.join(partes)}"}
+        
+        if not isinstance(datos, dict) or any(not isinstance(datos.get(campo), str) for campo in campos[partes[0]]):
+            return 400, {"error": f"Campos requeridos: {', '.join(campos[partes[0]])}"}
+        
+        argumentos = [datos[campo] for campo in campos[partes[0]]]
+        agregado = (self.sistema.agregar_pais(*argumentos) if partes[0] == 'paises'
+                    else self.sistema.agregar_indicador(*argumentos))
+        if not agregado:
+            return 409, {"error": "Ya existe"}
+        self.invalidar()
+        return 201, dict(zip(campos[partes[0]], argumentos))
+
 
-def main():
-    sistema = SistemaEstadisticasGlobales()
+def ejecutar_serve(args):
+    import asyncio
+    
+    sistema = ALMACENES[args.almacen](usar_journal=True, **opciones_sistema(args))
+    servidor = ServidorConsultas(sistema, args.cache)
+    
+    async def servir():
+        servicio = await servidor.iniciar(args.host, args.puerto)
+        direccion = servicio.sockets[0].getsockname()
+        print(f"Sirviendo en http://{direccion[0]}:{direccion[1]}/ (Ctrl+C para terminar)")
+        async with servicio:
+            await servicio.serve_forever()
+    
+    try:
+        asyncio.run(servir())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sistema.cerrar()
+    return 0
+
+def menu_principal(almacen="lista", **opciones):
+    sistema = ALMACENES[almacen](**opciones)
     
     while True:
         print("\n=== MENÚ PRINCIPAL ===")
@@ -643,6 +4356,7 @@ def main():
         print("5. Salir")
         
         opcion = input("Seleccione una opción (1-5): ")
+        sistema.recargar_si_cambio()
         
         if opcion == '1':
             año = int(input("Ingrese el año: "))
@@ -668,15 +4382,118 @@ def main():
             generar_reportes(sistema)
         
         elif opcion == '5':
+            sistema.cerrar()
             print("Saliendo del sistema...")
             break
         
         else:
             print("Opción no válida. Intente de nuevo.")
 
-if __name__ == "__main__":
-    main()
+def opciones_sistema(args):
+    """Opciones globales (filtros de carga, progreso, compresión, modo compartido) como argumentos del sistema."""
+    
+    return {
+        "indicadores_carga": args.cargar_indicador,
+        "año_desde": args.cargar_desde,
+        "año_hasta": args.cargar_hasta,
+        "mostrar_progreso": args.progreso,
+        "compresion": args.compresion,
+        "acceso_compartido": args.compartido,
+        "perfil": args.perfil,
+        "cache": args.cache
+    }
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sistema de estadísticas globales de población.")
+    parser.add_argument("--almacen", choices=sorted(ALMACENES), default="lista",
+                        help="Motor de almacenamiento de los datos de población (columnar requiere numpy; sqlite usa poblacion.db)")
+    parser.add_argument("--progreso", action="store_true", help="Mostrar el avance de la carga de poblacion.json")
+    parser.add_argument("--cargar-indicador", action="append", metavar="ID",
+                        help="Cargar solo este indicador (se puede repetir); los datos quedan de solo lectura")
+    parser.add_argument("--cargar-desde", type=int, metavar="AÑO", help="Cargar solo los años desde AÑO (solo lectura)")
+    parser.add_argument("--cargar-hasta", type=int, metavar="AÑO", help="Cargar solo los años hasta AÑO (solo lectura)")
+    parser.add_argument("--compresion", choices=COMPRESIONES,
+                        help="Comprimir poblacion.json al guardarlo (zstd requiere zstandard); al leer se detecta solo")
+    parser.add_argument("--compartido", action="store_true",
+                        help="Modo compartido: varios procesos pueden usar los mismos archivos a la vez")
+    parser.add_argument("--profile", action="store_true",
+                        help="Medir llamadas, tiempos y filas por método y mostrar el resumen al terminar")
+    parser.add_argument("--profile-salida", metavar="ARCHIVO",
+                        help="Guardar las estadísticas del perfil en JSON (o en formato Prometheus si es .prom/.txt)")
+    parser.add_argument("--cache-resultados", action="store_true",
+                        help="Guardar en disco los reportes y las consultas pesadas y reutilizarlos mientras los datos no cambien")
+    parser.add_argument("--cache-archivo", default=ARCHIVO_CACHE, metavar="ARCHIVO",
+                        help="Base de la caché de resultados (la comparten todos los procesos que la usen)")
+    parser.add_argument("--cache-mb", type=int, default=64, help="Tamaño máximo de la caché de resultados en MB")
+    parser.add_argument("--journal", action="store_true",
+                        help="Anexar cada dato agregado desde el menú a un journal en lugar de reescribir poblacion.json")
+    subcomandos = parser.add_subparsers(dest="comando")
+    
+    ingest = subcomandos.add_parser("ingest", help="Carga masiva de datos de población desde CSV o JSONL")
+    ingest.add_argument("archivo", help="Archivo a cargar, o - para leer de la entrada estándar")
+    ingest.add_argument("--formato", choices=["csv", "jsonl"], help="Por defecto se deduce de la extensión")
+    # SUPPRESS: sin la opción, ingest conserva el valor de la opción global --journal.
+    ingest.add_argument("--journal", action="store_true", default=argparse.SUPPRESS,
+                        help="Usar el modo de almacenamiento con journal")
+    
+    convert = subcomandos.add_parser("convert", help="Genera la instantánea binaria (mmap) desde poblacion.json")
+    convert.add_argument("--salida", default="poblacion.bin", help="Archivo binario a generar")
+    
+    migrate = subcomandos.add_parser("migrate", help="Crea la base SQLite (--almacen sqlite) desde los archivos JSON")
+    migrate.add_argument("--salida", default="poblacion.db", help="Base de datos a generar (se reemplaza si existe)")
+    
+    report = subcomandos.add_parser("report", help="Ejecuta uno o varios reportes y escribe el resultado en la salida estándar")
+    report.add_argument("codigos", nargs="+", help="Códigos de reporte (A-Y), por ejemplo: L H o LHJ")
+    report.add_argument("--format", "--formato", dest="formato", choices=["texto", "json", "csv"], default="texto",
+                        help="texto (como el menú), json (una línea por reporte) o csv")
+    report.add_argument("--pct", type=float, help="Porcentaje de crecimiento (reporte L)")
+    report.add_argument("--years", type=int, help="Número de años hacia atrás (D, L, O)")
+    report.add_argument("--year", type=int, help="Año de referencia (E, F, G, I, N, S, V)")
+    report.add_argument("--from", dest="desde", type=int, help="Año inicial (A, H, P, R, W)")
+    report.add_argument("--to", dest="hasta", type=int, help="Año final (A, H, P, R, W)")
+    report.add_argument("--threshold", type=int, help="Umbral de población o crecimiento (M, T)")
+    report.add_argument("--countries", type=int, help="Número mínimo de países (Y)")
+    report.add_argument("--decade", type=int, help="Década inicial (U)")
+    report.add_argument("--indicator", help="Indicador de los reportes (por defecto SP.POP.TOTL)")
+    
+    batch = subcomandos.add_parser("batch", help="Genera reportes sin menú, cada uno en su propio archivo")
+    batch.add_argument("--reportes", default="".join(REPORTES), help="Códigos de los reportes (por defecto A-Y)")
+    batch.add_argument("--salida", default="reportes", help="Directorio de salida")
+    batch.add_argument("--workers", type=int, default=1, help="Número de procesos")
+    batch.add_argument("--formato", choices=["texto", "json"], default="texto")
+    
+    serve = subcomandos.add_parser("serve", help="Servidor HTTP de consultas y reportes en JSON")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--puerto", "--port", dest="puerto", type=int, default=8000)
+    serve.add_argument("--cache", type=int, default=256, help="Número máximo de respuestas en caché")
+    
+    args = parser.parse_args(argv)
+    args.perfil = PerfilConsultas() if args.profile or args.profile_salida else None
+    args.cache = CacheResultados(args.cache_archivo, args.cache_mb << 20) if args.cache_resultados else None
+    
+    try:
+        if args.comando == "ingest":
+            return ejecutar_ingest(args)
+        if args.comando == "convert":
+            return 0 if convertir_a_binario(nombre_binario=args.salida) else 1
+        if args.comando == "migrate":
+            print(f"{migrar_a_sqlite(args.salida, mostrar_progreso=args.progreso)} filas migradas a {args.salida}.")
+            return 0
+        if args.comando == "batch":
+            return ejecutar_batch(args)
+        if args.comando == "report":
+            return ejecutar_report(args)
+        if args.comando == "serve":
+            return ejecutar_serve(args)
+        
+        menu_principal(args.almacen, usar_journal=args.journal, **opciones_sistema(args))
+        return 0
+    finally:
+        if args.perfil is not None:
+            if args.profile:
+                print(args.perfil.resumen(), file=sys.stderr)
+            if args.profile_salida:
+                args.perfil.guardar(args.profile_salida)
 
-        
-        
\ No newline at end of file
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,36 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+PAISES = [
+    {"nombre": "Colombia", "codigo_iso": "CO", "codigo_iso3": "COL"},
+    {"nombre": "Brasil", "codigo_iso": "BR", "codigo_iso3": "BRA"},
+]
+
+INDICADORES = [
+    {"id_indicador": "SP.POP.TOTL", "descripcion": "Total de población"},
+]
+
+POBLACION = [
+    {"ano": 2000, "pais": "Colombia", "codigo_iso3": "COL", "indicador_id": "SP.POP.TOTL",
+     "descripcion": "Total de población", "valor": 40000000, "estado": "disponible", "unidad": "personas"},
+    {"ano": 2000, "pais": "Brasil", "codigo_iso3": "BRA", "indicador_id": "SP.POP.TOTL",
+     "descripcion": "Total de población", "valor": 175000000, "estado": "disponible", "unidad": "personas"},
+]
+
+
+@pytest.fixture
+def datos(tmp_path, monkeypatch):
+    """Directorio de trabajo temporal con paises.json, indicadores.json y poblacion.json mínimos."""
+    
+    for nombre, contenido in (("paises.json", PAISES), ("indicadores.json", INDICADORES),
+                              ("poblacion.json", POBLACION)):
+        with open(tmp_path / nombre, "w", encoding="utf-8") as archivo:
+            json.dump(contenido, archivo, ensure_ascii=False)
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
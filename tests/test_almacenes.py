@@ -0,0 +1,101 @@
+import json
+
+import pytest
+
+from proyecto import ALMACENES, REPORTES
+
+
+PAISES = [
+    {"nombre": "Colombia", "codigo_iso": "CO", "codigo_iso3": "COL"},
+    {"nombre": "Brasil", "codigo_iso": "BR", "codigo_iso3": "BRA"},
+    {"nombre": "Perú", "codigo_iso": "PE", "codigo_iso3": "PER"},
+    {"nombre": "Chile", "codigo_iso": "CL", "codigo_iso3": "CHL"},
+]
+
+INDICADORES = [
+    {"id_indicador": "SP.POP.TOTL", "descripcion": "Total de población"},
+    {"id_indicador": "SP.URB.TOTL", "descripcion": "Población urbana"},
+]
+
+# Chile no tiene datos; Perú tiene huecos y un descenso para que los mínimos no caigan siempre al inicio.
+VALORES = {
+    "Colombia": {año: 30_000_000 + (año - 1990) * 700_000 for año in range(1990, 2024)},
+    "Brasil": {año: 150_000_000 + (año - 1990) * 2_100_000 for año in range(1990, 2024)},
+    "Perú": {año: 22_000_000 + abs(año - 2005) * 300_000 for año in range(1990, 2024) if año % 7},
+}
+
+# Consultas de CONSULTAS_HTTP y del benchmark, con argumentos fijos.
+CONSULTAS = [
+    ("obtener_datos_poblacion_pais", ("Perú", 2000, 2010)),
+    ("calcular_crecimiento_poblacional", ("Perú", 1995, 2020)),
+    ("listar_paises", ()),
+    ("obtener_datos_por_indicador", ("SP.URB.TOTL",)),
+    ("obtener_datos_ultimos_años", (5,)),
+    ("obtener_poblacion_pais_año", ("Brasil", 2015)),
+    ("obtener_poblacion_antes_año", (2000,)),
+    ("obtener_poblacion_despues_año", (2010,)),
+    ("calcular_porcentaje_crecimiento", ("Colombia", 2010, 2020)),
+    ("obtener_año_poblacion_minima", ("Perú",)),
+    ("obtener_año_poblacion_maxima", ("Perú",)),
+    ("contar_registros_por_año", ()),
+    ("paises_crecimiento_mayor", (2, 5)),
+    ("años_poblacion_mayor", ("Perú", 25_000_000)),
+    ("obtener_poblacion_total_año", (2022,)),
+    ("obtener_poblacion_minima_periodo", ("Perú", 20)),
+    ("calcular_promedio_poblacion", ("Brasil", 2000, 2020)),
+    ("resumen_periodo", ("Perú", 2000, 2020)),
+    ("contar_años_datos_disponibles", ("Perú",)),
+    ("paises_datos_completos", (2000, 2010)),
+    ("años_crecimiento_mayor", ("Brasil", 2_000_000)),
+    ("obtener_poblacion_por_decada", ("Perú", 1990)),
+    ("años_sin_datos", ("Perú", 1990, 2023)),
+    ("años_datos_multiples_paises", (2,)),
+    ("obtener_estadisticas", ()),
+    ("matriz_indicador", ("SP.POP.TOTL",)),
+    ("top_k", ("SP.POP.TOTL", 2010, 2)),
+    ("valores_entre", ("SP.POP.TOTL", 20_000_000, 40_000_000)),
+]
+
+
+@pytest.fixture
+def datos_varios(datos):
+    """Los datos de conftest con más países, años y un segundo indicador."""
+    
+    poblacion = []
+    for pais, valores in VALORES.items():
+        codigo = next(fila["codigo_iso3"] for fila in PAISES if fila["nombre"] == pais)
+        for año, valor in valores.items():
+            for indicador, factor in (("SP.POP.TOTL", 1), ("SP.URB.TOTL", 0.75)):
+                poblacion.append({"ano": año, "pais": pais, "codigo_iso3": codigo, "indicador_id": indicador,
+                                  "descripcion": "", "valor": int(valor * factor), "estado": "disponible",
+                                  "unidad": "personas"})
+    for nombre, contenido in (("paises.json", PAISES), ("indicadores.json", INDICADORES),
+                              ("poblacion.json", poblacion)):
+        with open(datos / nombre, "w", encoding="utf-8") as archivo:
+            json.dump(contenido, archivo, ensure_ascii=False)
+    return datos
+
+
+@pytest.fixture
+def sistemas(datos_varios):
+    
+    pytest.importorskip("numpy")
+    abiertos = {almacen: clase(solo_lectura=True) for almacen, clase in ALMACENES.items()}
+    yield abiertos
+    for sistema in abiertos.values():
+        sistema.cerrar()
+
+
+@pytest.mark.parametrize("almacen", ["columnar", "sqlite"])
+@pytest.mark.parametrize("metodo,argumentos", CONSULTAS, ids=[metodo for metodo, _ in CONSULTAS])
+def test_consultas_iguales_al_motor_lista(sistemas, almacen, metodo, argumentos):
+    
+    esperado = getattr(sistemas["lista"], metodo)(*argumentos)
+    assert getattr(sistemas[almacen], metodo)(*argumentos) == esperado
+
+
+@pytest.mark.parametrize("almacen", ["columnar", "sqlite"])
+@pytest.mark.parametrize("codigo", sorted(REPORTES))
+def test_reportes_iguales_al_motor_lista(sistemas, almacen, codigo):
+    
+    assert sistemas[almacen].generar_reporte(codigo) == sistemas["lista"].generar_reporte(codigo)
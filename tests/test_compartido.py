@@ -0,0 +1,40 @@
+import contextlib
+import io
+import multiprocessing
+import os
+
+from proyecto import SistemaEstadisticasGlobales
+
+
+PROCESOS = 4
+INSERCIONES = 20
+
+
+def _escritor(directorio, numero):
+    
+    os.chdir(directorio)
+    with contextlib.redirect_stdout(io.StringIO()):
+        # La mitad escribe con journal y la otra mitad guarda poblacion.json en cada inserción;
+        # el umbral bajo hace que se compacte mientras los demás escriben.
+        sistema = SistemaEstadisticasGlobales(acceso_compartido=True, usar_journal=numero % 2 == 0,
+                                              umbral_compactacion=7)
+        for i in range(INSERCIONES):
+            sistema.agregar_dato_poblacion(2100 + numero * 100 + i, "Colombia", "SP.POP.TOTL", 1000 * numero + i)
+        sistema.compactar()
+        sistema.cerrar()
+
+
+def test_escritores_concurrentes_no_pierden_inserciones(datos):
+    
+    contexto = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else None)
+    procesos = [contexto.Process(target=_escritor, args=(str(datos), numero)) for numero in range(PROCESOS)]
+    for proceso in procesos:
+        proceso.start()
+    for proceso in procesos:
+        proceso.join(60)
+    assert [proceso.exitcode for proceso in procesos] == [0] * PROCESOS
+    
+    sistema = SistemaEstadisticasGlobales(acceso_compartido=True)
+    insertados = {(registro.ano, registro.valor) for registro in sistema.poblacion if registro.ano >= 2100}
+    assert insertados == {(2100 + numero * 100 + i, 1000 * numero + i)
+                          for numero in range(PROCESOS) for i in range(INSERCIONES)}
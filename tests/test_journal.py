@@ -0,0 +1,60 @@
+import json
+
+from proyecto import ARCHIVO_JOURNAL, JournalPoblacion, SistemaEstadisticasGlobales
+
+
+def _registro(año, valor):
+    
+    return {"ano": año, "pais": "Colombia", "codigo_iso3": "COL", "indicador_id": "SP.POP.TOTL",
+            "descripcion": "Total de población", "valor": valor, "estado": "disponible", "unidad": "personas"}
+
+
+def test_reproduce_el_journal_al_cargar(datos):
+    
+    sistema = SistemaEstadisticasGlobales(usar_journal=True)
+    assert sistema.agregar_dato_poblacion(2001, "Colombia", "SP.POP.TOTL", 41000000)
+    assert sistema.agregar_dato_poblacion(2000, "Colombia", "SP.POP.TOTL", 40500000)
+    sistema.cerrar()
+    
+    # Los cambios solo están en el journal hasta la compactación.
+    assert len(json.loads((datos / "poblacion.json").read_text(encoding="utf-8"))) == 2
+    journal = (datos / ARCHIVO_JOURNAL).read_bytes()
+    
+    lector = SistemaEstadisticasGlobales(solo_lectura=True)
+    assert lector.obtener_poblacion_pais_año("Colombia", 2001) == 41000000
+    assert lector.obtener_poblacion_pais_año("Colombia", 2000) == 40500000
+    assert (datos / ARCHIVO_JOURNAL).read_bytes() == journal
+    
+    # Sin journal, el sistema compacta al iniciar: poblacion.json recibe los cambios.
+    SistemaEstadisticasGlobales()
+    poblacion = json.loads((datos / "poblacion.json").read_text(encoding="utf-8"))
+    assert {(fila["ano"], fila["valor"]) for fila in poblacion if fila["pais"] == "Colombia"} == \
+        {(2000, 40500000), (2001, 41000000)}
+    assert (datos / ARCHIVO_JOURNAL).read_bytes() == b""
+
+
+def test_ultima_linea_cortada(datos):
+    
+    lineas = b"".join(json.dumps(_registro(año, año)).encode("utf-8") + b"\n" for año in (2001, 2002))
+    (datos / ARCHIVO_JOURNAL).write_bytes(lineas + b'{"ano": 2003, "pais": "Col')
+    
+    # Leer no modifica el archivo: la última línea puede ser una escritura todavía en curso.
+    journal = JournalPoblacion(ARCHIVO_JOURNAL)
+    assert [registro["ano"] for registro in journal.leer()] == [2001, 2002]
+    assert journal.posicion == len(lineas)
+    assert (datos / ARCHIVO_JOURNAL).read_bytes().endswith(b'"pais": "Col')
+    
+    # El escritor recorta la línea incompleta antes de anexar.
+    journal.anexar(_registro(2004, 2004))
+    journal.cerrar()
+    assert [registro["ano"] for registro in JournalPoblacion(ARCHIVO_JOURNAL).leer()] == [2001, 2002, 2004]
+
+
+def test_linea_danada_en_medio(datos, capsys):
+    
+    contenido = (json.dumps(_registro(2001, 1)) + "\n" + "{no es json\n" + json.dumps(_registro(2002, 2)) + "\n")
+    (datos / ARCHIVO_JOURNAL).write_text(contenido, encoding="utf-8")
+    
+    assert [registro["ano"] for registro in JournalPoblacion(ARCHIVO_JOURNAL).leer()] == [2001, 2002]
+    assert "registro dañado" in capsys.readouterr().out
+    assert (datos / ARCHIVO_JOURNAL).read_text(encoding="utf-8") == contenido
@@ -0,0 +1,40 @@
+import io
+import json
+
+import pytest
+
+from proyecto import leer_json_en_flujo
+
+
+TEXTO = json.dumps([
+    {"ano": 2000, "pais": "Perú", "valor": -7.5e-3, "estado": "disponible", "otros": [1, [2, {}], None]},
+    {"ano": 2001, "pais": "Côte d'Ivoire", "valor": 12345678901234567890, "nota": "coma, corchete ] y \"comillas\""},
+    "texto \\ con escapes é 😀",
+    [],
+    {},
+    True,
+    None,
+    0,
+    1e10,
+], ensure_ascii=False, indent=2)
+
+
+@pytest.mark.parametrize("tamaño_bloque", [1, 2, 3, 5, 7, 16, 1 << 20])
+def test_igual_que_json_loads(tamaño_bloque):
+    
+    assert list(leer_json_en_flujo(io.StringIO(TEXTO), tamaño_bloque)) == json.loads(TEXTO)
+
+
+@pytest.mark.parametrize("texto", ["[]", "  [ ]  ", "[1]", "[-0.5e-7,\n2]"])
+def test_casos_pequeños(texto):
+    
+    for tamaño_bloque in (1, 2, 4):
+        assert list(leer_json_en_flujo(io.StringIO(texto), tamaño_bloque)) == json.loads(texto)
+
+
+@pytest.mark.parametrize("texto", ["", "{}", "[1, 2", "[1,]", "[1 2]", "[1] 2", "[-7.5e"])
+def test_contenido_invalido(texto):
+    
+    for tamaño_bloque in (1, 3, 1 << 20):
+        with pytest.raises(json.JSONDecodeError):
+            list(leer_json_en_flujo(io.StringIO(texto), tamaño_bloque))